@@ -0,0 +1,177 @@
+import hashlib
+import math
+import threading
+import time
+from functools import lru_cache
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import Max
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter of strings: it may say yes wrongly, never no."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(item)
+        )
+
+
+class BlacklistFilter:
+    """
+    Answers "is this JTI blacklisted?" from memory for the common case of a
+    token that is not. The Bloom filter is built from the unexpired
+    blacklisted tokens on first use, takes tokens blacklisted in this process
+    straight from the post_save signal and, at most every `sync_interval`
+    seconds, picks up those blacklisted by other processes with one indexed
+    query. Only a JTI the filter claims to know costs a database lookup.
+
+    Ids can commit out of order (MySQL hands out auto-increment values
+    before commit), so each sync re-reads the last `lookback` ids below the
+    highest one seen, and the filter is rebuilt from scratch every
+    `rebuild_interval` seconds in case a row lagged further than that.
+    Queries run outside the lock; only the swap happens under it.
+    """
+
+    def __init__(
+        self,
+        capacity=100000,
+        error_rate=0.001,
+        sync_interval=5,
+        lookback=1000,
+        rebuild_interval=600,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.lookback = lookback
+        self.rebuild_interval = rebuild_interval
+        self.bloom = None
+        self.last_id = 0
+        self.built_at = 0
+        self.synced_at = 0
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        try:
+            last_id = BlacklistedToken.objects.aggregate(last=Max("id"))["last"] or 0
+            jtis = list(
+                BlacklistedToken.objects.filter(
+                    id__lte=last_id, token__expires_at__gt=timezone.now()
+                ).values_list("token__jti", flat=True)
+            )
+            bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+            for jti in jtis:
+                bloom.add(jti)
+            with self._lock:
+                self.bloom, self.last_id = bloom, last_id
+                self.built_at = self.synced_at = time.monotonic()
+        finally:
+            self._rebuilding = False
+
+    def sync(self):
+        rows = list(
+            BlacklistedToken.objects.filter(id__gt=self.last_id - self.lookback)
+            .order_by("id")
+            .values_list("id", "token__jti")
+        )
+        with self._lock:
+            for pk, jti in rows:
+                self._add(jti)
+                self.last_id = max(self.last_id, pk)
+
+    def refresh(self):
+        """Run the rebuild or sync that is due, if no other thread has it."""
+        now = time.monotonic()
+        with self._lock:
+            if self.bloom is None or now - self.built_at >= self.rebuild_interval:
+                if self._rebuilding:
+                    return
+                self._rebuilding = True
+                task = self.rebuild
+            elif now - self.synced_at >= self.sync_interval:
+                self.synced_at = now
+                task = self.sync
+            else:
+                return
+        task()
+
+    def _add(self, jti):
+        if self.bloom is None or jti in self.bloom:
+            # Already there, or a false positive that is checked anyway.
+            return
+        if self.bloom.count >= self.bloom.capacity:
+            # Full; the next check rebuilds it twice the size it needs.
+            self.bloom = None
+        else:
+            self.bloom.add(jti)
+
+    def add(self, jti):
+        with self._lock:
+            self._add(jti)
+
+    def might_contain(self, jti):
+        self.refresh()
+        bloom = self.bloom
+        # Until the first build finishes every token goes to the database.
+        return bloom is None or jti in bloom
+
+    def is_blacklisted(self, jti):
+        return (
+            self.might_contain(jti)
+            and BlacklistedToken.objects.filter(token__jti=jti).exists()
+        )
+
+
+@lru_cache(maxsize=None)
+def get_blacklist_filter():
+    options = getattr(settings, "TOKEN_BLACKLIST_FILTER", {})
+    return BlacklistFilter(
+        options.get("CAPACITY", 100000),
+        options.get("ERROR_RATE", 0.001),
+        options.get("SYNC_INTERVAL", 5),
+        options.get("SYNC_LOOKBACK", 1000),
+        options.get("REBUILD_INTERVAL", 600),
+    )
+
+
+@receiver(setting_changed)
+def reset_blacklist_filter(setting, **kwargs):
+    if setting == "TOKEN_BLACKLIST_FILTER":
+        get_blacklist_filter.cache_clear()
+
+
+class RefreshToken(tokens.RefreshToken):
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if get_blacklist_filter().is_blacklisted(jti):
+            raise TokenError(_("Token is blacklisted"))
@@ -0,0 +1,41 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+
+def hash_workers():
+    """PASSWORD_HASH_WORKERS, or one per CPU when unset."""
+    return getattr(settings, "PASSWORD_HASH_WORKERS", None) or os.cpu_count() or 1
+
+
+class HashingPool:
+    """
+    Runs make_password for many passwords across a thread pool. The hashing
+    is CPU bound, but hashlib.pbkdf2_hmac releases the GIL, so threads hash
+    in parallel without extra processes that each need Django set up. With
+    one worker it hashes inline. Use as a context manager to shut it down.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or hash_workers()
+        self.executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="provisioning-hasher"
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def hash(self, passwords):
+        """Hashes in order; a None password gets an unusable hash."""
+        passwords = list(passwords)
+        if self.executor is None or len(passwords) < 2:
+            return [make_password(password) for password in passwords]
+        return list(self.executor.map(make_password, passwords))
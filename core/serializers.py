@@ -1,41 +1,75 @@
-from django.contrib.auth.hashers import make_password
-from rest_framework import serializers
-from djoser.serializers import (
-    UserCreateSerializer as BaseUserCreateSerializer,
-    UserSerializer as BaseUserSerializer,
-)
-
-
-class UserCreateSerializer(BaseUserCreateSerializer):
-    confirm_password = serializers.CharField(
-        style={"input_type": "password"}, write_only=True
-    )
-
-    def validate(self, data):
-        if data["password"] != data["confirm_password"]:
-            raise serializers.ValidationError("Password do not match.")
-        data.pop("confirm_password")
-        return data
-
-    class Meta(BaseUserCreateSerializer.Meta):
-        fields = [
-            "id",
-            "username",
-            "password",
-            "confirm_password",
-            "email",
-            "phone_number",
-            "first_name",
-            "last_name",
-        ]
-
-
-class UserSerializer(BaseUserSerializer):
-    class Meta(BaseUserSerializer.Meta):
-        fields = ["id", "username", "password", "email", "phone_number"]
-
-    email = serializers.EmailField(read_only=True)
-
-    def update(self, instance, validated_data):
-        validated_data["password"] = make_password(validated_data.get("password"))
-        return super().update(instance, validated_data)
+from django.contrib.auth.hashers import make_password
+from rest_framework import serializers
+from djoser.serializers import (
+    UserCreateSerializer as BaseUserCreateSerializer,
+    UserSerializer as BaseUserSerializer,
+)
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from .blacklist import RefreshToken, get_blacklist_filter
+
+
+class UserCreateSerializer(BaseUserCreateSerializer):
+    confirm_password = serializers.CharField(
+        style={"input_type": "password"}, write_only=True
+    )
+
+    def validate(self, data):
+        if data["password"] != data["confirm_password"]:
+            raise serializers.ValidationError("Password do not match.")
+        data.pop("confirm_password")
+        return data
+
+    class Meta(BaseUserCreateSerializer.Meta):
+        fields = [
+            "id",
+            "username",
+            "password",
+            "confirm_password",
+            "email",
+            "phone_number",
+            "first_name",
+            "last_name",
+        ]
+
+
+class UserSerializer(BaseUserSerializer):
+    class Meta(BaseUserSerializer.Meta):
+        fields = ["id", "username", "password", "email", "phone_number"]
+        extra_kwargs = {"password": {"write_only": True}}
+
+    email = serializers.EmailField(read_only=True)
+
+    def update(self, instance, validated_data):
+        # Only a password change pays for a hash; profile edits skip it.
+        if "password" in validated_data:
+            validated_data["password"] = make_password(validated_data["password"])
+        return super().update(instance, validated_data)
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs["refresh"])
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            data["refresh"] = str(refresh)
+
+        return data
+
+
+class TokenVerifySerializer(jwt_serializers.TokenVerifySerializer):
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+
+        if api_settings.BLACKLIST_AFTER_ROTATION:
+            jti = token.get(api_settings.JTI_CLAIM)
+            if get_blacklist_filter().is_blacklisted(jti):
+                raise serializers.ValidationError("Token is blacklisted")
+
+        return {}
@@ -1,3 +1,161 @@
-from django.test import TestCase
-
-# Create your tests here.
+import io
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken
+from .blacklist import BloomFilter, get_blacklist_filter
+from .views import TokenRefresh
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        self.assertTrue(all(f"jti-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TokenBlacklistFilterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(
+            username="keeper", email="keeper@example.com", phone_number="+886911111111"
+        )
+
+    def setUp(self):
+        get_blacklist_filter.cache_clear()
+        self.addCleanup(get_blacklist_filter.cache_clear)
+
+    def refresh(self, token):
+        return self.client.post("/auth/jwt/refresh/", {"refresh": str(token)})
+
+    def test_refresh_skips_the_blacklist_table_once_warm(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.refresh(token)
+        self.assertIn("access", response.data)
+
+    def test_blacklisted_tokens_are_rejected(self):
+        token = RefreshToken.for_user(self.user)
+        self.refresh(token)
+        token.blacklist()
+        self.assertEqual(self.refresh(token).status_code, 401)
+        response = self.client.post("/auth/jwt/verify/", {"token": str(token)})
+        self.assertEqual(response.status_code, 400)
+
+    def test_picks_up_tokens_blacklisted_elsewhere(self):
+        token = RefreshToken.for_user(self.user)
+        self.refresh(token)
+        # bulk_create skips the signal, like a blacklist in another process.
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=OutstandingToken.objects.get(jti=token["jti"]))]
+        )
+        get_blacklist_filter().synced_at = 0
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def blacklist_elsewhere(self, token, pk):
+        BlacklistedToken.objects.bulk_create(
+            [
+                BlacklistedToken(
+                    id=pk, token=OutstandingToken.objects.get(jti=token["jti"])
+                )
+            ]
+        )
+
+    def test_sync_rereads_ids_that_commit_out_of_order(self):
+        early, late = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        self.refresh(late)
+        self.blacklist_elsewhere(early, 50)
+        get_blacklist_filter().synced_at = 0
+        self.assertEqual(self.refresh(early).status_code, 401)
+        # A lower id committed after 50 was seen.
+        self.blacklist_elsewhere(late, 10)
+        get_blacklist_filter().synced_at = 0
+        self.assertEqual(self.refresh(late).status_code, 401)
+
+    @override_settings(TOKEN_BLACKLIST_FILTER={"SYNC_LOOKBACK": 0})
+    def test_rebuild_catches_rows_older_than_the_lookback(self):
+        early, late = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        self.refresh(late)
+        blacklist_filter = get_blacklist_filter()
+        self.blacklist_elsewhere(early, 50)
+        blacklist_filter.synced_at = 0
+        self.refresh(early)
+        self.blacklist_elsewhere(late, 10)
+        blacklist_filter.synced_at = 0
+        self.assertEqual(self.refresh(late).status_code, 200)
+        blacklist_filter.built_at = 0
+        self.assertEqual(self.refresh(late).status_code, 401)
+
+    def test_routes_match_whole_paths(self):
+        self.assertIs(resolve("/auth/jwt/refresh").func.view_class, TokenRefresh)
+        self.assertIsNot(
+            getattr(resolve("/auth/jwt/refresh-me/").func, "view_class", None),
+            TokenRefresh,
+        )
+
+    def test_flush_deletes_only_expired_tokens_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            outstanding = OutstandingToken.objects.create(
+                jti=f"old-{i}", token="", expires_at=now - timedelta(days=1)
+            )
+            BlacklistedToken.objects.create(token=outstanding)
+        OutstandingToken.objects.create(
+            jti="live", token="", expires_at=now + timedelta(days=1)
+        )
+        out = io.StringIO()
+        call_command("flush_expired_tokens", batch_size=2, stdout=out)
+        self.assertIn("Deleted 5", out.getvalue())
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)), ["live"]
+        )
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class ProfileUpdateTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            "editor",
+            "editor@example.com",
+            "old-password-1",
+            phone_number="+886922222222",
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_profile_edits_do_not_hash(self):
+        with mock.patch("core.serializers.make_password") as hash_password:
+            response = self.client.patch(
+                "/auth/user/me/", {"phone_number": "+886933333333"}
+            )
+        self.assertEqual(response.status_code, 200)
+        hash_password.assert_not_called()
+        self.assertNotIn("password", response.data)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("old-password-1"))
+
+    def test_password_changes_are_hashed(self):
+        with mock.patch(
+            "core.serializers.make_password", wraps=make_password
+        ) as hash_password:
+            response = self.client.patch("/auth/user/me/", {"password": "new-pass-2"})
+        self.assertEqual(response.status_code, 200)
+        hash_password.assert_called_once_with("new-pass-2")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new-pass-2"))
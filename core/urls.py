@@ -1,7 +1,10 @@
-from django.urls import path
-from . import views
-
-urlpatterns = [
-    path("signup/", views.UserCreated.as_view(), name="sign_up"),
-    path("user/me/", views.UserMe.as_view(), name="user_me"),
-]
+from django.urls import path, re_path
+from . import views
+
+urlpatterns = [
+    path("signup/", views.UserCreated.as_view(), name="sign_up"),
+    path("user/me/", views.UserMe.as_view(), name="user_me"),
+    # Ahead of djoser's routes, which check the blacklist table every call.
+    re_path(r"^jwt/refresh/?$", views.TokenRefresh.as_view(), name="jwt-refresh"),
+    re_path(r"^jwt/verify/?$", views.TokenVerify.as_view(), name="jwt-verify"),
+]
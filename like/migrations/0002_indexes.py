@@ -0,0 +1,26 @@
+# Generated by Django 4.1.5 on 2026-10-17 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("like", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="likeditem",
+            index=models.Index(
+                fields=["content_type", "object_id"], name="likeditem_object_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="likeditem",
+            index=models.Index(
+                fields=["user", "content_type", "object_id"],
+                name="likeditem_user_object_idx",
+            ),
+        ),
+    ]
@@ -1,13 +1,26 @@
-from django.db import models
-from django.conf import settings
-from django.contrib.contenttypes.models import ContentType
-from django.contrib.contenttypes.fields import GenericForeignKey
-
-# Create your models here.
-
-
-class LikedItem(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
-    object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey()
+from django.db import models
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.fields import GenericForeignKey
+
+# Create your models here.
+
+
+class LikedItem(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey()
+
+    class Meta:
+        indexes = [
+            # Likes of an object, for deleting it and reconciling like_count.
+            models.Index(
+                fields=["content_type", "object_id"], name="likeditem_object_idx"
+            ),
+            # What a user liked, and whether they already like an object.
+            models.Index(
+                fields=["user", "content_type", "object_id"],
+                name="likeditem_user_object_idx",
+            ),
+        ]
@@ -0,0 +1,144 @@
+"""
+Async read-only variants of the catalog and cart endpoints, for deployments
+served by an ASGI server. They render the same serializers as the DRF
+viewsets, but load everything with the async ORM first so serialization
+never touches the database.
+
+Django 4.1's async ORM still runs each query through `sync_to_async`; what
+these views save is the worker thread a sync view holds for the whole
+request.
+"""
+
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.contrib.contenttypes.models import ContentType
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from tag.models import TaggedItem
+from . import models, serializers
+from .filter import ProductFilter
+from .serializers import set_prefetched
+from .views import ProductViewSet
+
+PAGE_SIZE = 10
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def read_only(view):
+    # django.views.decorators.http only wraps sync views in Django 4.1.
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def get_page_number(request):
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 0
+    if page < 1:
+        raise Http404("Invalid page.")
+    return page
+
+
+async def paginate(request, queryset):
+    """Count-free page numbers: read one extra row to know if there is more."""
+    page = get_page_number(request)
+    offset = (page - 1) * PAGE_SIZE
+    rows = [row async for row in queryset[offset : offset + PAGE_SIZE + 1]]
+    if not rows and page > 1:
+        raise Http404("Invalid page.")
+
+    url = request.build_absolute_uri()
+    next_link = previous_link = None
+    if len(rows) > PAGE_SIZE:
+        next_link = replace_query_param(url, "page", page + 1)
+    if page == 2:
+        previous_link = remove_query_param(url, "page")
+    elif page > 2:
+        previous_link = replace_query_param(url, "page", page - 1)
+    return rows[:PAGE_SIZE], {"next": next_link, "previous": previous_link}
+
+
+async def attach_images(products):
+    images = {product.pk: [] for product in products}
+    async for image in models.ProductImage.objects.filter(product_id__in=images):
+        images[image.product_id].append(image)
+    for product in products:
+        set_prefetched(product, "images", images[product.pk])
+
+
+async def attach_tags(products):
+    content_type = await sync_to_async(ContentType.objects.get_for_model)(
+        models.Product
+    )
+    items = {product.pk: [] for product in products}
+    async for item in TaggedItem.objects.filter(
+        content_type=content_type, object_id__in=items
+    ).select_related("tag"):
+        items[item.object_id].append(item)
+    for product in products:
+        set_prefetched(product, "tagged_items", items[product.pk])
+
+
+def get_product_ordering(request):
+    term = request.GET.get("ordering", "").split(",")[0].strip()
+    if term.lstrip("-") in ProductViewSet.ordering_fields:
+        return [term, "-id" if term.startswith("-") else "id"]
+    return ["id"]
+
+
+@read_only
+async def product_list(request):
+    filterset = ProductFilter(request.GET, models.Product.objects.all())
+    # Validating collection_id looks the collection up.
+    if not await sync_to_async(filterset.is_valid)():
+        return json_response(filterset.errors, status=400)
+    queryset = filterset.qs.order_by(*get_product_ordering(request))
+
+    products, links = await paginate(request, queryset)
+    await attach_images(products)
+    await attach_tags(products)
+    data = serializers.ProductSerializer(
+        products, many=True, context={"request": request}
+    ).data
+    return json_response({**links, "results": data})
+
+
+@read_only
+async def product_detail(request, pk):
+    try:
+        product = await models.Product.objects.aget(pk=pk)
+    except models.Product.DoesNotExist:
+        raise Http404("No Product matches the given query.")
+    await attach_images([product])
+    await attach_tags([product])
+    data = serializers.ProductSerializer(product, context={"request": request}).data
+    return json_response(data)
+
+
+@read_only
+async def collection_list(request):
+    collections, links = await paginate(
+        request, models.Collection.objects.order_by("id")
+    )
+    data = serializers.CollectionSerializer(collections, many=True).data
+    return json_response({**links, "results": data})
+
+
+@read_only
+async def cart_detail(request, pk):
+    try:
+        # with_totals() prefetches, which aget() runs in one sync_to_async hop.
+        cart = await models.Cart.objects.with_totals().aget(pk=pk)
+    except models.Cart.DoesNotExist:
+        raise Http404("No Cart matches the given query.")
+    return json_response(serializers.CartSerializer(cart).data)
@@ -0,0 +1,113 @@
+from functools import lru_cache
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .cache import build_backend
+from .models import Customer
+
+
+def user_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+@lru_cache(maxsize=None)
+def get_auth_cache():
+    """The STORE_AUTH_CACHE backend, or None when it is disabled."""
+    options = getattr(settings, "STORE_AUTH_CACHE", {})
+    if not options.get("ENABLED", True):
+        return None
+    return build_backend(options)
+
+
+@receiver(setting_changed)
+def reset_auth_cache(setting, **kwargs):
+    if setting == "STORE_AUTH_CACHE":
+        get_auth_cache.cache_clear()
+
+
+def forget_user(user_id):
+    """Drop the cached identity now and again once the transaction commits."""
+    backend = get_auth_cache()
+    if backend is None:
+        return
+    backend.delete(user_key(user_id))
+    transaction.on_commit(lambda: backend.delete(user_key(user_id)))
+
+
+def get_customer_id(request):
+    """
+    The requesting user's customer id, from the authentication cache when
+    CachedJWTAuthentication resolved the request, otherwise from the database
+    once per request. None for anonymous requests.
+    """
+    customer_id = getattr(request, "customer_id", None)
+    if customer_id is None and request.user.is_authenticated:
+        customer_id = (
+            Customer.objects.filter(user_id=request.user.id)
+            .order_by()
+            .values_list("id", flat=True)
+            .first()
+        )
+        request.customer_id = customer_id
+    return customer_id
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps a token's user in STORE_AUTH_CACHE, together
+    with their customer id, which is attached to the request as
+    `request.customer_id`. A warm request resolves its identity without a
+    query; a cold one, or any request with the cache disabled, takes one.
+
+    The password hash is left out of the cache and loads lazily if anything
+    asks for it. Entries are dropped when the User or Customer is saved or
+    deleted and when one of the user's tokens is blacklisted.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            request.customer_id = result[0]._customer_id
+        return result
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        backend = get_auth_cache()
+        cached = backend.get(user_key(user_id)) if backend is not None else None
+        if cached is None:
+            cached = self.load_user(user_id)
+            if backend is not None:
+                backend.set(user_key(user_id), cached)
+
+        field_names, values, customer_id = cached
+        user = self.user_model.from_db(
+            self.user_model._default_manager.db, field_names, values
+        )
+        user._customer_id = customer_id
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def load_user(self, user_id):
+        field_names = [
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.attname != "password"
+        ]
+        row = (
+            self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+            .values_list(*field_names, "customer__id")
+            .first()
+        )
+        if row is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        return field_names, list(row[:-1]), row[-1]
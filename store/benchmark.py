@@ -0,0 +1,405 @@
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+from . import counters, models, pricing, search
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Run against a throwaway copy of the schema so benchmarks never touch real
+    data. SQLite gets a file instead of the usual in-memory test database,
+    which several threads cannot write to concurrently.
+    """
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    original_test_name = test_settings.get("NAME")
+    path = None
+    if connection.vendor == "sqlite" and not original_test_name:
+        fd, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        test_settings["NAME"] = path
+
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        test_settings["NAME"] = original_test_name
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def create_users(count, prefix="bench"):
+    User = get_user_model()
+    users = []
+    for i in range(count):
+        users.append(
+            User.objects.create(
+                username=f"{prefix}{i}",
+                email=f"{prefix}{i}@example.com",
+                phone_number=f"+8869{i:08d}",
+                first_name="Bench",
+                last_name=str(i),
+            )
+        )
+    return users
+
+
+def authenticated_client(user):
+    # The test client re-raises view exceptions through a process-wide signal,
+    # which would hand one thread's error to another; report them as 500s.
+    return Client(
+        raise_request_exception=False,
+        HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}",
+    )
+
+
+def create_catalog(products, inventory, collections=1):
+    collection_objs = [
+        models.Collection.objects.create(title=f"Collection {i}")
+        for i in range(collections)
+    ]
+    return [
+        models.Product.objects.create(
+            title=f"Product {i}",
+            description=f"Benchmark product number {i}",
+            price=10 + i % 90,
+            inventory=inventory,
+            collection=collection_objs[i % collections],
+        )
+        for i in range(products)
+    ]
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"requests": 0}
+
+    def percentile(p):
+        index = min(len(latencies) - 1, round(p / 100 * (len(latencies) - 1)))
+        return round(latencies[index] * 1000, 3)
+
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+    }
+
+
+WORDS = [
+    "red",
+    "blue",
+    "green",
+    "black",
+    "steel",
+    "wooden",
+    "classic",
+    "compact",
+    "organic",
+    "wireless",
+    "lamp",
+    "chair",
+    "kettle",
+    "speaker",
+    "jacket",
+    "backpack",
+    "blender",
+    "notebook",
+    "mug",
+    "headphones",
+]
+
+
+def seed_dataset(
+    rng,
+    collections=5,
+    products=200,
+    images=2,
+    customers=20,
+    cart_items=3,
+    orders=2,
+    inventory=1000,
+):
+    """Bulk-insert a synthetic catalog with customers, carts and past orders."""
+    collection_objs = models.Collection.objects.bulk_create(
+        [models.Collection(title=f"Collection {i}") for i in range(collections)]
+    )
+    product_objs = []
+    for i in range(products):
+        title = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}".title()
+        product_objs.append(
+            models.Product(
+                title=title,
+                slug=f"product-{i}",
+                description=" ".join(rng.choices(WORDS, k=12)),
+                price=rng.randint(100, 50000) / 100,
+                inventory=inventory,
+                collection=collection_objs[i % collections],
+            )
+        )
+    models.Product.objects.bulk_create(product_objs, batch_size=500)
+    # SQLite does not hand the new ids back on every version; re-read them.
+    product_objs = list(models.Product.objects.order_by("id"))
+    models.ProductImage.objects.bulk_create(
+        [
+            models.ProductImage(
+                product=product,
+                image=f"django_product_images/bench-{product.id}-{n}.jpg",
+            )
+            for product in product_objs
+            for n in range(images)
+        ],
+        batch_size=500,
+    )
+    if search.is_enabled():
+        search.rebuild_index()
+
+    users = create_users(customers)
+    customer_ids = dict(
+        models.Customer.objects.filter(user__in=users).values_list("user_id", "id")
+    )
+    carts = {}
+    for user in users:
+        carts[user.id] = models.Cart.objects.create()
+        models.CartItem.objects.bulk_create(
+            [
+                models.CartItem(cart=carts[user.id], product=product, quantity=1)
+                for product in rng.sample(product_objs, cart_items)
+            ]
+        )
+
+    order_objs = models.Order.objects.bulk_create(
+        [
+            models.Order(customer_id=customer_ids[user.id])
+            for user in users
+            for _ in range(orders)
+        ]
+    )
+    if not all(order.pk for order in order_objs):
+        order_objs = list(models.Order.objects.order_by("id"))
+    models.OrderItem.objects.bulk_create(
+        [
+            models.OrderItem(
+                order=order,
+                product=product,
+                unit_price=product.price,
+                quantity=rng.randint(1, 3),
+            )
+            for order in order_objs
+            for product in rng.sample(product_objs, cart_items)
+        ],
+        batch_size=500,
+    )
+    # bulk_create skips save() and the signals that keep the counters and
+    # stored prices current.
+    counters.reconcile()
+    pricing.reprice(models.Product.objects.all())
+    return {"products": product_objs, "users": users, "carts": carts}
+
+
+class Scenario:
+    """
+    One kind of request in a replayed mix. `prepare` runs untimed and returns
+    the (method, path, data) to send, so fixtures such as a fresh cart for
+    checkout do not count towards the request being measured.
+    """
+
+    def __init__(self, name, prepare):
+        self.name = name
+        self.prepare = prepare
+
+
+def _products_list(rng, dataset, user):
+    pages = max(1, len(dataset["products"]) // 10)
+    return "get", f"/store/products/?page={rng.randint(1, min(pages, 5))}", None
+
+
+def _products_search(rng, dataset, user):
+    return "get", f"/store/products/?search={rng.choice(WORDS)}", None
+
+
+def _cart_add(rng, dataset, user):
+    cart = dataset["carts"][user.id]
+    data = {"product_id": rng.choice(dataset["products"]).id, "quantity": 1}
+    return "post", f"/store/carts/{cart.id}/items/", data
+
+
+def _checkout(rng, dataset, user):
+    cart = models.Cart.objects.create()
+    models.CartItem.objects.bulk_create(
+        [
+            models.CartItem(cart=cart, product=product, quantity=1)
+            for product in rng.sample(dataset["products"], 3)
+        ]
+    )
+    return "post", "/store/orders/", {"cart_id": str(cart.id)}
+
+
+def _order_list(rng, dataset, user):
+    return "get", "/store/orders/", None
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario("products_list", _products_list),
+        Scenario("products_search", _products_search),
+        Scenario("cart_add", _cart_add),
+        Scenario("checkout", _checkout),
+        Scenario("order_list", _order_list),
+    ]
+}
+
+MIXES = {
+    "browse": {"products_list": 6, "products_search": 4},
+    "shop": {"products_list": 3, "cart_add": 4, "checkout": 1, "order_list": 2},
+    "default": {
+        "products_list": 40,
+        "products_search": 20,
+        "cart_add": 20,
+        "checkout": 5,
+        "order_list": 15,
+    },
+}
+
+
+def replay(mix, requests, dataset, rng):
+    """
+    Send `requests` requests drawn from `mix` ({scenario: weight}) as random
+    seeded customers and report latency, queries per request and throughput
+    for each scenario and overall.
+    """
+    users = dataset["users"]
+    clients = {user.id: authenticated_client(user) for user in users}
+    names = list(mix)
+    picks = rng.choices(names, weights=[mix[name] for name in names], k=requests)
+
+    results = {name: {"latencies": [], "queries": [], "statuses": {}} for name in names}
+    busy = 0.0
+    for name in picks:
+        user = rng.choice(users)
+        method, path, data = SCENARIOS[name].prepare(rng, dataset, user)
+        client = clients[user.id]
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(
+                path, data, content_type="application/json"
+            )
+            elapsed = time.perf_counter() - started
+        busy += elapsed
+        result = results[name]
+        result["latencies"].append(elapsed)
+        result["queries"].append(len(queries))
+        status = str(response.status_code)
+        result["statuses"][status] = result["statuses"].get(status, 0) + 1
+
+    report = {"scenarios": {}}
+    for name, result in results.items():
+        report["scenarios"][name] = dict(
+            summarize(result["latencies"], sum(result["latencies"])),
+            **summarize_queries(result["queries"]),
+            statuses=result["statuses"],
+        )
+    report["overall"] = dict(
+        summarize([l for r in results.values() for l in r["latencies"]], busy),
+        **summarize_queries([q for r in results.values() for q in r["queries"]]),
+    )
+    return report
+
+
+def summarize_queries(counts):
+    if not counts:
+        return {}
+    return {
+        "queries_mean": round(statistics.mean(counts), 2),
+        "queries_max": max(counts),
+    }
+
+
+def read_workload(rng, requests, product_ids, cart_ids, page_size=10):
+    """
+    `requests` (sync path, async path) pairs over the read endpoints that
+    have async variants: product list and detail, collections and carts.
+    """
+    pages = max(1, min(5, len(product_ids) // page_size))
+    choices = [
+        lambda: f"products/?page={rng.randint(1, pages)}",
+        lambda: f"products/{rng.choice(product_ids)}/",
+        lambda: "collections/",
+        lambda: f"carts/{rng.choice(cart_ids)}/",
+    ]
+    paths = [rng.choice(choices)() for _ in range(requests)]
+    return [(f"/store/{path}", f"/store/async/{path}") for path in paths]
+
+
+def run_threaded(paths, concurrency, fetch):
+    """Send `paths` from `concurrency` threads; `fetch(path)` returns a status."""
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def send(path):
+        started = time.perf_counter()
+        status = fetch(path)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses.append(status)
+
+    def worker(chunk):
+        try:
+            for path in chunk:
+                send(path)
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=worker, args=(paths[i::concurrency],))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def run_concurrent(paths, concurrency, fetch):
+    """Send `paths` from `concurrency` coroutines; `fetch` is awaited."""
+    latencies, statuses = [], []
+    pending = iter(paths)
+
+    async def worker():
+        for path in pending:
+            started = time.perf_counter()
+            statuses.append(await fetch(path))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, statuses, time.perf_counter() - started
+
+
+def count_statuses(statuses):
+    counts = {}
+    for status in statuses:
+        counts[str(status)] = counts.get(str(status), 0) + 1
+    return counts
@@ -0,0 +1,248 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+
+class LocMemBackend:
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        # Counters never expire; evicting one would resurrect stale entries.
+        with self._lock:
+            _, value = self._data.get(key, (None, 0))
+            self._data[key] = (None, value + 1)
+            self._data.move_to_end(key)
+            return value + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """
+    Wraps any client exposing the redis-py `get`/`set`/`delete`/`incr`/`scan_iter`
+    calls, so tests can hand in a fake instead of a server.
+    """
+
+    def __init__(self, client, prefix="store:", timeout=300):
+        self.client = client
+        self.prefix = prefix
+        self.timeout = timeout
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        # Version counters are stored by INCR as plain digits, everything
+        # else is pickled (and a pickle never starts with a digit).
+        if isinstance(value, bytes) and not value.isdigit():
+            return pickle.loads(value)
+        return int(value)
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """
+    Read-through cache for serialized API responses.
+
+    Entries are never invalidated in place: every key embeds the version
+    counters of the scopes it depends on (`catalog`, `collection:<id>`,
+    `product:<id>`), and writes simply bump those counters so the old
+    entries become unreachable and age out of the backend.
+    """
+
+    def __init__(self, backend, timeout=300):
+        self.backend = backend
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def version(self, scope):
+        return self.backend.get(f"version:{scope}") or 0
+
+    def bump(self, *scopes):
+        for scope in set(scopes):
+            self.backend.incr(f"version:{scope}")
+
+    def make_key(self, prefix, scopes, request):
+        versions = ",".join(f"{scope}={self.version(scope)}" for scope in scopes)
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+            if value != ""
+        )
+        raw = f"{request.get_host()}{request.path}?{params}|{versions}"
+        return f"{prefix}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+    def get(self, key):
+        data = self.backend.get(key)
+        self._count(hit=data is not None)
+        return data
+
+    def set(self, key, data):
+        self.backend.set(key, data, self.timeout)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+
+
+def build_backend(options):
+    backend = options.get("BACKEND", "locmem")
+    timeout = options.get("TIMEOUT", 300)
+    if backend == "locmem":
+        return LocMemBackend(options.get("MAX_ENTRIES", 1024), timeout)
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("The redis cache backend requires `redis`.")
+        client = redis.Redis.from_url(options["LOCATION"])
+        return RedisBackend(client, options.get("KEY_PREFIX", "store:"), timeout)
+    raise ImproperlyConfigured(f"Unknown store cache backend {backend!r}.")
+
+
+@lru_cache(maxsize=None)
+def get_response_cache():
+    options = getattr(settings, "STORE_RESPONSE_CACHE", {})
+    return ResponseCache(build_backend(options), options.get("TIMEOUT", 300))
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    if setting == "STORE_RESPONSE_CACHE":
+        get_response_cache.cache_clear()
+
+
+def is_enabled():
+    return getattr(settings, "STORE_RESPONSE_CACHE", {}).get("ENABLED", True)
+
+
+class CachedResponseMixin:
+    """
+    Serve `list`/`retrieve` from the response cache. Views declare which
+    version scopes a request depends on through `get_cache_scopes`.
+
+    `live_fields` change too often to flush every cached list over, so a
+    list served from the cache never carries the values it was stored
+    with: they are read again, in one query by primary key, on every hit.
+    """
+
+    cache_prefix = None
+    live_fields = ()
+
+    def get_cache_scopes(self, request, pk=None):
+        raise NotImplementedError
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        if not is_enabled():
+            return handler(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = cache.make_key(
+            f"{self.cache_prefix}:{self.action}",
+            self.get_cache_scopes(
+                request, kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+            ),
+            request,
+        )
+
+        data = cache.get(key)
+        if data is not None:
+            if self.action == "list" and self.live_fields:
+                data = self.with_live_fields(data)
+            return Response(data, headers={"X-Cache": "HIT"})
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data)
+            response["X-Cache"] = "MISS"
+        return response
+
+    def with_live_fields(self, data):
+        """A copy of cached list `data` with `live_fields` read from the database."""
+        paginated = isinstance(data, dict)
+        rows = data["results"] if paginated else data
+        model = self.get_queryset().model
+        live = {
+            values["id"]: values
+            for values in model.objects.filter(
+                pk__in=[row["id"] for row in rows]
+            ).values("id", *self.live_fields)
+        }
+        rows = [{**row, **live.get(row["id"], {})} for row in rows]
+        return {**data, "results": rows} if paginated else rows
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,170 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from like.models import LikedItem
+from .models import Collection, Customer, Order, Product, Review, ReviewSummary
+
+
+def adjust(model, pk, field, delta):
+    """Add `delta` to a counter column in place, never below zero."""
+    if pk is None or not delta:
+        return
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def move(model, field, old_pk, new_pk):
+    if old_pk != new_pk:
+        adjust(model, old_pk, field, -1)
+        adjust(model, new_pk, field, 1)
+
+
+def adjust_rating(product_id, rating, delta):
+    """Count one `rating` in or out of the product's ReviewSummary."""
+    if rating is None:
+        return
+    stars = f"stars_{rating}"
+    queryset = ReviewSummary.objects.filter(pk=product_id)
+    if delta < 0:
+        queryset = queryset.filter(**{f"{stars}__gte": 1})
+    updated = queryset.update(
+        rating_count=F("rating_count") + delta,
+        rating_total=F("rating_total") + delta * rating,
+        **{stars: F(stars) + delta},
+    )
+    if not updated and delta > 0:
+        try:
+            with transaction.atomic():
+                ReviewSummary.objects.create(
+                    product_id=product_id,
+                    rating_count=1,
+                    rating_total=rating,
+                    **{stars: 1},
+                )
+        except IntegrityError:
+            # Created concurrently; count into that row instead.
+            adjust_rating(product_id, rating, delta)
+
+
+class Counter:
+    """A counter column on `model` counting the `source` rows pointing at it."""
+
+    def __init__(self, model, field, source, source_field, filters=None):
+        self.model = model
+        self.field = field
+        self.source = source
+        self.source_field = source_field
+        self.filters = filters or (lambda: {})
+
+    @property
+    def name(self):
+        return f"{self.model._meta.label}.{self.field}"
+
+    def actual(self, pks):
+        return dict(
+            self.source.objects.filter(
+                **{f"{self.source_field}__in": pks}, **self.filters()
+            )
+            .order_by()
+            .values_list(self.source_field)
+            .annotate(n=Count("*"))
+        )
+
+    def reconcile(self, batch_size=500):
+        """Rewrite drifted counters, `batch_size` rows per transaction."""
+        repaired = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                current = dict(
+                    self.model.objects.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .values_list("pk", self.field)[:batch_size]
+                )
+                if not current:
+                    return repaired
+                last_pk = max(current)
+                actual = self.actual(list(current))
+                stale = {
+                    pk: actual.get(pk, 0)
+                    for pk, value in current.items()
+                    if value != actual.get(pk, 0)
+                }
+                if stale:
+                    self.model.objects.filter(pk__in=stale).update(
+                        **{
+                            self.field: Case(
+                                *[
+                                    When(pk=pk, then=Value(n))
+                                    for pk, n in stale.items()
+                                ],
+                                output_field=IntegerField(),
+                            )
+                        }
+                    )
+                    repaired += len(stale)
+
+
+def product_likes():
+    return {"content_type": ContentType.objects.get_for_model(Product)}
+
+
+COUNTERS = [
+    Counter(Collection, "product_count", Product, "collection_id"),
+    Counter(Customer, "order_count", Order, "customer_id"),
+    Counter(Product, "review_count", Review, "product_id"),
+    Counter(Product, "like_count", LikedItem, "object_id", product_likes),
+]
+
+
+def reconcile_review_summaries(batch_size=500):
+    """Rewrite drifted ReviewSummary rows, `batch_size` products at a time."""
+    fields = ["rating_count", "rating_total"] + [f"stars_{n}" for n in range(1, 6)]
+    repaired = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            pks = list(
+                Product.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                return repaired
+            last_pk = pks[-1]
+            actual = {}
+            for product_id, rating, n in (
+                Review.objects.filter(product_id__in=pks, rating__isnull=False)
+                .order_by()
+                .values_list("product_id", "rating")
+                .annotate(n=Count("*"))
+            ):
+                summary = actual.setdefault(
+                    product_id, ReviewSummary(product_id=product_id)
+                )
+                summary.rating_count += n
+                summary.rating_total += n * rating
+                setattr(summary, f"stars_{rating}", n)
+            current = ReviewSummary.objects.in_bulk(pks)
+            missing, stale = [], []
+            for product_id in pks:
+                summary = actual.get(product_id, ReviewSummary(product_id=product_id))
+                if product_id not in current:
+                    if summary.rating_count:
+                        missing.append(summary)
+                elif any(
+                    getattr(current[product_id], field) != getattr(summary, field)
+                    for field in fields
+                ):
+                    stale.append(summary)
+            ReviewSummary.objects.bulk_create(missing)
+            ReviewSummary.objects.bulk_update(stale, fields)
+            repaired += len(missing) + len(stale)
+
+
+def reconcile(batch_size=500):
+    repaired = {counter.name: counter.reconcile(batch_size) for counter in COUNTERS}
+    repaired[ReviewSummary._meta.label] = reconcile_review_summaries(batch_size)
+    return repaired
@@ -0,0 +1,154 @@
+import csv
+import itertools
+import json
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+CHUNK_SIZE = 2000
+
+ORDER_COLUMNS = [
+    "order_id",
+    "placed_at",
+    "payment_status",
+    "customer_id",
+    "product_id",
+    "product_title",
+    "quantity",
+    "unit_price",
+]
+PRODUCT_COLUMNS = [
+    "id",
+    "title",
+    "slug",
+    "collection_id",
+    "price",
+    "effective_price",
+    "price_with_tax",
+    "inventory",
+    "review_count",
+    "like_count",
+    "last_update",
+]
+
+
+class CSVRenderer(BaseRenderer):
+    """Selects CSV exports; only errors are rendered, as JSON."""
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=JSONEncoder)
+
+
+class NDJSONRenderer(CSVRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class Echo:
+    """A file-like object whose write() hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, cls=JSONEncoder) + "\n"
+
+
+def chunks(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yield `queryset` in id order, `chunk_size` rows per query, each query
+    seeking past the last id. Not `.iterator()`: MySQLdb has no server-side
+    cursors and would buffer the whole result set in the client.
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+        last_pk = last["id"] if isinstance(last, dict) else last.pk
+
+
+def order_records(queryset, chunk_size=CHUNK_SIZE):
+    # The prefetch runs once per chunk, so memory stays bounded by chunk_size.
+    for order in itertools.chain.from_iterable(chunks(queryset, chunk_size)):
+        items = [
+            {
+                "product_id": item.product_id,
+                "product_title": item.product.title,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+            }
+            for item in order.order_items.all()
+        ]
+        yield {
+            "order_id": order.id,
+            "placed_at": order.placed_at,
+            "payment_status": order.payment_status,
+            "customer_id": order.customer_id,
+            "total_price": sum(
+                (item["quantity"] * item["unit_price"] for item in items), 0
+            ),
+            "order_items": items,
+        }
+
+
+def order_rows(records):
+    """One CSV row per order item; an order without items gets one row."""
+    empty = {"product_id": "", "product_title": "", "quantity": "", "unit_price": ""}
+    for record in records:
+        for item in record["order_items"] or [empty]:
+            yield {**record, **item}
+
+
+def product_records(queryset, chunk_size=CHUNK_SIZE):
+    return itertools.chain.from_iterable(
+        chunks(queryset.values(*PRODUCT_COLUMNS), chunk_size)
+    )
+
+
+def export_response(export_format, filename, lines):
+    content_type = {
+        "csv": "text/csv; charset=utf-8",
+        "ndjson": "application/x-ndjson",
+    }[export_format]
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{export_format}"'
+    )
+    return response
+
+
+def stream_orders(queryset, export_format, chunk_size=CHUNK_SIZE):
+    records = order_records(queryset, chunk_size)
+    if export_format == "csv":
+        lines = csv_lines(ORDER_COLUMNS, order_rows(records))
+    else:
+        lines = ndjson_lines(records)
+    return export_response(export_format, "orders", lines)
+
+
+def stream_products(queryset, export_format, chunk_size=CHUNK_SIZE):
+    records = product_records(queryset, chunk_size)
+    if export_format == "csv":
+        lines = csv_lines(PRODUCT_COLUMNS, records)
+    else:
+        lines = ndjson_lines(records)
+    return export_response(export_format, "products", lines)
@@ -1,8 +1,88 @@
-from django_filters.rest_framework import FilterSet
-from .models import Product
-
-
-class ProductFilter(FilterSet):
-    class Meta:
-        model = Product
-        fields = {"collection_id": ["exact"], "price": ["gt", "lt"]}
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Case, IntegerField, When
+from django_filters.rest_framework import FilterSet, NumberFilter
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+from tag.models import TaggedItem
+from . import search
+from .authentication import get_customer_id
+from .models import Order, Product
+
+
+class ProductFilter(FilterSet):
+    tag = NumberFilter(method="filter_tag")
+
+    class Meta:
+        model = Product
+        fields = {
+            "collection_id": ["exact"],
+            "price": ["gt", "lt"],
+            "effective_price": ["gt", "lt"],
+        }
+
+    def filter_tag(self, queryset, name, value):
+        # A subquery on the (tag, content_type) index rather than a join,
+        # which would repeat a product tagged twice.
+        return queryset.filter(
+            pk__in=TaggedItem.objects.filter(
+                tag_id=value, content_type=ContentType.objects.get_for_model(Product)
+            ).values("object_id")
+        )
+
+
+class OrderExportFilter(FilterSet):
+    class Meta:
+        model = Order
+        fields = {
+            "placed_at": ["gte", "lt"],
+            "payment_status": ["exact"],
+            "customer_id": ["exact"],
+        }
+
+
+class OwnerFilter(BaseFilterBackend):
+    """
+    Limit non-staff users to their own rows, matched on the view's
+    `owner_field` (default `customer_id`) without loading the customer.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if request.user.is_staff:
+            return queryset
+        owner_field = getattr(view, "owner_field", "customer_id")
+        return queryset.filter(**{owner_field: get_customer_id(request)})
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    Answer `?search=` from the product inverted index, ranked by relevance.
+    Falls back to SearchFilter's LIKE scans when the index is disabled or the
+    query has no indexable terms.
+
+    Views with `unranked_search` set (exports) get every match, through a
+    subquery, rather than the best MAX_RESULTS in rank order.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not search.is_enabled():
+            return super().filter_queryset(request, queryset, view)
+
+        if getattr(view, "unranked_search", False):
+            ranked = search.matches(" ".join(terms))
+            if ranked is None:
+                return super().filter_queryset(request, queryset, view)
+            return queryset.filter(pk__in=ranked.order_by().values("product_id"))
+
+        product_ids = search.search(" ".join(terms))
+        if product_ids is None:
+            return super().filter_queryset(request, queryset, view)
+
+        # Keep the relevance order unless the client asked for another one.
+        rank = Case(
+            *[When(pk=pk, then=position) for position, pk in enumerate(product_ids)],
+            output_field=IntegerField(),
+        )
+        queryset = queryset.filter(pk__in=product_ids)
+        if product_ids:
+            queryset = queryset.order_by(rank, "pk")
+        return queryset
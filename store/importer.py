@@ -0,0 +1,283 @@
+import csv
+import json
+import time
+from collections import Counter
+from functools import reduce
+from itertools import islice
+from operator import or_
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework import serializers
+from . import counters, pricing, search
+from .models import Collection, Product, slug_fits
+from .signals.handlers import invalidate_catalog
+
+FORMATS = ["csv", "json", "ndjson"]
+MAX_REPORTED_ERRORS = 1000
+
+
+class ProductRowSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    price = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=1)
+    inventory = serializers.IntegerField(min_value=0)
+    # A collection id or title.
+    collection = serializers.CharField()
+
+
+def guess_format(filename):
+    extension = filename.rsplit(".", 1)[-1].lower()
+    return {"jsonl": "ndjson"}.get(extension, extension)
+
+
+def read_rows(file, file_format):
+    """
+    Yield (line, row) from a text file. CSV and NDJSON are read lazily; a
+    JSON document has to be parsed whole, so prefer NDJSON for big files.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            # An empty cell means the column was not given, e.g. no `id`.
+            yield reader.line_num, {
+                key: value for key, value in row.items() if key and value != ""
+            }
+    elif file_format == "ndjson":
+        for line, text in enumerate(file, start=1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except ValueError as error:
+                    yield line, error
+    elif file_format == "json":
+        for index, row in enumerate(json.load(file), start=1):
+            yield index, row
+    else:
+        raise ValueError(f"Unsupported format {file_format!r}; use one of {FORMATS}.")
+
+
+class ProductImporter:
+    """
+    Create or update products from rows in batches: each batch is validated
+    in Python, resolves its collections in one query, gets unique slugs
+    without a query per row and is written with one bulk_create and one
+    bulk_update. Rows with an `id` update that product; the rest are new.
+
+    Bad rows are reported and skipped; they never abort the file. If a batch
+    hits a database error it is retried row by row so only the offending
+    rows fail.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.collections = {}
+        self.taken_slugs = set()
+        self.checked_slugs = set()
+        self.checked_prefixes = set()
+        self.report = {"rows": 0, "created": 0, "updated": 0, "failed": 0}
+        self.errors = []
+
+    def run(self, rows):
+        started = time.perf_counter()
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+        elapsed = time.perf_counter() - started
+        return {
+            **self.report,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": (
+                round(self.report["rows"] / elapsed, 1) if elapsed else None
+            ),
+            "errors": self.errors,
+        }
+
+    def fail(self, line, errors):
+        self.report["failed"] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+    def import_batch(self, batch):
+        self.report["rows"] += len(batch)
+        valid = []
+        for line, row in batch:
+            if not isinstance(row, dict):
+                self.fail(line, {"row": [str(row) or "Not an object."]})
+                continue
+            serializer = ProductRowSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((line, serializer.validated_data))
+            else:
+                self.fail(line, serializer.errors)
+
+        self.resolve_collections([data["collection"] for _, data in valid])
+        existing = Product.objects.in_bulk(
+            [data["id"] for _, data in valid if "id" in data]
+        )
+        # A product repeated within the batch gets its last row; applying
+        # both in one bulk_update would also count its move twice.
+        last_line = {data["id"]: line for line, data in valid if "id" in data}
+        rows = []
+        for line, data in valid:
+            if "id" in data and last_line[data["id"]] != line:
+                self.fail(
+                    line, {"id": [f"Superseded by line {last_line[data['id']]}."]}
+                )
+                continue
+            collection_id = self.collections.get(data["collection"])
+            if collection_id is None:
+                self.fail(
+                    line, {"collection": ["No collection with this id or title."]}
+                )
+            elif "id" in data and data["id"] not in existing:
+                self.fail(line, {"id": ["No product with this id."]})
+            else:
+                rows.append((line, data, collection_id))
+
+        try:
+            with transaction.atomic():
+                self.write(rows, existing)
+        except IntegrityError:
+            for row in rows:
+                try:
+                    with transaction.atomic():
+                        self.write([row], existing)
+                except IntegrityError as error:
+                    self.fail(row[0], {"row": [str(error)]})
+
+    def resolve_collections(self, keys):
+        missing = set(keys) - set(self.collections)
+        if not missing:
+            return
+        ids = [int(key) for key in missing if key.isdigit()]
+        titles = [key for key in missing if not key.isdigit()]
+        for pk, title in Collection.objects.filter(
+            Q(pk__in=ids) | Q(title__in=titles)
+        ).values_list("id", "title"):
+            self.collections[str(pk)] = pk
+            self.collections.setdefault(title, pk)
+
+    def unique_slugs(self, titles):
+        """Slugs for new products, suffixed -2, -3... past the ones in use."""
+        bases = [slugify(title) or "product" for title in titles]
+        # One query for the slugs themselves and one for the numbered
+        # variants of those that collide; everything else is in memory.
+        unchecked = set(bases) - self.checked_slugs
+        if unchecked:
+            self.taken_slugs.update(
+                Product.objects.filter(slug__in=unchecked).values_list(
+                    "slug", flat=True
+                )
+            )
+            self.checked_slugs |= unchecked
+        repeats = Counter(bases)
+        collided = {
+            base
+            for base in bases
+            if base in self.taken_slugs or repeats[base] > 1
+            if base not in self.checked_prefixes
+        }
+        if collided:
+            self.taken_slugs.update(
+                Product.objects.filter(
+                    reduce(or_, [Q(slug__startswith=f"{base}-") for base in collided])
+                ).values_list("slug", flat=True)
+            )
+            self.checked_prefixes |= collided
+
+        slugs = []
+        for base in bases:
+            slug, suffix = base, 1
+            while slug in self.taken_slugs:
+                suffix += 1
+                slug = f"{base}-{suffix}"
+            self.taken_slugs.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def write(self, rows, existing):
+        collection_deltas = Counter()
+
+        new = [(data, cid) for _, data, cid in rows if "id" not in data]
+        products = []
+        slugs = self.unique_slugs([data["title"] for data, _ in new])
+        for (data, collection_id), slug in zip(new, slugs):
+            product = Product(
+                title=data["title"],
+                slug=slug,
+                description=data["description"],
+                price=data["price"],
+                inventory=data["inventory"],
+                collection_id=collection_id,
+            )
+            product.effective_price = pricing.effective_price(product.price)
+            product.price_with_tax = pricing.with_tax(product.effective_price)
+            products.append(product)
+            collection_deltas[collection_id] += 1
+        Product.objects.bulk_create(products, batch_size=self.batch_size)
+        if all(product.pk for product in products):
+            created_ids = [product.pk for product in products]
+        else:
+            # No RETURNING on this backend; the new slugs are unique.
+            created_ids = list(
+                Product.objects.filter(slug__in=slugs).values_list("id", flat=True)
+            )
+
+        updates = []
+        renamed = []
+        now = timezone.now()
+        for _, data, collection_id in rows:
+            if "id" not in data:
+                continue
+            current = existing[data["id"]]
+            collection_deltas[current.collection_id] -= 1
+            collection_deltas[collection_id] += 1
+            product = Product(
+                id=data["id"],
+                title=data["title"],
+                slug=current.slug,
+                description=data["description"],
+                price=data["price"],
+                inventory=data["inventory"],
+                collection_id=collection_id,
+                last_update=now,
+            )
+            # A new title gets a new slug unless the old one still fits it.
+            if not slug_fits(current.slug, data["title"]):
+                renamed.append(product)
+            updates.append(product)
+        slugs = self.unique_slugs([product.title for product in renamed])
+        for product, slug in zip(renamed, slugs):
+            product.slug = slug
+        Product.objects.bulk_update(
+            updates,
+            [
+                "title",
+                "slug",
+                "description",
+                "price",
+                "inventory",
+                "collection",
+                "last_update",
+            ],
+            batch_size=self.batch_size,
+        )
+        updated_ids = [product.pk for product in updates]
+        # Updated products may carry promotions; recompute their prices.
+        pricing.reprice(Product.objects.filter(pk__in=updated_ids))
+
+        # bulk_create and bulk_update skip the signals behind these.
+        for collection_id, delta in collection_deltas.items():
+            counters.adjust(Collection, collection_id, "product_count", delta)
+        if search.is_enabled():
+            search.index_products(created_ids + updated_ids)
+        invalidate_catalog(updated_ids, set(collection_deltas))
+
+        self.report["created"] += len(products)
+        self.report["updated"] += len(updates)
@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from .models import Product
+
+
+class InsufficientInventory(Exception):
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Insufficient inventory for products {sorted(shortages)}")
+
+
+class _Shortage(Exception):
+    pass
+
+
+def reserve(quantities):
+    """
+    Take `quantities` ({product_id: quantity}) out of stock in a single
+    conditional UPDATE. Either every line is decremented or none is and
+    InsufficientInventory reports what is actually available.
+
+    Rows are locked in primary key order (MySQL honours ORDER BY on UPDATE)
+    so concurrent checkouts over overlapping carts cannot deadlock.
+    """
+    if not quantities:
+        return
+    product_ids = sorted(quantities)
+    needed = Case(
+        *[When(pk=pk, then=Value(quantities[pk])) for pk in product_ids],
+        output_field=IntegerField(),
+    )
+    try:
+        with transaction.atomic():
+            updated = (
+                Product.objects.filter(pk__in=product_ids, inventory__gte=needed)
+                .order_by("pk")
+                .update(inventory=F("inventory") - needed)
+            )
+            if updated != len(product_ids):
+                raise _Shortage
+    except _Shortage:
+        available = dict(
+            Product.objects.filter(pk__in=product_ids).values_list("id", "inventory")
+        )
+        raise InsufficientInventory(
+            {
+                pk: available.get(pk, 0)
+                for pk in product_ids
+                if available.get(pk, 0) < quantities[pk]
+            }
+        )
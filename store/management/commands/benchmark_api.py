@@ -0,0 +1,82 @@
+import json
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from store import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset into a throwaway database, replay a mix of "
+        "store API requests and report latency, queries per request and "
+        "requests/sec as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mix", default="default", choices=sorted(benchmark.MIXES))
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--collections", type=int, default=5)
+        parser.add_argument("--products", type=int, default=200)
+        parser.add_argument("--images", type=int, default=2)
+        parser.add_argument("--customers", type=int, default=20)
+        parser.add_argument("--cart-items", type=int, default=3)
+        parser.add_argument("--orders", type=int, default=2)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Disable the product response cache for the run.",
+        )
+        parser.add_argument("--output", help="Also write the JSON report here.")
+
+    def handle(self, *args, **options):
+        if options["products"] < max(3, options["cart_items"]):
+            raise CommandError("--products must cover the cart and checkout lines.")
+
+        cache_settings = {}
+        if options["no_cache"]:
+            cache_settings["STORE_RESPONSE_CACHE"] = {"ENABLED": False}
+        with benchmark.benchmark_database(), override_settings(**cache_settings):
+            report = self.run(options)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+
+    def run(self, options):
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+        dataset = benchmark.seed_dataset(
+            rng,
+            collections=options["collections"],
+            products=options["products"],
+            images=options["images"],
+            customers=options["customers"],
+            cart_items=options["cart_items"],
+            orders=options["orders"],
+        )
+        seeded = time.perf_counter() - started
+
+        report = benchmark.replay(
+            benchmark.MIXES[options["mix"]], options["requests"], dataset, rng
+        )
+        report["config"] = {
+            key: options[key]
+            for key in [
+                "mix",
+                "requests",
+                "collections",
+                "products",
+                "images",
+                "customers",
+                "cart_items",
+                "orders",
+                "seed",
+                "no_cache",
+            ]
+        }
+        report["seed_seconds"] = round(seeded, 3)
+        return report
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import urllib.error
+import urllib.request
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from store import benchmark, models
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync DRF read endpoints with their async variants on the "
+        "same workload. By default both run in-process against a throwaway "
+        "database: sync views from a pool of threads, like WSGI workers, and "
+        "async views from coroutines on one event loop, like an ASGI server. "
+        "With --sync-url and --async-url the same workload is sent over HTTP "
+        "to two running servers instead, e.g. `gunicorn ecommerce.wsgi -w 4` "
+        "and an ASGI server such as `gunicorn ecommerce.asgi -w 4 -k "
+        "uvicorn.workers.UvicornWorker`, both using the current database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--products", type=int, default=200)
+        parser.add_argument("--customers", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--sync-url", help="Base URL of a WSGI server.")
+        parser.add_argument("--async-url", help="Base URL of an ASGI server.")
+        parser.add_argument("--output", help="Also write the JSON report here.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        if bool(options["sync_url"]) != bool(options["async_url"]):
+            raise CommandError("--sync-url and --async-url go together.")
+
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        if options["sync_url"]:
+            report = self.run_http(rng, options)
+        else:
+            # Compare the views, not the response cache in front of them.
+            with benchmark.benchmark_database(), override_settings(
+                STORE_RESPONSE_CACHE={"ENABLED": False}
+            ):
+                report = self.run_in_process(rng, options)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+
+    def workload(self, rng, options):
+        product_ids = list(models.Product.objects.values_list("id", flat=True))
+        cart_ids = [str(pk) for pk in models.Cart.objects.values_list("id", flat=True)]
+        if not product_ids or not cart_ids:
+            raise CommandError("The database needs products and carts to read.")
+        return benchmark.read_workload(rng, options["requests"], product_ids, cart_ids)
+
+    def report(self, options, sync, async_):
+        report = {
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+        }
+        for name, (latencies, statuses, elapsed) in [("sync", sync), ("async", async_)]:
+            report[name] = dict(
+                benchmark.summarize(latencies, elapsed),
+                statuses=benchmark.count_statuses(statuses),
+            )
+        sync_rate = report["sync"].get("requests_per_sec")
+        async_rate = report["async"].get("requests_per_sec")
+        if sync_rate and async_rate:
+            report["async_speedup"] = round(async_rate / sync_rate, 2)
+        return report
+
+    def run_in_process(self, rng, options):
+        benchmark.seed_dataset(
+            rng, products=options["products"], customers=options["customers"]
+        )
+        workload = self.workload(rng, options)
+        clients = threading.local()
+
+        def fetch_sync(path):
+            if not hasattr(clients, "client"):
+                clients.client = Client(raise_request_exception=False)
+            return clients.client.get(path).status_code
+
+        async_client = AsyncClient(raise_request_exception=False)
+
+        async def fetch_async(path):
+            return (await async_client.get(path)).status_code
+
+        sync = benchmark.run_threaded(
+            [pair[0] for pair in workload], options["concurrency"], fetch_sync
+        )
+        async_ = asyncio.run(
+            benchmark.run_concurrent(
+                [pair[1] for pair in workload], options["concurrency"], fetch_async
+            )
+        )
+        return self.report(options, sync, async_)
+
+    def run_http(self, rng, options):
+        workload = self.workload(rng, options)
+
+        def fetcher(base_url):
+            base_url = base_url.rstrip("/")
+
+            def fetch(path):
+                try:
+                    with urllib.request.urlopen(base_url + path) as response:
+                        response.read()
+                        return response.status
+                except urllib.error.HTTPError as error:
+                    return error.code
+
+            return fetch
+
+        sync = benchmark.run_threaded(
+            [pair[0] for pair in workload],
+            options["concurrency"],
+            fetcher(options["sync_url"]),
+        )
+        # Both servers are driven the same way so only the server differs.
+        async_ = benchmark.run_threaded(
+            [pair[1] for pair in workload],
+            options["concurrency"],
+            fetcher(options["async_url"]),
+        )
+        return self.report(options, sync, async_)
@@ -0,0 +1,109 @@
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Sum
+from store import benchmark, models
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent checkouts against a throwaway database and report "
+        "throughput, latency and whether any stock was oversold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=20)
+        parser.add_argument("--inventory", type=int, default=50)
+        parser.add_argument("--customers", type=int, default=100)
+        parser.add_argument("--lines", type=int, default=3)
+        parser.add_argument("--quantity", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--max-retries", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the JSON report here.")
+
+    def handle(self, *args, **options):
+        # Retried lock conflicts would otherwise flood stderr with tracebacks.
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        with benchmark.benchmark_database():
+            report = self.run(options)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+
+    def run(self, options):
+        rng = random.Random(options["seed"])
+        products = benchmark.create_catalog(options["products"], options["inventory"])
+        users = benchmark.create_users(options["customers"])
+
+        jobs = queue.Queue()
+        for user in users:
+            cart = models.Cart.objects.create()
+            for product in rng.sample(products, min(options["lines"], len(products))):
+                models.CartItem.objects.create(
+                    cart=cart, product=product, quantity=options["quantity"]
+                )
+            jobs.put((benchmark.authenticated_client(user), str(cart.id)))
+
+        initial_stock = options["products"] * options["inventory"]
+        latencies, statuses = [], []
+        retries = 0
+        lock = threading.Lock()
+
+        def checkout(client, cart_id):
+            # SQLite cannot upgrade a read lock while another writer holds the
+            # database; those conflicts surface as 500s and are retried.
+            nonlocal retries
+            for _ in range(options["max_retries"]):
+                response = client.post("/store/orders/", {"cart_id": cart_id})
+                if response.status_code != 500:
+                    break
+                with lock:
+                    retries += 1
+                time.sleep(rng.random() / 100)
+            return response
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        client, cart_id = jobs.get_nowait()
+                    except queue.Empty:
+                        return
+                    started = time.perf_counter()
+                    response = checkout(client, cart_id)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        remaining = models.Product.objects.aggregate(total=Sum("inventory"))["total"]
+        sold = models.OrderItem.objects.aggregate(total=Sum("quantity"))["total"] or 0
+        return {
+            "threads": options["threads"],
+            "checkouts": benchmark.summarize(latencies, elapsed),
+            "orders_placed": statuses.count(200),
+            "rejected_out_of_stock": statuses.count(400),
+            "errors": len(statuses) - statuses.count(200) - statuses.count(400),
+            "retries": retries,
+            "units_sold": sold,
+            "oversold": remaining < 0 or initial_stock - remaining != sold,
+        }
@@ -0,0 +1,79 @@
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from store import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Against a throwaway database, time PATCH /auth/user/me/ for profile-only "
+        "edits, password changes and profile edits racing password changes, "
+        "and report latency per kind as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=40)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--output", help="Also write the JSON report here.")
+
+    def handle(self, *args, **options):
+        with benchmark.benchmark_database():
+            report = self.run(options)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+
+    def run(self, options):
+        concurrency = options["concurrency"]
+        users = benchmark.create_users(concurrency, prefix="profile")
+        clients = [benchmark.authenticated_client(user) for user in users]
+        phone_numbers = (f"+88698{n:07d}" for n in itertools.count())
+        latencies = defaultdict(list)
+        lock = threading.Lock()
+
+        def patch(item):
+            client, kind = item
+            if kind == "profile":
+                data = {"phone_number": next(phone_numbers)}
+            else:
+                data = {"password": "correct-horse-battery"}
+            started = time.perf_counter()
+            status = client.patch(
+                "/auth/user/me/", data, content_type="application/json"
+            ).status_code
+            with lock:
+                latencies[kind].append(time.perf_counter() - started)
+            return status
+
+        def run(name, kinds):
+            latencies.clear()
+            # run_threaded hands item i to thread i % concurrency, so every
+            # thread keeps to one user.
+            items = [(clients[i % concurrency], kind) for i, kind in enumerate(kinds)]
+            _, statuses, elapsed = benchmark.run_threaded(items, concurrency, patch)
+            report[name] = {
+                kind: benchmark.summarize(times, elapsed)
+                for kind, times in sorted(latencies.items())
+            }
+            report[name]["statuses"] = benchmark.count_statuses(statuses)
+
+        report = {}
+        run("profile_only", ["profile"] * options["requests"])
+        run("password_only", ["password"] * options["requests"])
+        # Half the threads change passwords while the others edit profiles:
+        # profile latency here shows whether hashing holds other requests up.
+        run(
+            "mixed",
+            [
+                "password" if i % concurrency < concurrency // 2 else "profile"
+                for i in range(options["requests"] * 2)
+            ],
+        )
+        report["config"] = {key: options[key] for key in ["requests", "concurrency"]}
+        return report
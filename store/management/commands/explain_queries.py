@@ -0,0 +1,100 @@
+import re
+import uuid
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from like.models import LikedItem
+from store import models
+from store.filter import ProductFilter
+from tag.models import TaggedItem
+
+# A plan line that reads a whole table without the help of an index. MySQL
+# plans come as traditional EXPLAIN rows, one per line with the columns
+# space separated (id, select_type, table, partitions, type, ...), so only
+# an access type of ALL on a real table counts; select_type may be two
+# words, and tables like <union1,2> are the server's own temporaries.
+FULL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"\bSCAN (?!.*\bUSING\b)(?!CONSTANT ROW)"),
+    "postgresql": re.compile(r"\bSeq Scan on\b"),
+    "mysql": re.compile(
+        r"^\S+ (?:(?:DEPENDENT|UNCACHEABLE) \S+|UNION RESULT|\S+) [^<\s]\S* \S+ ALL "
+    ),
+}
+
+
+def key_queries():
+    """The querysets behind the store's hot API and admin paths."""
+    product_type = ContentType.objects.get_for_model(models.Product)
+    return {
+        "products filtered by collection and price": ProductFilter(
+            {"collection_id": 1, "price__gt": 10, "price__lt": 100},
+            models.Product.objects.all(),
+        ).qs.order_by("price")[:10],
+        "products ordered by price (keyset page)": models.Product.objects.filter(
+            Q(price__gt=10) | Q(price=10, id__gt=1)
+        ).order_by("price", "id")[:11],
+        "products ordered by last update": models.Product.objects.order_by(
+            "last_update", "id"
+        )[:11],
+        "admin low stock products": models.Product.objects.filter(inventory__lt=10),
+        "search term prefix": models.ProductSearchTerm.objects.filter(
+            term__startswith="lam"
+        ),
+        "cart items": models.CartItem.objects.filter(cart_id=uuid.uuid4()),
+        "customer orders": models.Order.objects.filter(customer_id=1).order_by(
+            "-placed_at", "-id"
+        )[:10],
+        "staff orders": models.Order.objects.order_by("-placed_at", "-id")[:10],
+        "orders by payment status": models.Order.objects.filter(
+            payment_status=models.Order.PAYMENT_STATUS_PRNDING
+        ).order_by("placed_at")[:10],
+        "product reviews": models.Review.objects.filter(product_id=1).order_by("date"),
+        "tags of a product page": TaggedItem.objects.filter(
+            content_type=product_type, object_id__in=[1, 2, 3]
+        ).select_related("tag"),
+        "products with a tag": ProductFilter(
+            {"tag": 1}, models.Product.objects.all()
+        ).qs.order_by("id")[:10],
+        "products liked by a user": LikedItem.objects.filter(
+            user_id=1, content_type=product_type
+        ),
+    }
+
+
+def full_scans(plan, vendor=None):
+    pattern = FULL_SCAN_PATTERNS.get(vendor or connection.vendor)
+    if pattern is None:
+        return []
+    return [line.strip() for line in plan.splitlines() if pattern.search(line)]
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the key store API queries and flag the ones that fall back "
+        "to a full table scan. Small or empty tables can make the planner "
+        "prefer a scan, so run this against realistically sized data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail-on-scan",
+            action="store_true",
+            help="Exit with an error if any query scans a whole table.",
+        )
+
+    def handle(self, *args, **options):
+        flagged = []
+        for name, queryset in key_queries().items():
+            plan = queryset.explain()
+            scans = full_scans(plan)
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f"FULL SCAN  {name}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok         {name}"))
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+
+        if flagged and options["fail_on_scan"]:
+            raise CommandError(f"Full table scans in: {', '.join(flagged)}.")
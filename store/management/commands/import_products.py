@@ -0,0 +1,28 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from store import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV, JSON or NDJSON file with the "
+        "columns title, description, price, inventory, collection (an id or "
+        "title) and optionally id to update an existing product."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=importer.FORMATS)
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        file_format = options["format"] or importer.guess_format(options["path"])
+        if file_format not in importer.FORMATS:
+            raise CommandError(
+                f"Cannot tell the format of {options['path']}; pass --format."
+            )
+        with open(options["path"], newline="", encoding="utf-8-sig") as file:
+            report = importer.ProductImporter(options["batch_size"]).run(
+                importer.read_rows(file, file_format)
+            )
+        self.stdout.write(json.dumps(report, indent=2, default=str))
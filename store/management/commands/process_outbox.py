@@ -0,0 +1,75 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from store import outbox
+
+# Seconds between purges of old delivered events while the worker idles.
+PURGE_INTERVAL = 600
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver outbox events to their registered handlers in batches, "
+        "retrying failures with exponential backoff. Whenever the outbox is "
+        "drained, delivered events past the retention period are deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--max-attempts", type=int, default=outbox.MAX_ATTEMPTS)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when there is nothing to deliver.",
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=float,
+            default=outbox.RETENTION_DAYS,
+            help="Days delivered events are kept before they are purged.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Drain the due events and exit."
+        )
+
+    def handle(self, *args, **options):
+        delivered = failed = 0
+        started = time.perf_counter()
+        next_purge = 0.0
+        try:
+            while True:
+                batch_started = time.perf_counter()
+                stats = outbox.dispatch(options["batch_size"], options["max_attempts"])
+                if stats["claimed"]:
+                    elapsed = time.perf_counter() - batch_started
+                    delivered += stats["delivered"]
+                    failed += stats["failed"]
+                    self.stdout.write(
+                        f"{stats['delivered']} delivered, {stats['failed']} failed "
+                        f"in {elapsed:.3f}s "
+                        f"({stats['claimed'] / elapsed:.1f} events/s), "
+                        f"max lag {stats['max_lag']:.3f}s"
+                    )
+                    continue
+                if time.monotonic() >= next_purge:
+                    self.purge(options["retention_days"])
+                    next_purge = time.monotonic() + PURGE_INTERVAL
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Delivered {delivered} events ({failed} failures) "
+                f"at {delivered / elapsed:.1f} events/s."
+            )
+        )
+
+    def purge(self, retention_days):
+        purged = outbox.purge(timezone.now() - timedelta(days=retention_days))
+        if purged:
+            self.stdout.write(f"Purged {purged} delivered events.")
@@ -0,0 +1,33 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from store import importer, provisioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users and their customers from a CSV, JSON or NDJSON file with "
+        "the columns username, email, phone_number, first_name, last_name and "
+        "optionally password, birth_date and membership."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=importer.FORMATS)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Threads hashing passwords; defaults to PASSWORD_HASH_WORKERS.",
+        )
+
+    def handle(self, *args, **options):
+        file_format = options["format"] or importer.guess_format(options["path"])
+        if file_format not in importer.FORMATS:
+            raise CommandError(
+                f"Cannot tell the format of {options['path']}; pass --format."
+            )
+        with open(options["path"], newline="", encoding="utf-8-sig") as file:
+            report = provisioning.UserProvisioner(
+                options["batch_size"], options["workers"]
+            ).run(importer.read_rows(file, file_format))
+        self.stdout.write(json.dumps(report, indent=2, default=str))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from store import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} search terms."))
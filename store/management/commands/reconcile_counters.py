@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from store import counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the denormalized product, order, review and like counters "
+        "and repair any that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        repaired = counters.reconcile(options["batch_size"])
+        for name, count in repaired.items():
+            self.stdout.write(f"{name}: {count} repaired")
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired {sum(repaired.values())} counters.")
+        )
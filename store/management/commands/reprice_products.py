@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from store import pricing
+from store.models import Product
+from store.signals.handlers import invalidate_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every product's stored effective price and price with tax, "
+        "e.g. after a tax rate change or a bulk UPDATE of prices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        changed = pricing.reprice(Product.objects.all(), options["batch_size"])
+        invalidate_products(changed)
+        self.stdout.write(self.style.SUCCESS(f"Repriced {len(changed)} products."))
@@ -0,0 +1,135 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# The metrics of the request being handled on this thread/task, if any.
+current_request = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """In-process histograms keyed by metric name and label values."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.help = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.metrics.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def clear(self):
+        with self._lock:
+            self.metrics.clear()
+
+    def render(self):
+        """The Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.metrics.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    labels = ",".join(f'{label}="{value}"' for label, value in key)
+                    for bound, count in histogram.cumulative():
+                        bucket_labels = (
+                            f'{labels},le="{bound}"' if labels else f'le="{bound}"'
+                        )
+                        lines.append(f"{name}_bucket{{{bucket_labels}}} {count}")
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def render_counter(name, value, help_text):
+    return f"# HELP {name} {help_text}\n# TYPE {name} counter\n{name} {value}\n"
+
+
+def render_gauge(name, value, help_text):
+    return f"# HELP {name} {help_text}\n# TYPE {name} gauge\n{name} {value}\n"
+
+
+registry = Registry()
+registry.describe("store_request_duration_seconds", "Wall time per request.")
+registry.describe("store_request_db_seconds", "Time spent in SQL per request.")
+registry.describe("store_request_db_queries", "SQL queries per request.")
+registry.describe(
+    "store_request_serializer_seconds", "Time spent building serializer data."
+)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper().
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def time_serializer(serializer):
+    """
+    Make `serializer.data` report its build time to the current request by
+    wrapping this instance's to_representation; the class is left alone.
+    """
+    to_representation = serializer.to_representation
+
+    def timed_to_representation(instance):
+        metrics = current_request.get()
+        if metrics is None:
+            return to_representation(instance)
+        started = time.perf_counter()
+        try:
+            return to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+
+    serializer.to_representation = timed_to_representation
+    return serializer
+
+
+class SerializerTimingMixin:
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_request.get() is None or getattr(self, "swagger_fake_view", False):
+            return serializer
+        return time_serializer(serializer)
@@ -0,0 +1,62 @@
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from .metrics import QUERY_BUCKETS, RequestMetrics, current_request, registry
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, SQL time, serializer time and wall time for every
+    request, report them in a `Server-Timing` header and feed the in-process
+    histograms served by `/store/_metrics`. Enabled by STORE_REQUEST_METRICS.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "STORE_REQUEST_METRICS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        elapsed = time.perf_counter() - started
+
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+                f"serializer;dur={metrics.serializer_time * 1000:.2f}",
+                f"total;dur={elapsed * 1000:.2f}",
+            ]
+        )
+
+        labels = self.get_labels(request)
+        registry.observe("store_request_duration_seconds", labels, elapsed)
+        registry.observe("store_request_db_seconds", labels, metrics.db_time)
+        registry.observe(
+            "store_request_serializer_seconds", labels, metrics.serializer_time
+        )
+        registry.observe(
+            "store_request_db_queries", labels, metrics.queries, QUERY_BUCKETS
+        )
+        return response
+
+    def get_labels(self, request):
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return {"view": "unresolved", "action": ""}
+        view = getattr(match.func, "cls", None)
+        view_name = view.__name__ if view else match.func.__name__
+        # ViewSets map HTTP methods to actions (list, retrieve, ...).
+        actions = getattr(match.func, "actions", None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        return {"view": view_name, "action": action}
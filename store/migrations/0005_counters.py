@@ -0,0 +1,71 @@
+# Generated by Django 4.1.5 on 2026-10-17 18:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(n=Count("*"))
+            .values("n")
+        ),
+        0,
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    Collection = apps.get_model("store", "Collection")
+    Customer = apps.get_model("store", "Customer")
+    Product = apps.get_model("store", "Product")
+    Order = apps.get_model("store", "Order")
+    Review = apps.get_model("store", "Review")
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    LikedItem = apps.get_model("like", "LikedItem")
+
+    Collection.objects.update(
+        product_count=count_of(Product.objects.all(), "collection")
+    )
+    Customer.objects.update(order_count=count_of(Order.objects.all(), "customer"))
+    Product.objects.update(review_count=count_of(Review.objects.all(), "product"))
+    content_type = ContentType.objects.filter(app_label="store", model="product")
+    if content_type.exists():
+        likes = LikedItem.objects.filter(content_type=content_type.get())
+        Product.objects.update(like_count=count_of(likes, "object_id"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("like", "0001_initial"),
+        ("store", "0004_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collection",
+            name="product_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="customer",
+            name="order_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="like_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.1.5 on 2026-10-17 18:08
+
+from decimal import ROUND_HALF_UP, Decimal
+from django.db import migrations, models
+from django.db.models import Max
+
+# store.pricing as of this migration, frozen so later changes to it cannot
+# alter what the backfill computed.
+TAX_RATE = Decimal("0.10")
+CENT = Decimal("0.01")
+
+
+def backfill_prices(apps, schema_editor):
+    Product = apps.get_model("store", "Product")
+    products = (
+        Product.objects.annotate(best_discount=Max("promotions__discount"))
+        .only("id", "price")
+        .order_by("pk")
+    )
+    last_pk = 0
+    while True:
+        batch = list(products.filter(pk__gt=last_pk)[:500])
+        if not batch:
+            return
+        for product in batch:
+            price = Decimal(str(product.price))
+            if product.best_discount and product.best_discount > 0:
+                price *= 1 - min(Decimal(str(product.best_discount)), Decimal(1))
+            product.effective_price = price.quantize(CENT, ROUND_HALF_UP)
+            product.price_with_tax = (
+                product.effective_price * (1 + TAX_RATE)
+            ).quantize(CENT, ROUND_HALF_UP)
+        Product.objects.bulk_update(batch, ["effective_price", "price_with_tax"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0005_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="effective_price",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=6
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="price_with_tax",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=8
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["effective_price", "id"], name="product_effective_id_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
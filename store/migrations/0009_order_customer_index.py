@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-17 18:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0008_review_summary"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="customer",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="store.customer",
+            ),
+        ),
+    ]
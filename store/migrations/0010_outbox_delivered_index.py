@@ -0,0 +1,17 @@
+# Generated by Django 4.1.5 on 2026-10-17 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0009_order_customer_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="outboxevent",
+            index=models.Index(fields=["delivered_at"], name="outbox_delivered_idx"),
+        ),
+    ]
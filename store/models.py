@@ -1,142 +1,525 @@
-from uuid import uuid4
-from django.conf import settings
-from django.db import models
-from django.core.validators import MinValueValidator
-from django.utils.text import slugify
-
-# Create your models here.
-class Collection(models.Model):
-    title = models.CharField(max_length=255)
-    featured_product = models.ForeignKey(
-        "Product", null=True, on_delete=models.SET_NULL, related_name="featured_product"
-    )
-
-    def __str__(self):
-        return self.title
-
-
-class Promotion(models.Model):
-    description = models.CharField(max_length=255)
-    discount = models.FloatField()
-
-
-class Product(models.Model):
-    title = models.CharField(max_length=255)
-    description = models.TextField()
-    price = models.DecimalField(
-        decimal_places=2, max_digits=6, validators=[MinValueValidator(1)]
-    )
-    slug = models.SlugField(unique=True, null=True, blank=True)
-    inventory = models.IntegerField()
-    last_update = models.DateTimeField(auto_now=True)
-    collection = models.ForeignKey(
-        Collection, on_delete=models.PROTECT, related_name="product"
-    )
-    promotions = models.ManyToManyField(Promotion, null=True, blank=True)
-
-    def save(self, *args, **kwargs):
-        self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
-
-    def __str__(self):
-        return self.title
-
-
-class ProductImage(models.Model):
-    product = models.ForeignKey(
-        Product, on_delete=models.CASCADE, related_name="images"
-    )
-    image = models.ImageField(upload_to="django_product_images", blank=True)
-
-
-class Customer(models.Model):
-    MEMBERSHIP_BRONZE = "B"
-    MEMBERSHIP_SLIVER = "S"
-    MEMBERSHIP_GOLD = "G"
-    MEMBERSHIP_CHOICES = (
-        (MEMBERSHIP_BRONZE, "Bronze"),
-        (MEMBERSHIP_SLIVER, "Sliver"),
-        (MEMBERSHIP_GOLD, "Gold"),
-    )
-
-    birth_date = models.DateField(null=True, blank=True)
-    membership = models.CharField(
-        max_length=1, choices=MEMBERSHIP_CHOICES, default=MEMBERSHIP_BRONZE
-    )
-    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-
-    class Meta:
-        ordering = [
-            "user__first_name",
-            "user__last_name",
-            "membership",
-        ]
-
-    def first_name(self):
-        return self.user.first_name
-
-    def last_name(self):
-        return self.user.last_name
-
-    def __str__(self) -> str:
-        return f"{self.user.first_name} {self.user.last_name}"
-
-
-class Address(models.Model):
-    country = models.CharField(max_length=255)
-    city = models.CharField(max_length=255)
-    address = models.CharField(max_length=255)
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
-
-
-class Cart(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid4)
-    create_at = models.DateTimeField(auto_now_add=True)
-
-
-class CartItem(models.Model):
-    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="cart_items")
-    product = models.ForeignKey(Product, on_delete=models.PROTECT)
-    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
-
-    class Meta:
-        unique_together = [["product", "cart"]]
-
-
-class Order(models.Model):
-    PAYMENT_STATUS_PRNDING = "P"
-    PAYMENT_STATUS_COMPLETE = "C"
-    PAYMENT_STATUS_FAILED = "F"
-
-    PAYMENT_STATUS_CHOICES = (
-        (PAYMENT_STATUS_PRNDING, "Pending"),
-        (PAYMENT_STATUS_COMPLETE, "Complete"),
-        (PAYMENT_STATUS_FAILED, "Failed"),
-    )
-
-    placed_at = models.DateTimeField(auto_now_add=True)
-    payment_status = models.CharField(
-        max_length=1, choices=PAYMENT_STATUS_CHOICES, default=PAYMENT_STATUS_PRNDING
-    )
-    customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
-
-
-class OrderItem(models.Model):
-    order = models.ForeignKey(
-        Order, on_delete=models.PROTECT, related_name="order_items"
-    )
-    product = models.ForeignKey(Product, on_delete=models.PROTECT)
-    quantity = models.PositiveIntegerField()
-    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
-
-    class Meta:
-        unique_together = [["product", "order"]]
-
-
-class Review(models.Model):
-    product = models.ForeignKey(
-        Product, on_delete=models.CASCADE, related_name="reviews"
-    )
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
-    description = models.TextField()
-    date = models.DateField(auto_now_add=True)
+import re
+from decimal import Decimal
+from uuid import uuid4
+from django.conf import settings
+from django.contrib.contenttypes.fields import GenericRelation
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, ExpressionWrapper, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.utils import timezone
+from django.utils.text import slugify
+from like.models import LikedItem
+from tag.models import TaggedItem
+from . import pricing
+
+
+class CounterFieldsMixin:
+    """
+    Leaves `counter_fields` out of saves of existing rows. store.counters
+    moves them with F() updates, and writing back the value loaded with the
+    instance would undo any made since.
+    """
+
+    counter_fields = ()
+
+    def loaded_fields(self):
+        """The fields a save() without update_fields writes for an existing row."""
+        deferred = self.get_deferred_fields()
+        return [
+            field.attname
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname not in deferred
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get("force_insert"):
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                update_fields = self.loaded_fields()
+            kwargs["update_fields"] = [
+                name for name in update_fields if name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+# Create your models here.
+class Collection(CounterFieldsMixin, models.Model):
+    title = models.CharField(max_length=255)
+    featured_product = models.ForeignKey(
+        "Product", null=True, on_delete=models.SET_NULL, related_name="featured_product"
+    )
+    # Denormalized counters, kept current by store.signals.handlers and
+    # repaired by `manage.py reconcile_counters`.
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    counter_fields = ["product_count"]
+
+    def __str__(self):
+        return self.title
+
+
+def slug_fits(slug, title):
+    """Whether `slug` is the title's slug, or it numbered `-<n>` as a duplicate."""
+    base = slugify(title) or "product"
+    return bool(slug) and re.fullmatch(rf"{re.escape(base)}(-\d+)?", slug) is not None
+
+
+class Promotion(models.Model):
+    description = models.CharField(max_length=255)
+    discount = models.FloatField()
+
+
+class Product(CounterFieldsMixin, models.Model):
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    price = models.DecimalField(
+        decimal_places=2, max_digits=6, validators=[MinValueValidator(1)]
+    )
+    slug = models.SlugField(unique=True, null=True, blank=True)
+    inventory = models.IntegerField()
+    last_update = models.DateTimeField(auto_now=True)
+    collection = models.ForeignKey(
+        Collection, on_delete=models.PROTECT, related_name="product"
+    )
+    promotions = models.ManyToManyField(Promotion, null=True, blank=True)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    counter_fields = ["review_count", "like_count"]
+    # Lets the product list prefetch tags in one query; both relations are
+    # deleted with the product.
+    tagged_items = GenericRelation(TaggedItem)
+    liked_items = GenericRelation(LikedItem)
+    # `price` after the best promotion, and that with tax. Kept current by
+    # save() and the promotion signal handlers; see store.pricing.
+    effective_price = models.DecimalField(
+        max_digits=6, decimal_places=2, default=0, editable=False
+    )
+    price_with_tax = models.DecimalField(
+        max_digits=8, decimal_places=2, default=0, editable=False
+    )
+    price_fields = ["effective_price", "price_with_tax"]
+
+    class Meta:
+        indexes = [
+            # ProductFilter: collection_id with a price range.
+            models.Index(fields=["collection", "price"], name="product_coll_price_idx"),
+            # ?ordering=price / last_update, id breaks ties for keyset pages.
+            models.Index(fields=["price", "id"], name="product_price_id_idx"),
+            models.Index(fields=["last_update", "id"], name="product_updated_id_idx"),
+            models.Index(
+                fields=["effective_price", "id"], name="product_effective_id_idx"
+            ),
+            # Admin low-stock filter.
+            models.Index(fields=["inventory"], name="product_inventory_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the row lived so signal handlers can tell when a
+        # product moves between collections. Not when the column was
+        # deferred: without the old value there is no move to count.
+        if "collection_id" in instance.__dict__:
+            instance._loaded_collection_id = instance.collection_id
+        # Likewise, save() reprices only when the price moved since loading.
+        if "price" in instance.__dict__:
+            instance._loaded_price = instance.price
+        return instance
+
+    def unique_slug(self):
+        """The current slug if it still fits the title, else the first free one."""
+        if slug_fits(self.slug, self.title):
+            return self.slug
+        base = slugify(self.title) or "product"
+        taken = set(
+            Product.objects.filter(Q(slug=base) | Q(slug__startswith=f"{base}-"))
+            .exclude(pk=self.pk)
+            .values_list("slug", flat=True)
+        )
+        slug, suffix = base, 1
+        while slug in taken:
+            suffix += 1
+            slug = f"{base}-{suffix}"
+        return slug
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "title" in update_fields:
+            self.slug = self.unique_slug()
+            if update_fields is not None:
+                kwargs["update_fields"] = update_fields = {*update_fields, "slug"}
+        adding = self._state.adding or kwargs.get("force_insert")
+        if update_fields is None:
+            reprice = adding or self.price != getattr(self, "_loaded_price", None)
+        else:
+            reprice = "price" in update_fields
+        if reprice:
+            discount = None
+            if not adding:
+                discount = self.promotions.aggregate(best=Max("discount"))["best"]
+            self.effective_price = pricing.effective_price(self.price, discount)
+            self.price_with_tax = pricing.with_tax(self.effective_price)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *self.price_fields}
+        elif update_fields is None:
+            # Promotion changes reprice through store.signals.handlers; the
+            # values loaded with this instance may already be stale.
+            kwargs["update_fields"] = [
+                name for name in self.loaded_fields() if name not in self.price_fields
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_price = self.price
+
+    def __str__(self):
+        return self.title
+
+
+class ProductSearchTerm(models.Model):
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="search_terms"
+    )
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = [["term", "product"]]
+
+
+class ProductImage(models.Model):
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="images"
+    )
+    image = models.ImageField(upload_to="django_product_images", blank=True)
+
+
+class Customer(CounterFieldsMixin, models.Model):
+    MEMBERSHIP_BRONZE = "B"
+    MEMBERSHIP_SLIVER = "S"
+    MEMBERSHIP_GOLD = "G"
+    MEMBERSHIP_CHOICES = (
+        (MEMBERSHIP_BRONZE, "Bronze"),
+        (MEMBERSHIP_SLIVER, "Sliver"),
+        (MEMBERSHIP_GOLD, "Gold"),
+    )
+
+    birth_date = models.DateField(null=True, blank=True)
+    membership = models.CharField(
+        max_length=1, choices=MEMBERSHIP_CHOICES, default=MEMBERSHIP_BRONZE
+    )
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    order_count = models.PositiveIntegerField(default=0, editable=False)
+    counter_fields = ["order_count"]
+
+    class Meta:
+        ordering = [
+            "user__first_name",
+            "user__last_name",
+            "membership",
+        ]
+
+    def first_name(self):
+        return self.user.first_name
+
+    def last_name(self):
+        return self.user.last_name
+
+    def __str__(self) -> str:
+        return f"{self.user.first_name} {self.user.last_name}"
+
+
+class Address(models.Model):
+    country = models.CharField(max_length=255)
+    city = models.CharField(max_length=255)
+    address = models.CharField(max_length=255)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+
+
+MONEY = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Cart total summed in SQL, with the items prefetched in one query."""
+        return self.prefetch_related(
+            models.Prefetch("cart_items", queryset=CartItem.objects.with_subtotals())
+        ).annotate(
+            total_price=Coalesce(
+                Sum(
+                    F("cart_items__quantity")
+                    * F("cart_items__product__effective_price")
+                ),
+                Value(Decimal(0)),
+                output_field=MONEY,
+            )
+        )
+
+
+class Cart(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid4)
+    create_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CartQuerySet.as_manager()
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_subtotals(self):
+        return (
+            self.select_related("product")
+            .only(
+                "cart_id",
+                "quantity",
+                "product__id",
+                "product__title",
+                "product__price",
+                "product__effective_price",
+            )
+            .annotate(
+                subtotal=ExpressionWrapper(
+                    F("quantity") * F("product__effective_price"), output_field=MONEY
+                )
+            )
+        )
+
+
+class CartItemManager(models.Manager.from_queryset(CartItemQuerySet)):
+    def add(self, cart_id, product_id, quantity):
+        """
+        Add `quantity` of a product to a cart without a read-modify-write:
+        increment the row in place and only insert when it does not exist.
+        A concurrent insert of the same row surfaces as an IntegrityError,
+        after which the increment is guaranteed to find it.
+        """
+        item = self.filter(cart_id=cart_id, product_id=product_id)
+        if not item.update(quantity=F("quantity") + quantity):
+            try:
+                with transaction.atomic():
+                    self.create(
+                        cart_id=cart_id, product_id=product_id, quantity=quantity
+                    )
+            except IntegrityError:
+                item.update(quantity=F("quantity") + quantity)
+        return item.select_related("product").get()
+
+    def add_many(self, cart_id, quantities):
+        """
+        Add several products at once: one SELECT to see which rows exist, one
+        UPDATE incrementing all of them, one INSERT for the rest.
+        """
+        existing = set(
+            self.filter(cart_id=cart_id, product_id__in=quantities).values_list(
+                "product_id", flat=True
+            )
+        )
+        if existing:
+            self.filter(cart_id=cart_id, product_id__in=existing).update(
+                quantity=F("quantity")
+                + Case(
+                    *[When(product_id=pk, then=quantities[pk]) for pk in existing],
+                    output_field=models.PositiveIntegerField(),
+                )
+            )
+        missing = [pk for pk in quantities if pk not in existing]
+        try:
+            with transaction.atomic():
+                self.bulk_create(
+                    [
+                        self.model(
+                            cart_id=cart_id, product_id=pk, quantity=quantities[pk]
+                        )
+                        for pk in missing
+                    ]
+                )
+        except IntegrityError:
+            # Someone else inserted one of the rows meanwhile.
+            for pk in missing:
+                self.add(cart_id, pk, quantities[pk])
+        return self.filter(cart_id=cart_id, product_id__in=quantities).select_related(
+            "product"
+        )
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="cart_items")
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+
+    objects = CartItemManager()
+
+    class Meta:
+        unique_together = [["product", "cart"]]
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """
+        Everything OrderSerializer renders, in two queries per page: the
+        orders with their total summed in SQL, and one prefetch of the items
+        joined to the product columns the response shows.
+        """
+        items = OrderItem.objects.select_related("product").only(
+            "order_id",
+            "quantity",
+            "unit_price",
+            "product__id",
+            "product__title",
+            "product__price",
+            "product__effective_price",
+        )
+        return self.prefetch_related(
+            models.Prefetch("order_items", queryset=items)
+        ).annotate(
+            total_price=Coalesce(
+                Sum(F("order_items__quantity") * F("order_items__unit_price")),
+                Value(Decimal(0)),
+                output_field=MONEY,
+            )
+        )
+
+
+class Order(models.Model):
+    PAYMENT_STATUS_PRNDING = "P"
+    PAYMENT_STATUS_COMPLETE = "C"
+    PAYMENT_STATUS_FAILED = "F"
+
+    PAYMENT_STATUS_CHOICES = (
+        (PAYMENT_STATUS_PRNDING, "Pending"),
+        (PAYMENT_STATUS_COMPLETE, "Complete"),
+        (PAYMENT_STATUS_FAILED, "Failed"),
+    )
+
+    placed_at = models.DateTimeField(auto_now_add=True)
+    payment_status = models.CharField(
+        max_length=1, choices=PAYMENT_STATUS_CHOICES, default=PAYMENT_STATUS_PRNDING
+    )
+    # order_cust_placed_idx leads with customer and serves every lookup by
+    # it, so the foreign key gets no index of its own.
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT, db_index=False)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # A customer's orders, newest first.
+            models.Index(
+                fields=["customer", "-placed_at", "-id"], name="order_cust_placed_idx"
+            ),
+            # Staff listing, newest first.
+            models.Index(fields=["-placed_at", "-id"], name="order_placed_idx"),
+            models.Index(
+                fields=["payment_status", "placed_at"], name="order_status_placed_idx"
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_customer_id = instance.__dict__.get("customer_id")
+        return instance
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(
+        Order, on_delete=models.PROTECT, related_name="order_items"
+    )
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    class Meta:
+        unique_together = [["product", "order"]]
+
+
+class Review(models.Model):
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="reviews"
+    )
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    description = models.TextField()
+    date = models.DateField(auto_now_add=True)
+    rating = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1), MaxValueValidator(5)],
+    )
+
+    class Meta:
+        indexes = [
+            # A product's reviews, newest first, id breaking ties for keyset
+            # pages.
+            models.Index(
+                fields=["product", "-date", "-id"], name="review_product_date_idx"
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "rating" in instance.__dict__:
+            instance._loaded_rating = instance.rating
+        return instance
+
+
+class ReviewSummary(models.Model):
+    """
+    A product's ratings rolled up, kept current by the Review signal
+    handlers and repaired by `reconcile_counters`.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="review_summary",
+    )
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return round(Decimal(self.rating_total) / self.rating_count, 2)
+
+
+class OutboxEvent(models.Model):
+    """
+    An event written in the same transaction as the change it describes and
+    delivered after commit by the `process_outbox` worker.
+    """
+
+    STATUS_PENDING = "P"
+    STATUS_DELIVERED = "D"
+    STATUS_FAILED = "F"
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_DELIVERED, "Delivered"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=1, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Not picked up before this time: retries back off, claims hold a lease.
+    available_at = models.DateTimeField(default=timezone.now)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's claim query: due pending events, oldest first.
+            models.Index(
+                fields=["status", "available_at", "id"], name="outbox_due_idx"
+            ),
+            # Recent deliveries for backlog(), old ones for purge().
+            models.Index(fields=["delivered_at"], name="outbox_delivered_idx"),
+        ]
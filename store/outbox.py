@@ -0,0 +1,185 @@
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import (
+    Avg,
+    Count,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Max,
+    Min,
+    Q,
+)
+from django.utils import timezone
+from .models import Order, OutboxEvent
+from .signals import order_created
+
+MAX_ATTEMPTS = 8
+BACKOFF_SECONDS = 2
+MAX_BACKOFF_SECONDS = 600
+# How long a claimed event stays invisible to other workers.
+LEASE_SECONDS = 60
+# Deliveries this recent make up the throughput and lag in backlog().
+RECENT_SECONDS = 300
+# Delivered events older than this are purged by process_outbox.
+RETENTION_DAYS = 7
+
+handlers = defaultdict(list)
+
+
+def handler(topic):
+    """
+    Register `function(events)` to receive batches of `topic` events.
+    Delivery is at least once, so handlers must tolerate repeats, e.g. by
+    keying their side effects on `event.pk`.
+    """
+
+    def register(function):
+        handlers[topic].append(function)
+        return function
+
+    return register
+
+
+def publish(topic, payload):
+    """Queue an event; it is only ever delivered if the transaction commits."""
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def backoff(attempts):
+    return min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+
+
+def claim(batch_size, now):
+    """Lease up to `batch_size` due events, oldest first, to this worker."""
+    with transaction.atomic():
+        due = OutboxEvent.objects.filter(
+            status=OutboxEvent.STATUS_PENDING, available_at__lte=now
+        ).order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            # Concurrent workers take different events instead of waiting.
+            due = due.select_for_update(skip_locked=True)
+        events = list(due[:batch_size])
+        if events:
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                attempts=F("attempts") + 1,
+                available_at=now + timedelta(seconds=LEASE_SECONDS),
+            )
+    for event in events:
+        event.attempts += 1
+    return events
+
+
+def deliver(events):
+    """
+    Hand each topic's events to its handlers in one batch. If a batch
+    fails its events are retried one by one, so a single bad event does
+    not hold back the rest. Returns the errors by event id.
+    """
+    by_topic = defaultdict(list)
+    for event in events:
+        by_topic[event.topic].append(event)
+
+    errors = {}
+    for topic, batch in by_topic.items():
+        for function in handlers[topic]:
+            try:
+                function(batch)
+            except Exception:
+                for event in batch:
+                    try:
+                        function([event])
+                    except Exception:
+                        errors[event.pk] = traceback.format_exc()
+    return errors
+
+
+def dispatch(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """
+    Claim and deliver one batch. Failed events come back after an
+    exponential backoff until they run out of attempts.
+    """
+    events = claim(batch_size, timezone.now())
+    errors = deliver(events)
+    now = timezone.now()
+
+    delivered = [event for event in events if event.pk not in errors]
+    OutboxEvent.objects.filter(pk__in=[event.pk for event in delivered]).update(
+        status=OutboxEvent.STATUS_DELIVERED, delivered_at=now, last_error=""
+    )
+    failed = [event for event in events if event.pk in errors]
+    for event in failed:
+        event.last_error = errors[event.pk]
+        if event.attempts >= max_attempts:
+            event.status = OutboxEvent.STATUS_FAILED
+        else:
+            event.available_at = now + timedelta(seconds=backoff(event.attempts))
+    OutboxEvent.objects.bulk_update(failed, ["status", "available_at", "last_error"])
+
+    lags = [(now - event.created_at).total_seconds() for event in delivered]
+    return {
+        "claimed": len(events),
+        "delivered": len(delivered),
+        "failed": len(failed),
+        "max_lag": max(lags, default=0.0),
+    }
+
+
+def backlog():
+    """
+    Read from the outbox table, so any process can report it: pending and
+    failed counts, the age in seconds of the oldest pending event, and over
+    the last RECENT_SECONDS the deliveries per second and their mean and
+    worst lag in seconds.
+    """
+    now = timezone.now()
+    pending = Q(status=OutboxEvent.STATUS_PENDING)
+    stats = OutboxEvent.objects.exclude(status=OutboxEvent.STATUS_DELIVERED).aggregate(
+        pending=Count("id", filter=pending),
+        failed=Count("id", filter=Q(status=OutboxEvent.STATUS_FAILED)),
+        oldest=Min("created_at", filter=pending),
+    )
+    lag = ExpressionWrapper(
+        F("delivered_at") - F("created_at"), output_field=DurationField()
+    )
+    recent = OutboxEvent.objects.filter(
+        delivered_at__gte=now - timedelta(seconds=RECENT_SECONDS)
+    ).aggregate(delivered=Count("id"), mean_lag=Avg(lag), max_lag=Max(lag))
+
+    oldest = stats.pop("oldest")
+    stats["oldest_age"] = (now - oldest).total_seconds() if oldest else 0.0
+    stats["delivery_rate"] = recent["delivered"] / RECENT_SECONDS
+    for key in ["mean_lag", "max_lag"]:
+        stats[key] = recent[key].total_seconds() if recent[key] else 0.0
+    return stats
+
+
+def purge(before, batch_size=1000):
+    """
+    Delete events delivered before `before`, `batch_size` rows per DELETE.
+    Returns how many went.
+    """
+    delivered = OutboxEvent.objects.filter(delivered_at__lt=before).order_by("pk")
+    purged = 0
+    while True:
+        ids = list(delivered.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return purged
+        purged += OutboxEvent.objects.filter(pk__in=ids).delete()[0]
+
+
+@handler("order.created")
+def send_order_created(events):
+    """
+    Fire `order_created` for the events' orders. Its receivers now run in
+    the worker, after commit, with the order and its items loaded.
+    """
+    orders = Order.objects.with_items().in_bulk(
+        [event.payload["order_id"] for event in events]
+    )
+    for event in events:
+        order = orders.get(event.payload["order_id"])
+        if order is not None:
+            order_created.send(Order, order=order)
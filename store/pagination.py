@@ -1,5 +1,355 @@
-from rest_framework.pagination import PageNumberPagination
-
-
-class DefaultPagination(PageNumberPagination):
-    page_size = 10
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from functools import cached_property, partial
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .cache import get_response_cache
+
+
+class DefaultPagination(PageNumberPagination):
+    page_size = 10
+
+
+class CountFreePage(Page):
+    def has_next(self):
+        return self.paginator.has_more
+
+
+class CountFreePaginator(Paginator):
+    """
+    A Paginator that never counts: each page reads `per_page + 1` rows and
+    the extra row only tells whether a next page exists.
+    """
+
+    has_more = False
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom : bottom + self.per_page + 1])
+        if not objects and number > 1:
+            raise EmptyPage("That page contains no results")
+        self.has_more = len(objects) > self.per_page
+        # Only as many pages as have been seen; enough for the page controls.
+        self.__dict__["num_pages"] = number + 1 if self.has_more else number
+        return self._get_page(objects[: self.per_page], number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return CountFreePage(*args, **kwargs)
+
+
+class CountFreePagination(PageNumberPagination):
+    """Page numbers without `count`: no COUNT(*) is ever issued."""
+
+    django_paginator_class = CountFreePaginator
+    last_page_strings = ()
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        del response_schema["properties"]["count"]
+        return response_schema
+
+
+def estimate_table_rows(model, using="default"):
+    """
+    The planner's row estimate for `model`'s table, or None when the backend
+    keeps no statistics (SQLite before ANALYZE, a never-analyzed PostgreSQL
+    table).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(table)],
+            )
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            # The first number of a stat row is the number of rows indexed.
+            cursor.execute(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(CountFreePaginator):
+    def __init__(self, object_list, per_page, counter, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.counter = counter
+
+    @cached_property
+    def count(self):
+        return self.counter(self.object_list)
+
+
+class EstimatedCountPagination(CountFreePagination):
+    """
+    Page numbers whose `count` is exact only while it is cheap. Once the
+    table holds `estimate_threshold` rows (by the planner's statistics) an
+    unfiltered listing reports the planner's estimate, and a filtered one
+    reports an exact count cached for `count_timeout` seconds under the
+    signature of its WHERE clause.
+
+    The count is only reported. Pages are found and `next` decided the
+    count-free way, by reading one extra row, so an estimate that is off
+    never turns a real page into a 404 or links to an empty one.
+    """
+
+    estimate_threshold = 10000
+    count_timeout = 60
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            EstimatedCountPaginator, counter=self.get_count
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.page.paginator.count),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return PageNumberPagination.get_paginated_response_schema(self, schema)
+
+    def get_count(self, queryset):
+        estimate = estimate_table_rows(queryset.model, queryset.db)
+        if estimate is None or estimate < self.estimate_threshold:
+            return queryset.count()
+
+        query = queryset.order_by().query
+        if not query.where and not query.distinct:
+            return estimate
+        sql, params = query.sql_with_params()
+        signature = hashlib.md5(f"{sql}|{params!r}".encode()).hexdigest()
+        key = f"count:{queryset.model._meta.db_table}:{signature}"
+        backend = get_response_cache().backend
+        count = backend.get(key)
+        if count is None:
+            count = queryset.count()
+            backend.set(key, count, self.count_timeout)
+        return count
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek-method pagination: every page is `WHERE (key, id) > (last_key, last_id)
+    ORDER BY key, id LIMIT page_size + 1`, so page N costs the same as page 1
+    and no COUNT(*) is issued.
+
+    The sort key is taken from the view's `ordering` query parameter when it
+    names one of `ordering_fields`; `id` always breaks ties so the order is
+    total even when many rows share a price or timestamp.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    ordering_param = api_settings.ORDERING_PARAM
+    ordering_fields = ["id"]
+    default_ordering = "id"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, view)
+
+        field = self.ordering.lstrip("-")
+        descending = self.ordering.startswith("-")
+        self.cursor = self.decode_cursor(request, queryset.model._meta.get_field(field))
+        reverse = bool(self.cursor and self.cursor["r"])
+
+        # Walking backwards is the same seek with every comparison flipped.
+        if reverse:
+            descending = not descending
+        direction = "-" if descending else ""
+        queryset = queryset.order_by(direction + field, direction + "id")
+
+        if self.cursor:
+            op = "lt" if descending else "gt"
+            value, pk = self.cursor["v"], self.cursor["id"]
+            queryset = queryset.filter(
+                Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"id__{op}": pk})
+            )
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_ordering(self, request, view):
+        ordering_fields = getattr(view, "ordering_fields", None) or []
+        allowed = set(self.ordering_fields) | set(ordering_fields)
+        param = request.query_params.get(self.ordering_param, "")
+        # Only the leading term drives the seek; `id` is appended below.
+        term = param.split(",")[0].strip()
+        if term.lstrip("-") in allowed:
+            return term
+        return self.default_ordering
+
+    def decode_cursor(self, request, field):
+        """The cursor with its seek value converted by `field`, or NotFound."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            if cursor["o"] != self.ordering:
+                raise ValueError("cursor belongs to a different ordering")
+            cursor["id"] = int(cursor["id"])
+            cursor["r"] = bool(cursor["r"])
+            # A tampered value would otherwise fail in the seek filter.
+            if cursor["v"] is None:
+                raise ValueError("cursor has no value")
+            cursor["v"] = field.to_python(cursor["v"])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, obj, reverse):
+        value = getattr(obj, self.ordering.lstrip("-"))
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        cursor = {"o": self.ordering, "v": value, "id": obj.pk, "r": int(reverse)}
+        encoded = urlsafe_b64encode(json.dumps(cursor).encode()).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+
+class ReviewPagination(KeysetPagination):
+    """A product's reviews newest first, seeking on (date, id)."""
+
+    ordering_fields = ["date", "id"]
+    default_ordering = "-date"
+
+
+class ProductPagination(EstimatedCountPagination):
+    """
+    Page-number pagination by default; `?pagination=cursor` (or any request
+    carrying a `cursor`) switches to keyset pagination over the catalog.
+    """
+
+    mode_query_param = "pagination"
+    keyset_class = KeysetPagination
+
+    def __init__(self):
+        self.keyset = None
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,15 +1,25 @@
-from rest_framework import permissions
-
-
-class IsAdminOrReadOnly(permissions.BasePermission):
-    def has_permission(self, request, view):
-        if request.method in permissions.SAFE_METHODS:  # 安全方法(GET,OPTION,HEAD)
-            return True
-        return bool(request.user and request.user.is_staff)
-
-
-class OwnerOrAdmin(permissions.BasePermission):
-    def has_object_permission(self, request, view, obj):
-        if request.method in permissions.SAFE_METHODS:
-            return True
-        return bool(obj.customer.user == request.user or request.user.is_staff)
+from rest_framework import permissions
+from .authentication import get_customer_id
+
+
+class IsAdminOrReadOnly(permissions.BasePermission):
+    def has_permission(self, request, view):
+        if request.method in permissions.SAFE_METHODS:  # 安全方法(GET,OPTION,HEAD)
+            return True
+        return bool(request.user and request.user.is_staff)
+
+
+class OwnerOrAdmin(permissions.BasePermission):
+    """
+    Staff, or the customer an object belongs to. Ownership is compared by
+    `customer_id` against the request's cached customer id, so checking an
+    object never loads its customer or user.
+    """
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated)
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS or request.user.is_staff:
+            return True
+        return obj.customer_id == get_customer_id(request)
@@ -0,0 +1,46 @@
+from decimal import ROUND_HALF_UP, Decimal
+from django.db.models import Max
+
+TAX_RATE = Decimal("0.10")
+CENT = Decimal("0.01")
+
+
+def effective_price(price, discount=None):
+    """
+    `price` less the best promotion. A promotion's `discount` is the fraction
+    taken off, so 0.15 is 15% off; promotions do not stack.
+    """
+    price = Decimal(str(price))
+    if discount and discount > 0:
+        price *= 1 - min(Decimal(str(discount)), Decimal(1))
+    return price.quantize(CENT, ROUND_HALF_UP)
+
+
+def with_tax(price):
+    return (price * (1 + TAX_RATE)).quantize(CENT, ROUND_HALF_UP)
+
+
+def reprice(queryset, batch_size=500):
+    """
+    Recompute the stored `effective_price` and `price_with_tax` of the
+    products in `queryset`, one bulk UPDATE per batch. Returns the ids of
+    the products that changed.
+    """
+    products = (
+        queryset.annotate(best_discount=Max("promotions__discount"))
+        .only("id", "price", "effective_price", "price_with_tax")
+        .order_by("pk")
+    )
+    changed = []
+    for product in products.iterator(chunk_size=batch_size):
+        price = effective_price(product.price, product.best_discount)
+        if (price, with_tax(price)) != (
+            product.effective_price,
+            product.price_with_tax,
+        ):
+            product.effective_price, product.price_with_tax = price, with_tax(price)
+            changed.append(product)
+    queryset.model.objects.bulk_update(
+        changed, ["effective_price", "price_with_tax"], batch_size=batch_size
+    )
+    return [product.pk for product in changed]
@@ -0,0 +1,178 @@
+import time
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from phonenumber_field.serializerfields import PhoneNumberField
+from rest_framework import serializers
+from core.hashers import HashingPool
+from .importer import MAX_REPORTED_ERRORS
+from .models import Customer
+
+UNIQUE_FIELDS = ["username", "email", "phone_number"]
+
+
+class UserRowSerializer(serializers.Serializer):
+    username = serializers.CharField(
+        max_length=150, validators=[UnicodeUsernameValidator()]
+    )
+    email = serializers.EmailField()
+    phone_number = PhoneNumberField()
+    first_name = serializers.CharField(max_length=255)
+    last_name = serializers.CharField(max_length=255)
+    # Without one the account gets an unusable password.
+    password = serializers.CharField(required=False)
+    birth_date = serializers.DateField(required=False)
+    membership = serializers.ChoiceField(Customer.MEMBERSHIP_CHOICES, required=False)
+
+    def validate(self, data):
+        if "password" in data:
+            user = get_user_model()(
+                username=data["username"],
+                email=data["email"],
+                first_name=data["first_name"],
+                last_name=data["last_name"],
+            )
+            try:
+                validate_password(data["password"], user)
+            except DjangoValidationError as error:
+                raise serializers.ValidationError({"password": error.messages})
+        return data
+
+
+def unique_value(data, field):
+    # Phone numbers compare in the E.164 form the column stores.
+    return str(data[field])
+
+
+class UserProvisioner:
+    """
+    Create users and their customers in batches: each batch is validated in
+    Python, checked for taken usernames, emails and phone numbers with one
+    query per column, has its passwords hashed across a thread pool and is
+    written with one bulk_create of users and one of customers, so no user
+    is left without a customer.
+
+    Bad rows are reported and skipped, as with ProductImporter.
+    """
+
+    def __init__(self, batch_size=500, workers=None):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.report = {"rows": 0, "created": 0, "failed": 0}
+        self.errors = []
+
+    def run(self, rows):
+        started = time.perf_counter()
+        rows = iter(rows)
+        with HashingPool(self.workers) as self.pool:
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self.provision_batch(batch)
+        elapsed = time.perf_counter() - started
+        return {
+            **self.report,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": (
+                round(self.report["rows"] / elapsed, 1) if elapsed else None
+            ),
+            "errors": self.errors,
+        }
+
+    def fail(self, line, errors):
+        self.report["failed"] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+    def provision_batch(self, batch):
+        self.report["rows"] += len(batch)
+        valid = []
+        for line, row in batch:
+            if not isinstance(row, dict):
+                self.fail(line, {"row": [str(row) or "Not an object."]})
+                continue
+            serializer = UserRowSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((line, serializer.validated_data))
+            else:
+                self.fail(line, serializer.errors)
+
+        User = get_user_model()
+        taken = {
+            field: {
+                str(value)
+                for value in User.objects.filter(
+                    **{f"{field}__in": [unique_value(data, field) for _, data in valid]}
+                ).values_list(field, flat=True)
+            }
+            for field in UNIQUE_FIELDS
+        }
+        rows = []
+        for line, data in valid:
+            clashes = [
+                field
+                for field in UNIQUE_FIELDS
+                if unique_value(data, field) in taken[field]
+            ]
+            if clashes:
+                self.fail(line, {field: ["Already in use."] for field in clashes})
+                continue
+            for field in UNIQUE_FIELDS:
+                taken[field].add(unique_value(data, field))
+            rows.append((line, data))
+
+        hashes = self.pool.hash(data.get("password") for _, data in rows)
+        rows = [(line, data, hashed) for (line, data), hashed in zip(rows, hashes)]
+        try:
+            with transaction.atomic():
+                self.write(rows)
+        except IntegrityError:
+            for row in rows:
+                try:
+                    with transaction.atomic():
+                        self.write([row])
+                except IntegrityError as error:
+                    self.fail(row[0], {"row": [str(error)]})
+
+    def write(self, rows):
+        User = get_user_model()
+        users = [
+            User(
+                username=data["username"],
+                email=data["email"],
+                phone_number=data["phone_number"],
+                first_name=data["first_name"],
+                last_name=data["last_name"],
+                password=hashed,
+            )
+            for _, data, hashed in rows
+        ]
+        # bulk_create skips post_save, so create_customer_for_new_user does
+        # not run; the customers are created in bulk below instead.
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        if not all(user.pk for user in users):
+            # No RETURNING on this backend; usernames are unique.
+            ids = dict(
+                User.objects.filter(
+                    username__in=[user.username for user in users]
+                ).values_list("username", "id")
+            )
+            for user in users:
+                user.pk = ids[user.username]
+
+        Customer.objects.bulk_create(
+            [
+                Customer(
+                    user_id=user.pk,
+                    birth_date=data.get("birth_date"),
+                    membership=data.get("membership", Customer.MEMBERSHIP_BRONZE),
+                )
+                for user, (_, data, _) in zip(users, rows)
+            ],
+            batch_size=self.batch_size,
+        )
+        self.report["created"] += len(users)
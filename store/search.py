@@ -0,0 +1,126 @@
+import re
+from collections import Counter
+from functools import reduce
+from operator import add
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, Value, When
+from .models import Product, ProductSearchTerm
+
+TOKEN_RE = re.compile(r"\w+")
+CJK_RE = re.compile(r"[㐀-鿿豈-﫿]")
+MAX_TERM_LENGTH = ProductSearchTerm._meta.get_field("term").max_length
+
+# A hit in the title counts for more than one in the description.
+FIELD_WEIGHTS = {"title": 3, "collection": 2, "description": 1}
+
+
+def get_options():
+    options = {"BACKEND": "index", "MAX_RESULTS": 1000, "BATCH_SIZE": 500}
+    options.update(getattr(settings, "STORE_SEARCH", {}))
+    return options
+
+
+def is_enabled():
+    return get_options()["BACKEND"] == "index"
+
+
+def tokenize(text):
+    """
+    Lower-cased word tokens. Chinese has no spaces between words, so runs of
+    CJK characters are split into overlapping bigrams instead, plus the last
+    character on its own: every other character starts a bigram, so with it
+    any single character is a prefix of some term, as in the LIKE search.
+    """
+    tokens = []
+    for word in TOKEN_RE.findall(text.lower()):
+        if CJK_RE.search(word) and len(word) > 1:
+            tokens += [word[i : i + 2] for i in range(len(word) - 1)]
+            tokens.append(word[-1])
+        else:
+            tokens.append(word[:MAX_TERM_LENGTH])
+    return tokens
+
+
+def build_terms(product, collection_title):
+    weights = Counter()
+    for field, text in (
+        ("title", product.title),
+        ("description", product.description),
+        ("collection", collection_title),
+    ):
+        for token in set(tokenize(text or "")):
+            weights[token] += FIELD_WEIGHTS[field]
+    return [
+        ProductSearchTerm(term=term, product_id=product.pk, weight=weight)
+        for term, weight in weights.items()
+    ]
+
+
+def index_products(product_ids, batch_size=None):
+    """Replace the index rows for the given products."""
+    product_ids = list(product_ids)
+    batch_size = batch_size or get_options()["BATCH_SIZE"]
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start : start + batch_size]
+        products = (
+            Product.objects.filter(pk__in=batch)
+            .select_related("collection")
+            .only("id", "title", "description", "collection__title")
+        )
+        rows = []
+        for product in products:
+            rows += build_terms(product, product.collection.title)
+        with transaction.atomic():
+            ProductSearchTerm.objects.filter(product_id__in=batch).delete()
+            ProductSearchTerm.objects.bulk_create(rows, batch_size=batch_size)
+
+
+def rebuild_index(batch_size=None):
+    ProductSearchTerm.objects.all().delete()
+    product_ids = Product.objects.order_by("id").values_list("id", flat=True)
+    index_products(product_ids, batch_size)
+    return ProductSearchTerm.objects.count()
+
+
+def matches(query):
+    """
+    The matching products as `product_id` rows ranked by summed term weight,
+    or None when the query has nothing indexable. Every query term must
+    prefix-match some indexed term, mirroring SearchFilter's AND semantics.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return None
+
+    matched = reduce(
+        add,
+        [
+            Max(
+                Case(
+                    When(term__startswith=term, then=Value(1)),
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+            for term in terms
+        ],
+    )
+    return (
+        ProductSearchTerm.objects.filter(
+            reduce(lambda q, term: q | Q(term__startswith=term), terms, Q())
+        )
+        .values("product_id")
+        .annotate(rank=Sum("weight"), matched=matched)
+        .filter(matched=len(terms))
+        .order_by("-rank", "product_id")
+    )
+
+
+def search(query, limit=None):
+    """The ids of the best `limit` (default MAX_RESULTS) matches, or None."""
+    ranked = matches(query)
+    if ranked is None:
+        return None
+    limit = limit or get_options()["MAX_RESULTS"]
+    return list(ranked.values_list("product_id", flat=True)[:limit])
@@ -1,230 +1,386 @@
-from asyncore import read
-from decimal import Decimal
-from django.db import transaction
-from rest_framework import serializers
-from . import models
-from .signals import order_created
-
-
-class CollectionSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = models.Collection
-        fields = ["id", "title", "featured_product", "product_count"]
-
-    product_count = serializers.IntegerField(read_only=True)
-
-
-class ProductImageSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = models.ProductImage
-        fields = ["image"]
-
-    def create(self, validated_data):
-        product_id = self.context["product_id"]
-
-        return models.ProductImage.objects.create(
-            product_id=product_id, **validated_data
-        )
-
-
-class ProductSerializer(serializers.ModelSerializer):
-    images = ProductImageSerializer(many=True, read_only=True)
-
-    class Meta:
-        model = models.Product
-        fields = [
-            "id",
-            "title",
-            "description",
-            "price",
-            "slug",
-            "inventory",
-            "images",
-            "collection",
-            "price_with_tax",
-        ]
-
-    price_with_tax = serializers.SerializerMethodField(method_name="calculate_tax")
-
-    def calculate_tax(self, product):
-        return product.price * Decimal(1.1)
-
-
-class CustomerUserSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = models.Customer
-        fields = ["first_name", "last_name"]
-
-
-class ReviewCustomerSerializer(serializers.ModelSerializer):
-    user = CustomerUserSerializer()
-
-    class Meta:
-        model = models.Customer
-        fields = ["id", "user", "membership"]
-
-
-class ReviewSerializer(serializers.ModelSerializer):
-    customer = ReviewCustomerSerializer(read_only=True)
-
-    class Meta:
-        model = models.Review
-        fields = ["id", "date", "customer", "description"]
-
-    def create(self, validated_data):
-        product_id = self.context["product_id"]
-        user_id = self.context["user_id"]
-        if (
-            models.Review.objects.select_related("customer")
-            .filter(customer_id=user_id, product_id=product_id)
-            .exists()
-        ):
-            raise serializers.ValidationError("you have already commented.")
-        else:
-            return models.Review.objects.create(
-                customer_id=user_id, product_id=product_id, **validated_data
-            )
-
-
-class ItemProductSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = models.Product
-        fields = ["id", "title", "price"]
-
-
-class CartItemSerializer(serializers.ModelSerializer):
-    product = ItemProductSerializer()
-    subtotal = serializers.SerializerMethodField(method_name="cal_subtotal")
-
-    def cal_subtotal(self, cartItem):
-        return cartItem.quantity * cartItem.product.price
-
-    class Meta:
-        model = models.CartItem
-        fields = ["id", "product", "quantity", "subtotal"]
-
-
-class CartSerializer(serializers.ModelSerializer):
-    id = serializers.UUIDField(read_only=True)
-    cart_items = CartItemSerializer(many=True, read_only=True)
-    total_price = serializers.SerializerMethodField(method_name="cal_total_price")
-
-    def cal_total_price(self, cart):
-        return sum(
-            [item.quantity * item.product.price for item in cart.cart_items.all()]
-        )
-
-    class Meta:
-        model = models.Cart
-        fields = ["id", "cart_items", "total_price"]
-
-
-class AddCartItemSerializer(serializers.ModelSerializer):
-    product_id = serializers.IntegerField(write_only=True)
-    product = ItemProductSerializer(read_only=True)
-
-    def validate_product_id(self, value):
-        if not models.Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError("No product with the given ID was found.")
-        return value
-
-    def save(self, **kwargs):
-        cart_id = self.context["cart_id"]
-        product_id = self.validated_data["product_id"]
-        quantity = self.validated_data["quantity"]
-
-        try:
-            cart_item = models.CartItem.objects.get(
-                cart_id=cart_id, product_id=product_id
-            )
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except models.CartItem.DoesNotExist:
-            self.instance = models.CartItem.objects.create(
-                cart_id=cart_id, **self.validated_data
-            )
-
-        return self.instance
-
-    class Meta:
-        model = models.CartItem
-        fields = ["id", "product_id", "product", "quantity"]
-
-
-class UpdateCartItemSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = models.CartItem
-        fields = ["quantity"]
-
-
-class CustomerSerializer(serializers.ModelSerializer):
-    membership = serializers.CharField(read_only=True)
-
-    class Meta:
-        model = models.Customer
-        fields = [
-            "id",
-            "user_id",
-            "first_name",
-            "last_name",
-            "birth_date",
-            "membership",
-        ]
-
-
-class OrderItemSerializer(serializers.ModelSerializer):
-    product = ItemProductSerializer()
-
-    class Meta:
-        model = models.OrderItem
-        fields = ["id", "product", "unit_price", "quantity"]
-
-
-class OrderSerializer(serializers.ModelSerializer):
-    order_items = OrderItemSerializer(many=True, read_only=True)
-
-    class Meta:
-        model = models.Order
-        fields = ["id", "customer", "placed_at", "payment_status", "order_items"]
-
-
-class UpdateOrderSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = models.Order
-        fields = ["payment_status"]
-
-
-class CreateOrderSerializer(serializers.Serializer):
-    cart_id = serializers.UUIDField()
-
-    def validate_cart_id(self, cart_id):
-        if not models.Cart.objects.filter(pk=cart_id).exists():
-            raise serializers.ValidationError("No cart with the given ID was found.")
-        if models.CartItem.objects.filter(cart_id=cart_id).count() == 0:
-            raise serializers.ValidationError("The cart is empty.")
-        return cart_id
-
-    def save(self, **kwargs):
-        with transaction.atomic():
-            cart_id = self.validated_data["cart_id"]
-
-            customer = models.Customer.objects.get(user_id=self.context["user_id"])
-            order = models.Order.objects.create(customer=customer)
-
-            cart_items = models.CartItem.objects.select_related("product").filter(
-                cart_id=cart_id
-            )
-            order_items = [
-                models.OrderItem(
-                    order=order,
-                    product=item.product,
-                    unit_price=item.product.price,
-                    quantity=item.quantity,
-                )
-                for item in cart_items
-            ]
-            models.OrderItem.objects.bulk_create(order_items)
-            models.Cart.objects.filter(pk=cart_id).delete()
-            order_created.send_robust(self.__class__, order=order)
-            return order
+from asyncore import read
+from django.db import connection, transaction
+from rest_framework import serializers
+from tag.models import Tag
+from . import inventory, models, outbox
+from .authentication import get_customer_id
+from .signals.handlers import invalidate_stock
+
+
+def set_prefetched(instance, related_name, objects):
+    """Make `instance.<related_name>.all()` return `objects` without a query."""
+    queryset = getattr(instance, related_name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    if not hasattr(instance, "_prefetched_objects_cache"):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[related_name] = queryset
+
+
+class CollectionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Collection
+        fields = ["id", "title", "featured_product", "product_count"]
+
+    product_count = serializers.IntegerField(read_only=True)
+
+
+class ProductImageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.ProductImage
+        fields = ["image"]
+
+    def create(self, validated_data):
+        product_id = self.context["product_id"]
+
+        return models.ProductImage.objects.create(
+            product_id=product_id, **validated_data
+        )
+
+
+class TagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ["id", "label"]
+
+
+def existing_ids(model, ids):
+    """`ids` deduplicated, or a ValidationError naming those not in `model`."""
+    ids = list(dict.fromkeys(ids))
+    found = set(model.objects.filter(pk__in=ids).values_list("pk", flat=True))
+    missing = [pk for pk in ids if pk not in found]
+    if missing:
+        raise serializers.ValidationError(
+            f"No {model._meta.verbose_name} with id {', '.join(map(str, missing))}."
+        )
+    return ids
+
+
+class TaggingSerializer(serializers.Serializer):
+    """Tags to add to or remove from products, each checked with one query."""
+
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=1000
+    )
+    products = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=1000
+    )
+
+    def validate_tags(self, ids):
+        return existing_ids(Tag, ids)
+
+    def validate_products(self, ids):
+        return existing_ids(models.Product, ids)
+
+
+class ProductSerializer(serializers.ModelSerializer):
+    images = ProductImageSerializer(many=True, read_only=True)
+    tags = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.Product
+        fields = [
+            "id",
+            "title",
+            "description",
+            "price",
+            "slug",
+            "inventory",
+            "images",
+            "collection",
+            "effective_price",
+            "price_with_tax",
+            "tags",
+            "like_count",
+        ]
+
+    def get_tags(self, product):
+        # ProductViewSet prefetches tagged_items with their tags.
+        return TagSerializer(
+            [item.tag for item in product.tagged_items.all()], many=True
+        ).data
+
+
+class CustomerUserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Customer
+        fields = ["first_name", "last_name"]
+
+
+class ReviewCustomerSerializer(serializers.ModelSerializer):
+    user = CustomerUserSerializer()
+
+    class Meta:
+        model = models.Customer
+        fields = ["id", "user", "membership"]
+
+
+class ReviewSerializer(serializers.ModelSerializer):
+    customer = ReviewCustomerSerializer(read_only=True)
+
+    class Meta:
+        model = models.Review
+        fields = ["id", "date", "customer", "description", "rating"]
+
+    def create(self, validated_data):
+        product_id = self.context["product_id"]
+        customer_id = get_customer_id(self.context["request"])
+        if models.Review.objects.filter(
+            customer_id=customer_id, product_id=product_id
+        ).exists():
+            raise serializers.ValidationError("you have already commented.")
+        else:
+            return models.Review.objects.create(
+                customer_id=customer_id, product_id=product_id, **validated_data
+            )
+
+
+class ReviewSummarySerializer(serializers.ModelSerializer):
+    review_count = serializers.IntegerField(source="product.review_count")
+    average_rating = serializers.DecimalField(
+        max_digits=3, decimal_places=2, read_only=True
+    )
+    ratings = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.ReviewSummary
+        fields = ["review_count", "rating_count", "average_rating", "ratings"]
+
+    def get_ratings(self, summary):
+        return {str(n): getattr(summary, f"stars_{n}") for n in range(1, 6)}
+
+
+class ItemProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Product
+        fields = ["id", "title", "price", "effective_price"]
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+    product = ItemProductSerializer()
+    subtotal = serializers.SerializerMethodField(method_name="cal_subtotal")
+
+    def cal_subtotal(self, cartItem):
+        if hasattr(cartItem, "subtotal"):
+            return cartItem.subtotal
+        return cartItem.quantity * cartItem.product.effective_price
+
+    class Meta:
+        model = models.CartItem
+        fields = ["id", "product", "quantity", "subtotal"]
+
+
+class CartSerializer(serializers.ModelSerializer):
+    id = serializers.UUIDField(read_only=True)
+    cart_items = CartItemSerializer(many=True, read_only=True)
+    total_price = serializers.SerializerMethodField(method_name="cal_total_price")
+
+    def cal_total_price(self, cart):
+        if hasattr(cart, "total_price"):
+            return cart.total_price
+        return sum(
+            [
+                item.quantity * item.product.effective_price
+                for item in cart.cart_items.all()
+            ]
+        )
+
+    class Meta:
+        model = models.Cart
+        fields = ["id", "cart_items", "total_price"]
+
+
+class AddCartItemSerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField(write_only=True)
+    product = ItemProductSerializer(read_only=True)
+
+    def validate_product_id(self, value):
+        if not models.Product.objects.filter(pk=value).exists():
+            raise serializers.ValidationError("No product with the given ID was found.")
+        return value
+
+    def save(self, **kwargs):
+        self.instance = models.CartItem.objects.add(
+            self.context["cart_id"],
+            self.validated_data["product_id"],
+            self.validated_data["quantity"],
+        )
+        return self.instance
+
+    class Meta:
+        model = models.CartItem
+        fields = ["id", "product_id", "product", "quantity"]
+
+
+class CartItemInputSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class BulkAddCartItemSerializer(serializers.Serializer):
+    items = CartItemInputSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        product_ids = {item["product_id"] for item in items}
+        found = set(
+            models.Product.objects.filter(pk__in=product_ids).values_list(
+                "id", flat=True
+            )
+        )
+        if product_ids - found:
+            raise serializers.ValidationError(
+                f"No product with the given ID was found: {sorted(product_ids - found)}."
+            )
+        return items
+
+    def save(self, **kwargs):
+        quantities = {}
+        for item in self.validated_data["items"]:
+            quantities.setdefault(item["product_id"], 0)
+            quantities[item["product_id"]] += item["quantity"]
+        return models.CartItem.objects.add_many(self.context["cart_id"], quantities)
+
+
+class UpdateCartItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.CartItem
+        fields = ["quantity"]
+
+
+class CustomerSerializer(serializers.ModelSerializer):
+    membership = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = models.Customer
+        fields = [
+            "id",
+            "user_id",
+            "first_name",
+            "last_name",
+            "birth_date",
+            "membership",
+        ]
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    product = ItemProductSerializer()
+
+    class Meta:
+        model = models.OrderItem
+        fields = ["id", "product", "unit_price", "quantity"]
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    order_items = OrderItemSerializer(many=True, read_only=True)
+    total_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+
+    class Meta:
+        model = models.Order
+        fields = [
+            "id",
+            "customer",
+            "placed_at",
+            "payment_status",
+            "order_items",
+            "total_price",
+        ]
+
+
+class UpdateOrderSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Order
+        fields = ["payment_status"]
+
+
+class CreateOrderSerializer(serializers.Serializer):
+    """
+    Checkout costs a fixed number of queries whatever the size of the cart:
+    the cart lines are read once with their products, stock is reserved in
+    one UPDATE, the order items are inserted in one batch and the response
+    is built from those objects instead of being re-read.
+    """
+
+    cart_id = serializers.UUIDField()
+
+    def get_cart_items(self, cart_id):
+        cart_items = list(
+            models.CartItem.objects.filter(cart_id=cart_id)
+            .select_related("product")
+            .only(
+                "cart_id",
+                "quantity",
+                "product__id",
+                "product__title",
+                "product__price",
+                "product__effective_price",
+                "product__collection_id",
+            )
+        )
+        if not cart_items:
+            if not models.Cart.objects.filter(pk=cart_id).exists():
+                raise serializers.ValidationError(
+                    {"cart_id": ["No cart with the given ID was found."]}
+                )
+            raise serializers.ValidationError({"cart_id": ["The cart is empty."]})
+        return cart_items
+
+    def save(self, **kwargs):
+        with transaction.atomic():
+            cart_id = self.validated_data["cart_id"]
+            cart_items = self.get_cart_items(cart_id)
+
+            try:
+                inventory.reserve(
+                    {item.product_id: item.quantity for item in cart_items}
+                )
+            except inventory.InsufficientInventory as error:
+                raise serializers.ValidationError(
+                    {
+                        "cart_id": [
+                            f"Only {available} left of product {product_id}."
+                            for product_id, available in error.shortages.items()
+                        ]
+                    }
+                )
+            invalidate_stock(
+                [item.product_id for item in cart_items],
+                {item.product.collection_id for item in cart_items},
+            )
+
+            order = models.Order.objects.create(customer_id=self.context["customer_id"])
+
+            order_items = [
+                models.OrderItem(
+                    order=order,
+                    product=item.product,
+                    unit_price=item.product.effective_price,
+                    quantity=item.quantity,
+                )
+                for item in cart_items
+            ]
+            models.OrderItem.objects.bulk_create(order_items)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # Without RETURNING the new rows have no ids yet; one re-read.
+                order_items = list(
+                    models.OrderItem.objects.filter(order=order).select_related(
+                        "product"
+                    )
+                )
+            set_prefetched(order, "order_items", order_items)
+            order.total_price = sum(
+                item.quantity * item.unit_price for item in order_items
+            )
+
+            models.Cart.objects.filter(pk=cart_id).delete()
+            # Receivers run in the outbox worker once this commits.
+            outbox.publish(
+                "order.created",
+                {
+                    "order_id": order.pk,
+                    "customer_id": order.customer_id,
+                    "total_price": str(order.total_price),
+                },
+            )
+            return order
@@ -1,3 +1,3 @@
-from django.dispatch import Signal
-
-order_created = Signal()
+from django.dispatch import Signal
+
+order_created = Signal()
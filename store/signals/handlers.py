@@ -1,10 +1,267 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.conf import settings
-from store.models import Customer
-
-
-@receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def create_customer_for_new_user(sender, **kwargs):
-    if kwargs["created"]:
-        Customer.objects.create(user=kwargs["instance"])
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.conf import settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from like.models import LikedItem
+from tag.models import Tag, TaggedItem
+from store import pricing, search
+from store.authentication import forget_user
+from store.cache import get_response_cache
+from store.counters import adjust, adjust_rating, move
+from store.models import (
+    Collection,
+    Customer,
+    Order,
+    Product,
+    ProductImage,
+    Promotion,
+    Review,
+)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_customer_for_new_user(sender, **kwargs):
+    if kwargs["created"]:
+        Customer.objects.create(user=kwargs["instance"])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def forget_cached_customer(sender, instance, **kwargs):
+    forget_user(instance.user_id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def forget_blacklisted_user(sender, instance, **kwargs):
+    if instance.token.user_id is not None:
+        forget_user(instance.token.user_id)
+
+
+# Counter receivers must run before invalidate_product, which resets
+# `_loaded_collection_id` once the move has been seen.
+@receiver(post_save, sender=Product)
+def count_product(sender, instance, created, **kwargs):
+    if created:
+        adjust(Collection, instance.collection_id, "product_count", 1)
+    elif hasattr(instance, "_loaded_collection_id"):
+        move(
+            Collection,
+            "product_count",
+            instance._loaded_collection_id,
+            instance.collection_id,
+        )
+
+
+@receiver(post_delete, sender=Product)
+def uncount_product(sender, instance, **kwargs):
+    adjust(Collection, instance.collection_id, "product_count", -1)
+
+
+@receiver(post_save, sender=Order)
+def count_order(sender, instance, created, **kwargs):
+    if created:
+        adjust(Customer, instance.customer_id, "order_count", 1)
+    elif hasattr(instance, "_loaded_customer_id"):
+        move(
+            Customer, "order_count", instance._loaded_customer_id, instance.customer_id
+        )
+    instance._loaded_customer_id = instance.customer_id
+
+
+@receiver(post_delete, sender=Order)
+def uncount_order(sender, instance, **kwargs):
+    adjust(Customer, instance.customer_id, "order_count", -1)
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, created, **kwargs):
+    if created:
+        adjust(Product, instance.product_id, "review_count", 1)
+        adjust_rating(instance.product_id, instance.rating, 1)
+    elif hasattr(instance, "_loaded_rating"):
+        if instance._loaded_rating == instance.rating:
+            return
+        adjust_rating(instance.product_id, instance._loaded_rating, -1)
+        adjust_rating(instance.product_id, instance.rating, 1)
+    else:
+        # Loaded without its rating, so there is no old value to move from.
+        return
+    instance._loaded_rating = instance.rating
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    adjust(Product, instance.product_id, "review_count", -1)
+    adjust_rating(instance.product_id, instance.rating, -1)
+
+
+def is_product_like(instance):
+    return instance.content_type_id == ContentType.objects.get_for_model(Product).id
+
+
+@receiver(post_save, sender=LikedItem)
+def count_like(sender, instance, created, **kwargs):
+    if created and is_product_like(instance):
+        adjust(Product, instance.object_id, "like_count", 1)
+        invalidate_like_count(instance.object_id)
+
+
+@receiver(post_delete, sender=LikedItem)
+def uncount_like(sender, instance, **kwargs):
+    if is_product_like(instance):
+        adjust(Product, instance.object_id, "like_count", -1)
+        invalidate_like_count(instance.object_id)
+
+
+def bump_scopes(scopes):
+    def bump():
+        get_response_cache().bump(*scopes)
+
+    # Bump now so this transaction reads its own writes, and again after
+    # commit so nothing cached from the pre-commit snapshot survives.
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_catalog(product_ids=(), collection_ids=()):
+    scopes = ["catalog"]
+    scopes += [f"collection:{collection_id}" for collection_id in collection_ids]
+    scopes += [f"product:{product_id}" for product_id in product_ids]
+    bump_scopes(scopes)
+
+
+def invalidate_like_count(product_id):
+    # Cached product lists read like_count afresh on every hit (live_fields).
+    bump_scopes([f"product:{product_id}"])
+
+
+def invalidate_stock(product_ids, collection_ids):
+    # Checkouts come too often to flush the unfiltered catalog over. Cached
+    # product lists read inventory afresh on every hit (live_fields), so
+    # only the product and collection entries need to go.
+    bump_scopes(
+        [f"product:{product_id}" for product_id in product_ids]
+        + [f"collection:{collection_id}" for collection_id in collection_ids]
+    )
+
+
+def invalidate_products(product_ids):
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    collection_ids = (
+        Product.objects.filter(pk__in=product_ids)
+        .values_list("collection_id", flat=True)
+        .distinct()
+    )
+    invalidate_catalog(product_ids, set(collection_ids))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    collection_ids = {
+        instance.collection_id,
+        getattr(instance, "_loaded_collection_id", None),
+    }
+    invalidate_catalog([instance.pk], collection_ids - {None})
+    instance._loaded_collection_id = instance.collection_id
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_product_image(sender, instance, **kwargs):
+    invalidate_products([instance.product_id])
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(pre_delete, sender=Promotion)
+def invalidate_promotion(sender, instance, **kwargs):
+    invalidate_products(instance.product_set.values_list("id", flat=True))
+
+
+@receiver(m2m_changed, sender=Product.promotions.through)
+def invalidate_product_promotions(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        # After the clear the promotion no longer knows its products.
+        invalidate_products(instance.product_set.values_list("id", flat=True))
+    elif not action.startswith("post_"):
+        return
+    elif not reverse:
+        invalidate_products([instance.pk])
+    elif pk_set:
+        invalidate_products(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def invalidate_tag(sender, instance, created=False, **kwargs):
+    # A new tag is on no product yet. Tagging and untagging through the API
+    # invalidate the products themselves, and the admin inline saves the
+    # product, so TaggedItem needs no receiver (which keeps deletes fast).
+    if created:
+        return
+    invalidate_products(
+        TaggedItem.objects.filter(
+            tag=instance, content_type=ContentType.objects.get_for_model(Product)
+        ).values_list("object_id", flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=Collection)
+def invalidate_collection(sender, instance, **kwargs):
+    invalidate_catalog(collection_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Promotion)
+def reprice_promotion(sender, instance, created, **kwargs):
+    if not created:
+        pricing.reprice(instance.product_set.all())
+
+
+@receiver(pre_delete, sender=Promotion)
+def remember_promoted_products(sender, instance, **kwargs):
+    instance._promoted_product_ids = list(
+        instance.product_set.values_list("id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Promotion)
+def reprice_unpromoted_products(sender, instance, **kwargs):
+    product_ids = getattr(instance, "_promoted_product_ids", [])
+    if product_ids:
+        pricing.reprice(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver(m2m_changed, sender=Product.promotions.through)
+def reprice_product_promotions(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        instance._promoted_product_ids = list(
+            instance.product_set.values_list("id", flat=True)
+        )
+    elif action not in ("post_add", "post_remove", "post_clear"):
+        return
+    elif not reverse:
+        pricing.reprice(Product.objects.filter(pk=instance.pk))
+    elif action == "post_clear":
+        reprice_unpromoted_products(sender, instance)
+    elif pk_set:
+        pricing.reprice(Product.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    if search.is_enabled():
+        search.index_products([instance.pk])
+
+
+@receiver(post_save, sender=Collection)
+def index_collection_products(sender, instance, created, **kwargs):
+    if search.is_enabled() and not created:
+        search.index_products(instance.product.values_list("id", flat=True))
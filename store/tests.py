@@ -1,3 +1,2160 @@
-from django.test import TestCase
-
-# Create your tests here.
+import csv
+import importlib
+import io
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from like.models import LikedItem
+from tag.models import Tag, TaggedItem
+from . import models
+from . import benchmark, counters, export, inventory, metrics, outbox, pricing
+from . import provisioning, search
+from .authentication import get_auth_cache, user_key
+from .cache import LocMemBackend, RedisBackend, ResponseCache, get_response_cache
+from .management.commands import explain_queries
+from .permissions import OwnerOrAdmin
+from .serializers import CollectionSerializer
+from .signals import order_created
+from .pagination import (
+    CountFreePagination,
+    EstimatedCountPagination,
+    ReviewPagination,
+    estimate_table_rows,
+)
+
+
+class ProductKeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = models.Collection.objects.create(title="Books")
+        # Only five distinct prices, so ties on the sort key are the norm.
+        for i in range(23):
+            models.Product.objects.create(
+                title=f"Product {i}",
+                description="",
+                price=Decimal(10 + i % 5),
+                inventory=10,
+                collection=cls.collection,
+            )
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            ids += [product["id"] for product in response.data["results"]]
+            url = response.data["next"]
+            pages += 1
+        return ids, pages
+
+    def expected_ids(self, *ordering):
+        return list(
+            models.Product.objects.order_by(*ordering).values_list("id", flat=True)
+        )
+
+    def test_walks_every_product_once_in_id_order(self):
+        ids, pages = self.walk("/store/products/?pagination=cursor")
+        self.assertEqual(ids, self.expected_ids("id"))
+        self.assertEqual(pages, 3)
+
+    def test_ties_on_price_are_broken_by_id(self):
+        ids, _ = self.walk("/store/products/?pagination=cursor&ordering=price")
+        self.assertEqual(ids, self.expected_ids("price", "id"))
+
+        ids, _ = self.walk("/store/products/?pagination=cursor&ordering=-price")
+        self.assertEqual(ids, self.expected_ids("-price", "-id"))
+
+    def test_walks_by_last_update(self):
+        ids, _ = self.walk("/store/products/?pagination=cursor&ordering=-last_update")
+        self.assertEqual(ids, self.expected_ids("-last_update", "-id"))
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.client.get("/store/products/?pagination=cursor&ordering=price")
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertEqual(back.data["results"], first.data["results"])
+        self.assertIsNone(back.data["previous"])
+
+    def test_deep_page_issues_no_count_query(self):
+        first = self.client.get("/store/products/?pagination=cursor")
+        second = self.client.get(first.data["next"])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(second.data["next"])
+        self.assertFalse(
+            any("COUNT(" in query["sql"].upper() for query in queries.captured_queries)
+        )
+
+    def test_cursor_from_another_ordering_is_rejected(self):
+        first = self.client.get("/store/products/?pagination=cursor&ordering=price")
+        next_url = first.data["next"].replace("ordering=price", "ordering=last_update")
+        self.assertEqual(self.client.get(next_url).status_code, 404)
+
+    def test_tampered_cursor_values_are_not_found(self):
+        for ordering, value in [
+            ("price", None),
+            ("price", {"a": 1}),
+            ("price", [1]),
+            ("price", "cheap"),
+            ("-last_update", "yesterday"),
+            ("-last_update", 5),
+        ]:
+            cursor = urlsafe_b64encode(
+                json.dumps({"o": ordering, "v": value, "id": 1, "r": 0}).encode()
+            ).decode()
+            response = self.client.get(
+                "/store/products/",
+                {"pagination": "cursor", "ordering": ordering, "cursor": cursor},
+            )
+            self.assertEqual(response.status_code, 404, (ordering, value))
+
+    def test_page_number_pagination_is_still_the_default(self):
+        response = self.client.get("/store/products/")
+        self.assertEqual(response.data["count"], 23)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b"0")) + 1).encode()
+        return int(self.data[key])
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if key.startswith(match[:-1])]
+
+
+class CacheBackendTests(SimpleTestCase):
+    def test_locmem_evicts_least_recently_used(self):
+        backend = LocMemBackend(max_entries=2)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)
+        self.assertEqual(backend.get("a"), 1)
+        self.assertIsNone(backend.get("b"))
+
+    def test_locmem_entries_expire(self):
+        backend = LocMemBackend(timeout=10)
+        with mock.patch("store.cache.time.monotonic", return_value=100):
+            backend.set("a", 1)
+        with mock.patch("store.cache.time.monotonic", return_value=111):
+            self.assertIsNone(backend.get("a"))
+
+    def test_redis_backend_round_trips_values_and_counters(self):
+        backend = RedisBackend(FakeRedis())
+        backend.set("page", {"results": [1, 2]})
+        self.assertEqual(backend.get("page"), {"results": [1, 2]})
+        self.assertEqual(backend.incr("version:catalog"), 1)
+        self.assertEqual(backend.get("version:catalog"), 1)
+        backend.clear()
+        self.assertIsNone(backend.get("page"))
+
+
+class ProductResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = models.Collection.objects.create(title="Games")
+        cls.product = models.Product.objects.create(
+            title="Chess",
+            description="",
+            price=Decimal(20),
+            inventory=5,
+            collection=cls.collection,
+        )
+
+    def setUp(self):
+        self.cache = ResponseCache(RedisBackend(FakeRedis()))
+        patcher = mock.patch("store.cache.get_response_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        signal_patcher = mock.patch(
+            "store.signals.handlers.get_response_cache", return_value=self.cache
+        )
+        signal_patcher.start()
+        self.addCleanup(signal_patcher.stop)
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get("/store/products/?ordering=price&page=1")
+        with self.assertNumQueries(1):  # live fields of the cached rows
+            second = self.client.get("/store/products/?page=1&ordering=price")
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_product_save_invalidates_list_and_detail(self):
+        url = f"/store/products/{self.product.id}/"
+        self.client.get("/store/products/")
+        self.client.get(url)
+
+        self.product.price = Decimal(30)
+        self.product.save()
+
+        self.assertEqual(self.client.get("/store/products/")["X-Cache"], "MISS")
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["price"], Decimal(30))
+
+    def test_other_collections_stay_cached(self):
+        other = models.Collection.objects.create(title="Toys")
+        url = f"/store/products/?collection_id={self.collection.id}"
+        self.client.get(url)
+
+        models.Product.objects.create(
+            title="Ball", description="", price=5, inventory=1, collection=other
+        )
+
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+    def test_moving_a_product_invalidates_both_collections(self):
+        other = models.Collection.objects.create(title="Toys")
+        url = f"/store/products/?collection_id={self.collection.id}"
+        self.client.get(url)
+
+        product = models.Product.objects.get(pk=self.product.pk)
+        product.collection = other
+        product.save()
+
+        self.assertEqual(self.client.get(url).data["results"], [])
+
+    def test_promotion_change_invalidates_product(self):
+        url = f"/store/products/{self.product.id}/"
+        self.client.get(url)
+
+        promotion = models.Promotion.objects.create(description="Sale", discount=0.1)
+        promotion.product_set.add(self.product)
+
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+    def test_image_change_invalidates_product(self):
+        url = f"/store/products/{self.product.id}/"
+        self.client.get(url)
+
+        models.ProductImage.objects.create(product=self.product)
+
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+
+@override_settings(STORE_RESPONSE_CACHE={"ENABLED": False})
+class ProductSearchIndexTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.kitchen = models.Collection.objects.create(title="Kitchen")
+        cls.garden = models.Collection.objects.create(title="Garden")
+        cls.knife = cls.create("Chef knife", "Sharp steel blade", cls.kitchen)
+        cls.shears = cls.create("Garden shears", "Steel blades for pruning", cls.garden)
+        cls.pan = cls.create(
+            "Frying pan", "Non-stick, fits any knife drawer", cls.kitchen
+        )
+        cls.case = cls.create("手機保護殼", "防摔", cls.kitchen)
+        cls.tea = cls.create(
+            "綠茶", "", models.Collection.objects.create(title="Drinks")
+        )
+
+    @classmethod
+    def create(cls, title, description, collection):
+        return models.Product.objects.create(
+            title=title,
+            description=description,
+            price=10,
+            inventory=1,
+            collection=collection,
+        )
+
+    def search_ids(self, query):
+        response = self.client.get("/store/products/", {"search": query})
+        return [product["id"] for product in response.data["results"]]
+
+    def test_title_matches_outrank_description_matches(self):
+        self.assertEqual(self.search_ids("knife"), [self.knife.id, self.pan.id])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search_ids("steel garden"), [self.shears.id])
+
+    def test_terms_match_as_prefixes(self):
+        self.assertEqual(self.search_ids("prun"), [self.shears.id])
+
+    def test_collection_title_is_searchable_and_kept_in_sync(self):
+        self.assertEqual(
+            set(self.search_ids("kitchen")), {self.knife.id, self.pan.id, self.case.id}
+        )
+        self.garden.title = "Outdoor"
+        self.garden.save()
+        self.assertEqual(self.search_ids("outdoor"), [self.shears.id])
+        self.assertEqual(self.search_ids("garden"), [self.shears.id])
+
+    def test_product_updates_are_indexed(self):
+        self.pan.title = "Wok"
+        self.pan.save()
+        self.assertEqual(self.search_ids("wok"), [self.pan.id])
+        self.assertEqual(self.search_ids("frying"), [])
+
+    def test_chinese_text_is_indexed_as_bigrams(self):
+        self.assertEqual(self.search_ids("保護殼"), [self.case.id])
+
+    def test_a_chinese_run_ends_in_a_searchable_character(self):
+        self.assertEqual(self.search_ids("殼"), [self.case.id])
+        self.assertEqual(self.search_ids("茶"), [self.tea.id])
+        self.assertEqual(self.search_ids("綠茶"), [self.tea.id])
+        self.assertEqual(self.search_ids("機"), [self.case.id])
+
+    def test_rebuild_command_restores_the_index(self):
+        models.ProductSearchTerm.objects.all().delete()
+        call_command("rebuild_search_index", stdout=mock.Mock())
+        self.assertEqual(self.search_ids("shears"), [self.shears.id])
+
+    def test_database_fallback_when_index_disabled(self):
+        models.ProductSearchTerm.objects.all().delete()
+        with override_settings(STORE_SEARCH={"BACKEND": "database"}):
+            self.assertEqual(self.search_ids("shears"), [self.shears.id])
+
+    def test_ordering_parameter_overrides_relevance(self):
+        ids = self.search_ids("knife")
+        response = self.client.get(
+            "/store/products/", {"search": "knife", "ordering": "-last_update"}
+        )
+        self.assertEqual([p["id"] for p in response.data["results"]], ids[::-1])
+
+
+class CartItemUpsertTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Snacks")
+        cls.chips = models.Product.objects.create(
+            title="Chips", description="", price=3, inventory=50, collection=collection
+        )
+        cls.soda = models.Product.objects.create(
+            title="Soda", description="", price=2, inventory=50, collection=collection
+        )
+
+    def setUp(self):
+        self.cart = models.Cart.objects.create()
+        self.url = f"/store/carts/{self.cart.id}/items/"
+
+    def test_adding_the_same_product_twice_increments_quantity(self):
+        self.client.post(self.url, {"product_id": self.chips.id, "quantity": 2})
+        response = self.client.post(
+            self.url, {"product_id": self.chips.id, "quantity": 3}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["quantity"], 5)
+        self.assertEqual(models.CartItem.objects.get(cart=self.cart).quantity, 5)
+
+    def test_bulk_add_merges_with_existing_items(self):
+        models.CartItem.objects.create(cart=self.cart, product=self.chips, quantity=1)
+        items = [
+            {"product_id": self.chips.id, "quantity": 2},
+            {"product_id": self.soda.id, "quantity": 4},
+            {"product_id": self.soda.id, "quantity": 1},
+        ]
+        # Cart, validate, find existing rows, update, savepoint + insert, re-read.
+        with self.assertNumQueries(8):
+            response = self.client.post(
+                self.url + "bulk/", {"items": items}, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        quantities = {item["product"]["id"]: item["quantity"] for item in response.data}
+        self.assertEqual(quantities, {self.chips.id: 3, self.soda.id: 5})
+
+    def test_adding_to_a_missing_cart_is_not_found(self):
+        items = [{"product_id": self.chips.id, "quantity": 1}]
+        for cart_id in ["00000000-0000-0000-0000-000000000000", "nope"]:
+            url = f"/store/carts/{cart_id}/items/"
+            response = self.client.post(url + "bulk/", {"items": items}, format="json")
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(self.client.post(url, items[0]).status_code, 404)
+        self.assertFalse(models.CartItem.objects.exists())
+
+    def test_bulk_add_rejects_unknown_products(self):
+        items = [{"product_id": 0, "quantity": 1}]
+        response = self.client.post(self.url + "bulk/", {"items": items}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.CartItem.objects.exists())
+
+
+@skipIf(
+    connection.vendor == "sqlite" and connection.is_in_memory_db(),
+    "needs a database that several threads can write to",
+)
+class ConcurrentCartItemUpsertTests(TransactionTestCase):
+    threads = 8
+    adds_per_thread = 10
+
+    def test_concurrent_adds_to_one_cart_are_all_counted(self):
+        collection = models.Collection.objects.create(title="Snacks")
+        product = models.Product.objects.create(
+            title="Chips", description="", price=3, inventory=50, collection=collection
+        )
+        cart = models.Cart.objects.create()
+        url = f"/store/carts/{cart.id}/items/"
+        barrier = threading.Barrier(self.threads)
+        statuses = []
+
+        def hammer():
+            client = APIClient()
+            barrier.wait()
+            try:
+                for _ in range(self.adds_per_thread):
+                    response = client.post(
+                        url, {"product_id": product.id, "quantity": 1}
+                    )
+                    statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=hammer) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(set(statuses), {201})
+        self.assertEqual(
+            models.CartItem.objects.get(cart=cart).quantity,
+            self.threads * self.adds_per_thread,
+        )
+
+
+phone_numbers = itertools.count(1)
+
+
+def create_user(username="alice", **kwargs):
+    return get_user_model().objects.create(
+        username=username,
+        email=f"{username}@example.com",
+        phone_number=f"+8869{next(phone_numbers):08d}",
+        **kwargs,
+    )
+
+
+class InventoryReservationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Tea")
+        cls.green = models.Product.objects.create(
+            title="Green tea",
+            description="",
+            price=5,
+            inventory=3,
+            collection=collection,
+        )
+        cls.black = models.Product.objects.create(
+            title="Black tea",
+            description="",
+            price=6,
+            inventory=10,
+            collection=collection,
+        )
+        cls.user = create_user()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        self.cart = models.Cart.objects.create()
+
+    def checkout(self, **quantities):
+        for product, quantity in quantities.items():
+            models.CartItem.objects.create(
+                cart=self.cart, product=getattr(self, product), quantity=quantity
+            )
+        return self.client.post("/store/orders/", {"cart_id": self.cart.id})
+
+    def stock(self):
+        return dict(models.Product.objects.values_list("title", "inventory"))
+
+    def list_stock(self):
+        response = self.client.get("/store/products/")
+        stock = {row["title"]: row["inventory"] for row in response.data["results"]}
+        return response["X-Cache"], stock
+
+    def test_checkout_decrements_stock(self):
+        response = self.checkout(green=2, black=4)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stock(), {"Green tea": 1, "Black tea": 6})
+
+    def test_checkout_leaves_the_catalog_scope_alone(self):
+        cache = get_response_cache()
+        before = {
+            scope: cache.version(scope)
+            for scope in [
+                "catalog",
+                f"product:{self.green.pk}",
+                f"collection:{self.green.collection_id}",
+            ]
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout(green=1)
+        self.assertEqual(
+            [cache.version(scope) - version for scope, version in before.items()],
+            [0, 2, 2],  # bumped now and again on commit
+        )
+
+    def test_cached_product_lists_show_stock_after_checkout(self):
+        get_response_cache().backend.clear()
+        self.assertEqual(self.list_stock(), ("MISS", {"Green tea": 3, "Black tea": 10}))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout(green=2)
+        self.assertEqual(self.list_stock(), ("HIT", {"Green tea": 1, "Black tea": 10}))
+
+    def test_shortage_fails_the_whole_order(self):
+        response = self.checkout(green=4, black=1)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["cart_id"], [f"Only 3 left of product {self.green.id}."]
+        )
+        self.assertEqual(self.stock(), {"Green tea": 3, "Black tea": 10})
+        self.assertFalse(models.Order.objects.exists())
+        self.assertTrue(models.CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_reserve_is_one_update(self):
+        with self.assertNumQueries(3):  # savepoint, UPDATE, release
+            inventory.reserve({self.black.id: 2, self.green.id: 3})
+        self.assertEqual(self.stock(), {"Green tea": 0, "Black tea": 8})
+
+    def test_reserve_reports_every_short_product(self):
+        with self.assertRaises(inventory.InsufficientInventory) as raised:
+            inventory.reserve({self.black.id: 11, self.green.id: 4})
+        self.assertEqual(
+            raised.exception.shortages, {self.green.id: 3, self.black.id: 10}
+        )
+
+
+class CheckoutQueryCountTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Stationery")
+        cls.products = [
+            models.Product.objects.create(
+                title=f"Pen {i}",
+                description="",
+                price=1 + i,
+                inventory=5,
+                collection=collection,
+            )
+            for i in range(100)
+        ]
+        cls.user = create_user()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, size):
+        cart = models.Cart.objects.create()
+        for product in self.products[:size]:
+            models.CartItem.objects.create(cart=cart, product=product, quantity=2)
+        # Savepoint, cart lines, reserve (3), customer, order, order counter,
+        # order items (plus a re-read when the backend cannot return ids from
+        # a bulk insert), cart delete (3), outbox event, release.
+        expected = 14 if connection.features.can_return_rows_from_bulk_insert else 15
+        with self.assertNumQueries(expected):
+            response = self.client.post("/store/orders/", {"cart_id": cart.id})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_single_item_checkout(self):
+        response = self.checkout(1)
+        self.assertEqual(len(response.data["order_items"]), 1)
+
+    def test_hundred_item_checkout_costs_the_same(self):
+        response = self.checkout(100)
+        items = response.data["order_items"]
+        self.assertEqual(len(items), 100)
+        self.assertEqual(
+            {item["id"] for item in items},
+            set(models.OrderItem.objects.values_list("id", flat=True)),
+        )
+        self.assertEqual(items[0]["product"]["title"], "Pen 0")
+        self.assertEqual(items[0]["unit_price"], Decimal(1))
+
+    def test_backends_without_returning_re_read_the_items(self):
+        with mock.patch.object(
+            type(connection.features), "can_return_rows_from_bulk_insert", False
+        ):
+            response = self.checkout(3)
+        self.assertTrue(all(item["id"] for item in response.data["order_items"]))
+
+    def test_missing_and_empty_carts_are_rejected(self):
+        cart = models.Cart.objects.create()
+        response = self.client.post("/store/orders/", {"cart_id": cart.id})
+        self.assertEqual(response.data["cart_id"], ["The cart is empty."])
+        cart_id = cart.id
+        cart.delete()
+        response = self.client.post("/store/orders/", {"cart_id": cart_id})
+        self.assertEqual(
+            response.data["cart_id"], ["No cart with the given ID was found."]
+        )
+
+
+class OrderListingQueryCountTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Music")
+        cls.products = [
+            models.Product.objects.create(
+                title=f"Record {i}",
+                description="",
+                price=10 + i,
+                inventory=5,
+                collection=collection,
+            )
+            for i in range(4)
+        ]
+        cls.staff = create_user("staff", is_staff=True)
+        cls.buyer = create_user("buyer")
+        cls.other = create_user("other")
+
+    def place_orders(self, user, count, items):
+        for _ in range(count):
+            order = models.Order.objects.create(customer=user.customer)
+            for product in self.products[:items]:
+                models.OrderItem.objects.create(
+                    order=order, product=product, quantity=2, unit_price=product.price
+                )
+
+    def assert_listing_queries(self, user, expected):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(expected):
+            response = self.client.get("/store/orders/")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_staff_listing_is_constant(self):
+        self.place_orders(self.buyer, 1, 1)
+        self.assert_listing_queries(self.staff, 4)  # stats, count, orders, items
+        self.place_orders(self.other, 5, 4)
+        response = self.assert_listing_queries(self.staff, 4)
+        self.assertEqual(response.data["count"], 6)
+
+    def test_customer_listing_is_constant(self):
+        self.place_orders(self.buyer, 1, 1)
+        self.place_orders(self.other, 2, 1)
+        # customer, orders (one row past the page), items; never a count
+        self.assert_listing_queries(self.buyer, 3)
+        self.place_orders(self.buyer, 10, 4)
+        response = self.assert_listing_queries(self.buyer, 3)
+        self.assertNotIn("count", response.data)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertIn("page=2", response.data["next"])
+
+    def test_retrieve_includes_total(self):
+        self.place_orders(self.buyer, 1, 2)
+        order = models.Order.objects.get()
+        self.client.force_authenticate(self.buyer)
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/store/orders/{order.id}/")
+        self.assertEqual(response.data["total_price"], Decimal(2 * 10 + 2 * 11))
+        self.assertEqual(len(response.data["order_items"]), 2)
+        self.assertEqual(
+            response.data["order_items"][0]["product"],
+            {
+                "id": self.products[0].id,
+                "title": "Record 0",
+                "price": Decimal(10),
+                "effective_price": Decimal(10),
+            },
+        )
+
+    def test_order_without_items_totals_zero(self):
+        models.Order.objects.create(customer=self.buyer.customer)
+        self.client.force_authenticate(self.buyer)
+        response = self.client.get("/store/orders/")
+        self.assertEqual(response.data["results"][0]["total_price"], Decimal(0))
+
+
+class CartTotalsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Garden")
+        cls.products = [
+            models.Product.objects.create(
+                title=f"Seed {i}",
+                description="",
+                price=Decimal("1.25") * (i + 1),
+                inventory=5,
+                collection=collection,
+            )
+            for i in range(20)
+        ]
+
+    def fill_cart(self, size):
+        cart = models.Cart.objects.create()
+        for i, product in enumerate(self.products[:size]):
+            models.CartItem.objects.create(cart=cart, product=product, quantity=i + 1)
+        return cart
+
+    def test_cart_is_read_in_constant_queries(self):
+        for size in (1, 20):
+            cart = self.fill_cart(size)
+            with self.assertNumQueries(2):
+                response = self.client.get(f"/store/carts/{cart.id}/")
+            self.assertEqual(len(response.data["cart_items"]), size)
+
+    def test_totals_match_the_python_computation(self):
+        cart = self.fill_cart(3)
+        response = self.client.get(f"/store/carts/{cart.id}/")
+        subtotals = [item["subtotal"] for item in response.data["cart_items"]]
+        self.assertEqual(
+            sorted(subtotals), [Decimal("1.25"), Decimal("5.00"), Decimal("11.25")]
+        )
+        self.assertEqual(response.data["total_price"], Decimal("17.50"))
+        self.assertIn(
+            {
+                "id": self.products[0].id,
+                "title": "Seed 0",
+                "price": Decimal("1.25"),
+                "effective_price": Decimal("1.25"),
+            },
+            [item["product"] for item in response.data["cart_items"]],
+        )
+
+    def test_empty_and_new_carts_total_zero(self):
+        response = self.client.post("/store/carts/")
+        self.assertEqual(response.data["total_price"], 0)
+        response = self.client.get(f"/store/carts/{response.data['id']}/")
+        self.assertEqual(response.data["total_price"], 0)
+
+    def test_cart_item_listing_uses_sql_subtotals(self):
+        cart = self.fill_cart(5)
+        with self.assertNumQueries(2):  # count, items
+            response = self.client.get(f"/store/carts/{cart.id}/items/")
+        subtotals = [item["subtotal"] for item in response.data["results"]]
+        self.assertEqual(max(subtotals), Decimal("31.25"))
+
+
+@override_settings(STORE_REQUEST_METRICS=True, STORE_RESPONSE_CACHE={"ENABLED": False})
+class RequestMetricsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Tools")
+        models.Product.objects.create(
+            title="Hammer", description="", price=9, inventory=3, collection=collection
+        )
+        cls.staff = create_user("staff", is_staff=True)
+
+    def setUp(self):
+        metrics.registry.clear()
+
+    def test_server_timing_header(self):
+        response = self.client.get("/store/products/")
+        timing = dict(
+            part.strip().split(";", 1) for part in response["Server-Timing"].split(",")
+        )
+        self.assertEqual(set(timing), {"db", "serializer", "total"})
+        # table stats, count, page, images, tags
+        self.assertIn('desc="5 queries"', timing["db"])
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get("/store/_metrics").status_code, 401)
+        self.client.force_authenticate(create_user("customer"))
+        self.assertEqual(self.client.get("/store/_metrics").status_code, 403)
+
+    def test_metrics_are_served_in_prometheus_format(self):
+        self.client.get("/store/products/")
+        self.client.get("/store/products/")
+        self.client.force_authenticate(self.staff)
+        response = self.client.get("/store/_metrics")
+
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn("# TYPE store_request_duration_seconds histogram", body)
+        self.assertIn(
+            'store_request_duration_seconds_count{action="list",view="ProductViewSet"} 2',
+            body,
+        )
+        self.assertIn(
+            'store_request_db_queries_bucket{action="list",view="ProductViewSet",le="5"} 2',
+            body,
+        )
+        self.assertIn("store_response_cache_hits_total", body)
+        self.assertIn("store_outbox_pending_events 0", body)
+
+    def test_serializer_time_is_recorded(self):
+        self.client.get("/store/products/")
+        series = metrics.registry.metrics["store_request_serializer_seconds"]
+        (histogram,) = series.values()
+        self.assertGreater(histogram.sum, 0)
+
+    def test_timed_serializers_keep_their_class(self):
+        collection = models.Collection.objects.get()
+        serializer = metrics.time_serializer(CollectionSerializer(collection))
+        self.assertIs(type(serializer), CollectionSerializer)
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        try:
+            self.assertEqual(serializer.data["title"], "Tools")
+        finally:
+            metrics.current_request.reset(token)
+        self.assertGreater(request_metrics.serializer_time, 0)
+
+
+@override_settings(STORE_RESPONSE_CACHE={"ENABLED": False})
+class BenchmarkReplayTests(APITestCase):
+    def test_replay_reports_every_scenario(self):
+        rng = random.Random(0)
+        dataset = benchmark.seed_dataset(
+            rng, collections=2, products=10, images=1, customers=2, orders=1
+        )
+        self.assertEqual(models.ProductImage.objects.count(), 10)
+        self.assertEqual(models.Order.objects.count(), 2)
+
+        mix = {name: 1 for name in benchmark.SCENARIOS}
+        report = benchmark.replay(mix, 30, dataset, rng)
+
+        self.assertEqual(report["overall"]["requests"], 30)
+        for name, result in report["scenarios"].items():
+            if result["requests"]:
+                self.assertEqual(
+                    set(result["statuses"]), {"201" if name == "cart_add" else "200"}
+                )
+                self.assertGreater(result["queries_mean"], 0)
+
+
+class ExplainQueriesTests(SimpleTestCase):
+    def test_full_scans_are_recognised_per_vendor(self):
+        self.assertEqual(
+            explain_queries.full_scans("2 0 0 SCAN store_product", "sqlite"),
+            ["2 0 0 SCAN store_product"],
+        )
+        self.assertEqual(
+            explain_queries.full_scans(
+                "SCAN store_product USING INDEX product_price_id_idx\n"
+                "SEARCH store_order USING INDEX order_cust_placed_idx (customer_id=?)",
+                "sqlite",
+            ),
+            [],
+        )
+        self.assertEqual(
+            len(
+                explain_queries.full_scans(
+                    "Limit\n  ->  Seq Scan on store_order", "postgresql"
+                )
+            ),
+            1,
+        )
+        self.assertEqual(
+            explain_queries.full_scans(
+                "Index Scan using order_placed_idx", "postgresql"
+            ),
+            [],
+        )
+
+    def test_mysql_scans_are_read_from_the_type_column(self):
+        plan = (
+            "1 PRIMARY store_product None ref product_coll_price_idx "
+            "product_coll_price_idx 8 const 10 100.0 Using where\n"
+            "2 UNION store_order None ALL None None None None 500 100.0 None\n"
+            "3 DEPENDENT SUBQUERY store_review None ALL None None None None 9 10.0 "
+            "Using where\n"
+            "None UNION RESULT <union1,2> None ALL None None None None None None "
+            "Using temporary"
+        )
+        self.assertEqual(
+            [line.split()[0] for line in explain_queries.full_scans(plan, "mysql")],
+            ["2", "3"],
+        )
+
+
+class ExplainQueriesCommandTests(APITestCase):
+    def test_hot_paths_use_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Plans on other backends depend on table statistics.")
+        flagged = [
+            name
+            for name, queryset in explain_queries.key_queries().items()
+            if explain_queries.full_scans(queryset.explain())
+        ]
+        # Case-insensitive LIKE cannot use the term index on SQLite.
+        self.assertEqual(flagged, ["search term prefix"])
+
+
+class CountFreePaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Tools")
+        models.Product.objects.bulk_create(
+            [
+                models.Product(
+                    title=f"Tool {i}",
+                    slug=f"tool-{i}",
+                    description="",
+                    price=10,
+                    inventory=1,
+                    collection=collection,
+                )
+                for i in range(25)
+            ]
+        )
+
+    def paginate(self, pagination, page):
+        request = Request(APIRequestFactory().get(f"/store/products/?page={page}"))
+        queryset = models.Product.objects.order_by("id")
+        return pagination.paginate_queryset(queryset, request)
+
+    def test_pages_without_counting(self):
+        pagination = CountFreePagination()
+        with CaptureQueriesContext(connection) as queries:
+            first = self.paginate(pagination, 1)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("COUNT(", queries[0]["sql"].upper())
+        self.assertEqual(len(first), 10)
+        response = pagination.get_paginated_response([])
+        self.assertNotIn("count", response.data)
+        self.assertIn("page=2", response.data["next"])
+
+        last = self.paginate(pagination, 3)
+        self.assertEqual(len(last), 5)
+        self.assertIsNone(pagination.get_next_link())
+        self.assertIn("page=2", pagination.get_previous_link())
+
+    def test_page_past_the_end_is_not_found(self):
+        with self.assertRaises(NotFound):
+            self.paginate(CountFreePagination(), 4)
+        with self.assertRaises(NotFound):
+            self.paginate(CountFreePagination(), "last")
+
+
+class EstimatedCountPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = models.Collection.objects.create(title="Tools")
+        models.Product.objects.bulk_create(
+            [
+                models.Product(
+                    title=f"Tool {i}",
+                    slug=f"tool-{i}",
+                    description="",
+                    price=10 + i,
+                    inventory=1,
+                    collection=cls.collection,
+                )
+                for i in range(12)
+            ]
+        )
+
+    def setUp(self):
+        self.pagination = EstimatedCountPagination()
+        self.pagination.estimate_threshold = 5
+        self.backend = LocMemBackend(max_entries=10, timeout=60)
+        patcher = mock.patch(
+            "store.pagination.get_response_cache",
+            return_value=ResponseCache(self.backend),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def count(self, queryset, estimate):
+        with mock.patch("store.pagination.estimate_table_rows", return_value=estimate):
+            return self.pagination.get_count(queryset)
+
+    def test_small_or_unanalyzed_tables_are_counted(self):
+        self.assertEqual(self.count(models.Product.objects.all(), None), 12)
+        self.assertEqual(self.count(models.Product.objects.all(), 3), 12)
+
+    def test_unfiltered_listing_uses_the_estimate(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count(models.Product.objects.all(), 9000), 9000)
+
+    def test_filtered_counts_are_cached_by_signature(self):
+        cheap = models.Product.objects.filter(price__lt=15)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.count(cheap, 9000), 5)
+        models.Product.objects.filter(price__lt=12).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count(cheap.order_by("-price"), 9000), 5)
+        # A different filter has its own entry.
+        self.assertEqual(
+            self.count(models.Product.objects.filter(price__lt=20), 9000), 8
+        )
+
+    def page(self, number, estimate):
+        request = Request(APIRequestFactory().get(f"/store/products/?page={number}"))
+        with mock.patch("store.pagination.estimate_table_rows", return_value=estimate):
+            results = self.pagination.paginate_queryset(
+                models.Product.objects.order_by("id"), request
+            )
+            return results, self.pagination.get_paginated_response([]).data
+
+    def test_a_wrong_estimate_does_not_move_the_last_page(self):
+        self.pagination.page_size = 5
+        # 12 rows: the third page has 2 whatever the estimate says.
+        for estimate in [6, 90000]:
+            results, data = self.page(3, estimate)
+            self.assertEqual(len(results), 2)
+            self.assertEqual(data["count"], estimate)
+            self.assertIsNone(data["next"])
+        with self.assertRaises(NotFound):
+            self.page(4, 90000)
+
+    def test_estimate_reads_sqlite_statistics(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite statistics only.")
+        self.assertIsNone(estimate_table_rows(models.Product))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(estimate_table_rows(models.Product), 12)
+
+
+class DenormalizedCounterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = models.Collection.objects.create(title="Books")
+        cls.music = models.Collection.objects.create(title="Music")
+        cls.user = create_user("reader")
+        cls.customer = cls.user.customer
+
+    def refresh(self, *objects):
+        for obj in objects:
+            obj.refresh_from_db()
+
+    def test_product_count_follows_saves_moves_and_deletes(self):
+        product = models.Product.objects.create(
+            title="Novel", description="", price=5, inventory=1, collection=self.books
+        )
+        self.refresh(self.books)
+        self.assertEqual(self.books.product_count, 1)
+
+        product = models.Product.objects.get(pk=product.pk)
+        product.collection = self.music
+        product.save()
+        product.save()
+        self.refresh(self.books, self.music)
+        self.assertEqual((self.books.product_count, self.music.product_count), (0, 1))
+
+        product.delete()
+        self.refresh(self.music)
+        self.assertEqual(self.music.product_count, 0)
+
+    def test_order_review_and_like_counts(self):
+        product = models.Product.objects.create(
+            title="Novel", description="", price=5, inventory=1, collection=self.books
+        )
+        order = models.Order.objects.create(customer=self.customer)
+        review = models.Review.objects.create(
+            product=product, customer=self.customer, description="Good"
+        )
+        like = LikedItem.objects.create(user=self.user, content_object=product)
+        LikedItem.objects.create(user=self.user, content_object=self.customer)
+        self.refresh(product, self.customer)
+        self.assertEqual(self.customer.order_count, 1)
+        self.assertEqual((product.review_count, product.like_count), (1, 1))
+
+        order.delete()
+        review.delete()
+        like.delete()
+        self.refresh(product, self.customer)
+        self.assertEqual(self.customer.order_count, 0)
+        self.assertEqual((product.review_count, product.like_count), (0, 0))
+
+    def test_saves_of_loaded_rows_keep_concurrent_counts(self):
+        product = models.Product.objects.create(
+            title="Novel", description="", price=5, inventory=1, collection=self.books
+        )
+        loaded = [
+            models.Product.objects.get(pk=product.pk),
+            models.Collection.objects.get(pk=self.books.pk),
+            models.Customer.objects.get(pk=self.customer.pk),
+        ]
+        models.Review.objects.create(
+            product=product, customer=self.customer, description="Good"
+        )
+        models.Order.objects.create(customer=self.customer)
+        models.Product.objects.create(
+            title="Atlas", description="", price=5, inventory=1, collection=self.books
+        )
+        for instance in loaded:
+            instance.save()
+        self.refresh(product, self.books, self.customer)
+        self.assertEqual(product.review_count, 1)
+        self.assertEqual(self.books.product_count, 2)
+        self.assertEqual(self.customer.order_count, 1)
+
+        self.client.force_authenticate(create_user("editor", is_staff=True))
+        self.client.patch(f"/store/collections/{self.books.pk}/", {"title": "Novels"})
+        self.refresh(self.books)
+        self.assertEqual((self.books.title, self.books.product_count), ("Novels", 2))
+
+    def test_saving_with_a_deferred_collection_does_not_count_a_move(self):
+        product = models.Product.objects.create(
+            title="Novel", description="", price=5, inventory=1, collection=self.books
+        )
+        product = models.Product.objects.only("id", "title", "price").get(pk=product.pk)
+        product.title = "Novella"
+        product.save()
+        self.refresh(self.books)
+        self.assertEqual(self.books.product_count, 1)
+
+    def test_collection_api_reads_the_column(self):
+        models.Product.objects.create(
+            title="Novel", description="", price=5, inventory=1, collection=self.books
+        )
+        with self.assertNumQueries(2):  # count, page
+            response = self.client.get("/store/collections/")
+        counts = {
+            row["title"]: row["product_count"] for row in response.data["results"]
+        }
+        self.assertEqual(counts, {"Books": 1, "Music": 0})
+
+    def test_reconcile_repairs_drift_in_batches(self):
+        models.Product.objects.bulk_create(
+            [
+                models.Product(
+                    title=f"Book {i}",
+                    slug=f"book-{i}",
+                    description="",
+                    price=5,
+                    inventory=1,
+                    collection=self.books,
+                )
+                for i in range(3)
+            ]
+        )
+        models.Collection.objects.filter(pk=self.music.pk).update(product_count=7)
+
+        repaired = counters.reconcile(batch_size=1)
+        self.assertEqual(repaired["store.Collection.product_count"], 2)
+        self.assertEqual(counters.reconcile()["store.Collection.product_count"], 0)
+        self.refresh(self.books, self.music)
+        self.assertEqual((self.books.product_count, self.music.product_count), (3, 0))
+
+
+@override_settings(STORE_RESPONSE_CACHE={"ENABLED": False})
+class EffectivePriceTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Garden")
+        cls.rake = models.Product.objects.create(
+            title="Rake", description="", price=20, inventory=5, collection=collection
+        )
+        cls.hose = models.Product.objects.create(
+            title="Hose",
+            description="",
+            price="9.99",
+            inventory=5,
+            collection=collection,
+        )
+        cls.sale = models.Promotion.objects.create(description="Sale", discount=0.25)
+        cls.clearance = models.Promotion.objects.create(
+            description="Clearance", discount=0.5
+        )
+
+    def prices(self, product):
+        product.refresh_from_db()
+        return product.effective_price, product.price_with_tax
+
+    def test_new_products_are_priced_on_save(self):
+        self.assertEqual(self.prices(self.rake), (Decimal("20.00"), Decimal("22.00")))
+        self.assertEqual(self.prices(self.hose), (Decimal("9.99"), Decimal("10.99")))
+        self.rake.price = 30
+        self.rake.save(update_fields=["price"])
+        self.assertEqual(self.prices(self.rake), (Decimal("30.00"), Decimal("33.00")))
+
+    def test_promotions_apply_the_best_discount(self):
+        self.rake.promotions.add(self.sale)
+        self.assertEqual(self.prices(self.rake), (Decimal("15.00"), Decimal("16.50")))
+        self.clearance.product_set.add(self.rake, self.hose)
+        self.assertEqual(self.prices(self.rake)[0], Decimal("10.00"))
+        self.assertEqual(self.prices(self.hose)[0], Decimal("5.00"))
+
+        self.rake.promotions.remove(self.clearance)
+        self.assertEqual(self.prices(self.rake)[0], Decimal("15.00"))
+        self.clearance.product_set.clear()
+        self.assertEqual(self.prices(self.hose)[0], Decimal("9.99"))
+        self.rake.promotions.clear()
+        self.assertEqual(self.prices(self.rake)[0], Decimal("20.00"))
+
+    def test_promotion_changes_reprice_their_products(self):
+        self.rake.promotions.add(self.sale)
+        self.sale.discount = 0.1
+        self.sale.save()
+        self.assertEqual(self.prices(self.rake)[0], Decimal("18.00"))
+        self.sale.delete()
+        self.assertEqual(self.prices(self.rake)[0], Decimal("20.00"))
+
+    def test_reprice_repairs_bulk_updates(self):
+        models.Product.objects.filter(pk=self.rake.pk).update(price=40)
+        self.assertEqual(pricing.reprice(models.Product.objects.all()), [self.rake.pk])
+        self.assertEqual(self.prices(self.rake), (Decimal("40.00"), Decimal("44.00")))
+
+    def promotion_queries(self, save):
+        with CaptureQueriesContext(connection) as queries:
+            save()
+        return [q["sql"] for q in queries if "store_product_promotions" in q["sql"]]
+
+    def test_saves_that_keep_the_price_skip_the_promotion_lookup(self):
+        self.rake.promotions.add(self.sale)
+        rake = models.Product.objects.get(pk=self.rake.pk)
+        rake.inventory = 4
+        self.assertEqual(self.promotion_queries(rake.save), [])
+        rake.inventory = 3
+        self.assertEqual(
+            self.promotion_queries(lambda: rake.save(update_fields=["inventory"])), []
+        )
+        rake.price = 40
+        self.assertEqual(len(self.promotion_queries(rake.save)), 1)
+        self.assertEqual(self.prices(rake), (Decimal("30.00"), Decimal("33.00")))
+
+    def test_stale_instances_keep_promotion_prices(self):
+        rake = models.Product.objects.get(pk=self.rake.pk)
+        self.rake.promotions.add(self.clearance)
+        rake.inventory = 4
+        rake.save()
+        self.assertEqual(self.prices(rake), (Decimal("10.00"), Decimal("11.00")))
+
+    def test_migration_backfills_stored_prices(self):
+        migration = importlib.import_module("store.migrations.0006_effective_price")
+        self.rake.promotions.add(self.sale)
+        models.Product.objects.update(effective_price=0, price_with_tax=0)
+        migration.backfill_prices(apps, None)
+        self.assertEqual(self.prices(self.rake), (Decimal("15.00"), Decimal("16.50")))
+        self.assertEqual(self.prices(self.hose), (Decimal("9.99"), Decimal("10.99")))
+
+    def test_api_serves_filters_and_orders_by_stored_prices(self):
+        self.rake.promotions.add(self.clearance)
+        response = self.client.get(
+            "/store/products/",
+            {"effective_price__lt": 11, "ordering": "-effective_price"},
+        )
+        rows = [
+            (row["title"], row["effective_price"], row["price_with_tax"])
+            for row in response.data["results"]
+        ]
+        self.assertEqual(
+            rows,
+            [
+                ("Rake", Decimal("10.00"), Decimal("11.00")),
+                ("Hose", Decimal("9.99"), Decimal("10.99")),
+            ],
+        )
+
+    def test_carts_and_checkout_charge_the_effective_price(self):
+        self.rake.promotions.add(self.sale)
+        user = create_user("gardener")
+        cart = models.Cart.objects.create()
+        models.CartItem.objects.create(cart=cart, product=self.rake, quantity=2)
+        response = self.client.get(f"/store/carts/{cart.id}/")
+        self.assertEqual(response.data["total_price"], Decimal("30.00"))
+
+        self.client.force_authenticate(user)
+        response = self.client.post("/store/orders/", {"cart_id": cart.id})
+        self.assertEqual(
+            response.data["order_items"][0]["unit_price"], Decimal("15.00")
+        )
+        self.assertEqual(response.data["total_price"], Decimal("30.00"))
+
+
+@override_settings(STORE_RESPONSE_CACHE={"ENABLED": False})
+class AsyncReadViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = models.Collection.objects.create(title="Lamps")
+        cls.products = [
+            models.Product.objects.create(
+                title=f"Lamp {i}",
+                description="",
+                price=10 + i,
+                inventory=3,
+                collection=cls.collection,
+            )
+            for i in range(12)
+        ]
+        models.ProductImage.objects.create(
+            product=cls.products[0], image="django_product_images/lamp.jpg"
+        )
+        cls.cart = models.Cart.objects.create()
+        models.CartItem.objects.create(
+            cart=cls.cart, product=cls.products[1], quantity=3
+        )
+
+    async def test_product_list_matches_the_sync_view(self):
+        path = "/store/products/?collection_id={}&price__gt=10&ordering=-price"
+        path = path.format(self.collection.id)
+        sync = await sync_to_async(self.client.get)(path)
+        response = await self.async_client.get(path.replace("/store/", "/store/async/"))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [row["id"] for row in data["results"]],
+            [row["id"] for row in sync.data["results"]],
+        )
+        self.assertIn("page=2", data["next"])
+        self.assertIsNone(data["previous"])
+
+        response = await self.async_client.get(
+            path.replace("/store/", "/store/async/") + "&page=2"
+        )
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertIsNone(response.json()["next"])
+
+    async def test_product_detail_includes_images(self):
+        product = self.products[0]
+        response = await self.async_client.get(f"/store/async/products/{product.id}/")
+        data = response.json()
+        self.assertEqual(data["title"], "Lamp 0")
+        self.assertEqual(len(data["images"]), 1)
+        response = await self.async_client.get("/store/async/products/999999/")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_collections_and_carts(self):
+        response = await self.async_client.get("/store/async/collections/")
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {
+                    "id": self.collection.id,
+                    "title": "Lamps",
+                    "featured_product": None,
+                    "product_count": 12,
+                }
+            ],
+        )
+        response = await self.async_client.get(f"/store/async/carts/{self.cart.id}/")
+        self.assertEqual(response.json()["total_price"], 33.0)
+
+    async def test_only_reads_are_allowed(self):
+        response = await self.async_client.post("/store/async/collections/")
+        self.assertEqual(response.status_code, 405)
+
+
+class StreamingExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = models.Collection.objects.create(title="Paper")
+        cls.other = models.Collection.objects.create(title="Ink")
+        cls.products = [
+            models.Product.objects.create(
+                title=f"Pad {i}",
+                description="",
+                price=2 + i,
+                inventory=9,
+                collection=cls.collection if i < 3 else cls.other,
+            )
+            for i in range(4)
+        ]
+        cls.staff = create_user("staff", is_staff=True)
+        cls.buyer = create_user("buyer")
+        cls.orders = []
+        for count in range(3):
+            order = models.Order.objects.create(customer=cls.buyer.customer)
+            for product in cls.products[:count]:
+                models.OrderItem.objects.create(
+                    order=order, product=product, quantity=2, unit_price=product.price
+                )
+            cls.orders.append(order)
+        models.Order.objects.filter(pk=cls.orders[0].pk).update(
+            placed_at="2020-01-01T00:00:00Z"
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.staff)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_orders_csv_has_a_row_per_item(self):
+        response = self.client.get("/store/orders/export/?format=csv")
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="orders.csv"'
+        )
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(len(rows), 1 + 1 + 2)
+        self.assertEqual(rows[0]["product_id"], "")
+        self.assertEqual(
+            [row["product_title"] for row in rows[1:]], ["Pad 0", "Pad 0", "Pad 1"]
+        )
+
+    def test_orders_ndjson_filters_on_placed_at(self):
+        response = self.client.get(
+            "/store/orders/export/",
+            {"format": "ndjson", "placed_at__gte": "2021-01-01"},
+        )
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(
+            [record["order_id"] for record in records],
+            [order.id for order in self.orders[1:]],
+        )
+        self.assertEqual(records[1]["total_price"], 2 * 2 + 2 * 3)
+        self.assertEqual(len(records[1]["order_items"]), 2)
+
+    def test_orders_prefetch_once_per_chunk(self):
+        with self.assertNumQueries(2):
+            self.read(self.client.get("/store/orders/export/?format=ndjson"))
+
+    def test_products_mirror_the_product_filter(self):
+        response = self.client.get(
+            "/store/products/export/",
+            {"format": "csv", "collection_id": self.collection.id, "price__gt": 2},
+        )
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual([row["title"] for row in rows], ["Pad 1", "Pad 2"])
+        self.assertEqual(rows[0]["price_with_tax"], "3.30")
+
+    def test_chunks_seek_past_the_last_id(self):
+        ids = [product.id for product in self.products]
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(export.chunks(models.Product.objects.values("id"), 3))
+        self.assertEqual(
+            [[row["id"] for row in chunk] for chunk in chunks], [ids[:3], ids[3:]]
+        )
+        self.assertEqual(len(queries), 2)
+        self.assertIn(str(ids[2]), queries[1]["sql"])
+
+    @override_settings(STORE_SEARCH={"BACKEND": "index", "MAX_RESULTS": 1})
+    def test_search_is_not_capped(self):
+        response = self.client.get(
+            "/store/products/export/", {"format": "csv", "search": "pad"}
+        )
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(len(rows), 4)
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get(
+            "/store/orders/export/", {"format": "csv", "placed_at__gte": "soon"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_exports_are_staff_only(self):
+        self.client.force_authenticate(self.buyer)
+        for path in ["/store/orders/export/", "/store/products/export/"]:
+            response = self.client.get(path, {"format": "csv"})
+            self.assertEqual(response.status_code, 403)
+
+
+@override_settings(STORE_RESPONSE_CACHE={"ENABLED": False})
+class ProductImportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tools = models.Collection.objects.create(title="Tools")
+        cls.garden = models.Collection.objects.create(title="Garden")
+        cls.hammer = models.Product.objects.create(
+            title="Hammer", description="", price=9, inventory=1, collection=cls.tools
+        )
+        cls.staff = create_user("staff", is_staff=True)
+
+    def upload(self, name, content, **data):
+        self.client.force_authenticate(self.staff)
+        file = io.BytesIO(content.encode())
+        file.name = name
+        return self.client.post(
+            "/store/products/import/", {"file": file, **data}, format="multipart"
+        )
+
+    def test_csv_rows_are_created_and_updated_in_batches(self):
+        content = (
+            "id,title,description,price,inventory,collection\n"
+            f",Hammer,Claw,12.50,4,{self.tools.id}\n"
+            ",Hammer,Sledge,30,2,Tools\n"
+            ",Rake,,8,10,Garden\n"
+            f"{self.hammer.id},Hammer,Steel,11,3,Garden\n"
+            ",Spade,,0,1,Garden\n"
+            ",Hoe,,5,1,Kitchen\n"
+            "999999,Ghost,,5,1,Tools\n"
+        )
+        response = self.upload("catalog.csv", content, batch_size=2)
+
+        self.assertEqual(response.status_code, 200)
+        report = response.data
+        self.assertEqual(
+            (report["rows"], report["created"], report["updated"], report["failed"]),
+            (7, 3, 1, 3),
+        )
+        self.assertEqual(
+            {error["line"]: list(error["errors"]) for error in report["errors"]},
+            {6: ["price"], 7: ["collection"], 8: ["id"]},
+        )
+        self.assertEqual(
+            sorted(models.Product.objects.values_list("slug", flat=True)),
+            ["hammer", "hammer-2", "hammer-3", "rake"],
+        )
+        claw = models.Product.objects.get(description="Claw")
+        self.assertEqual(claw.price_with_tax, Decimal("13.75"))
+
+        self.hammer.refresh_from_db()
+        self.assertEqual(
+            (self.hammer.description, self.hammer.collection_id),
+            ("Steel", self.garden.id),
+        )
+        self.tools.refresh_from_db()
+        self.garden.refresh_from_db()
+        self.assertEqual((self.tools.product_count, self.garden.product_count), (2, 2))
+        self.assertEqual(counters.reconcile()["store.Collection.product_count"], 0)
+
+    def test_numbered_slugs_survive_later_saves(self):
+        content = (
+            "id,title,description,price,inventory,collection\n,Hammer,Claw,12,4,Tools\n"
+        )
+        self.upload("catalog.csv", content)
+        claw = models.Product.objects.get(description="Claw")
+        self.assertEqual(claw.slug, "hammer-2")
+        claw.inventory = 3
+        claw.save()
+        self.assertEqual(claw.slug, "hammer-2")
+        claw.title = "Rake"
+        claw.save()
+        self.assertEqual(claw.slug, "rake")
+
+    def test_updates_refresh_slug_and_last_update_once_per_product(self):
+        before = self.hammer.last_update
+        content = (
+            "id,title,description,price,inventory,collection\n"
+            f"{self.hammer.id},Mallet,First,10,1,Garden\n"
+            f"{self.hammer.id},Mallet,Second,10,1,Garden\n"
+        )
+        report = self.upload("catalog.csv", content).data
+        self.assertEqual((report["updated"], report["failed"]), (1, 1))
+        self.assertEqual(report["errors"][0]["line"], 2)
+        self.hammer.refresh_from_db()
+        self.assertEqual(
+            (self.hammer.slug, self.hammer.description), ("mallet", "Second")
+        )
+        self.assertGreater(self.hammer.last_update, before)
+        self.garden.refresh_from_db()
+        self.assertEqual(self.garden.product_count, 1)
+
+    def test_ndjson_reports_unparseable_lines(self):
+        content = '{"title": "Saw", "price": 7, "inventory": 1, "collection": "Tools"}\nnot json\n'
+        response = self.upload("catalog.ndjson", content)
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 1))
+        self.assertEqual(response.data["errors"][0]["line"], 2)
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        rows = "".join(f",Tool {i},,5,1,Tools\n" for i in range(50))
+        content = "id,title,description,price,inventory,collection\n" + rows
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload("catalog.csv", content, batch_size=100)
+        self.assertEqual(response.data["created"], 50)
+        self.assertLess(len(queries), 20)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.upload("catalog.xml", "<x/>").status_code, 400)
+        self.assertEqual(self.upload("catalog.json", "[{").status_code, 400)
+        self.client.force_authenticate(create_user("customer"))
+        response = self.client.post("/store/products/import/", {}, format="multipart")
+        self.assertEqual(response.status_code, 403)
+
+    def test_management_command(self):
+        path = os.path.join(tempfile.mkdtemp(), "catalog.json")
+        self.addCleanup(os.remove, path)
+        with open(path, "w") as file:
+            json.dump(
+                [{"title": "Saw", "price": "7", "inventory": 1, "collection": "Tools"}],
+                file,
+            )
+        out = io.StringIO()
+        call_command("import_products", path, stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["created"], 1)
+        self.assertTrue(models.Product.objects.filter(slug="saw").exists())
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = models.Collection.objects.create(title="Tea")
+        cls.product = models.Product.objects.create(
+            title="Oolong",
+            description="",
+            price=5,
+            inventory=3,
+            collection=cls.collection,
+        )
+        cls.user = create_user("drinker")
+        # Give the customer an id that differs from the user's.
+        models.Customer.objects.filter(user=cls.user).delete()
+        models.Customer.objects.create(pk=cls.user.pk + 100, user=cls.user)
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}"
+        )
+
+    def test_warm_request_issues_no_identity_queries(self):
+        self.assertEqual(self.client.get("/store/customers/me/").status_code, 200)
+        # Only the customer row itself, fetched by primary key.
+        with self.assertNumQueries(1):
+            response = self.client.get("/store/customers/me/")
+        self.assertEqual(response.data["id"], self.user.pk + 100)
+
+    def test_orders_are_scoped_by_the_cached_customer(self):
+        order = models.Order.objects.create(customer_id=self.user.pk + 100)
+        response = self.client.get("/store/orders/")
+        self.assertEqual([row["id"] for row in response.data["results"]], [order.pk])
+
+    def test_review_is_written_for_the_customer(self):
+        response = self.client.post(
+            f"/store/products/{self.product.pk}/reviews/", {"description": "Fine"}
+        )
+        self.assertEqual(response.status_code, 201)
+        review = models.Review.objects.get()
+        self.assertEqual(review.customer_id, self.user.pk + 100)
+
+    def test_saving_the_user_invalidates_the_cache(self):
+        self.client.get("/store/customers/me/")
+        self.assertIsNotNone(get_auth_cache().get(user_key(self.user.pk)))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(get_auth_cache().get(user_key(self.user.pk)))
+        self.assertEqual(self.client.get("/store/customers/me/").status_code, 401)
+
+    def test_blacklisting_a_token_invalidates_the_cache(self):
+        self.client.get("/store/customers/me/")
+        self.refresh.blacklist()
+        self.assertIsNone(get_auth_cache().get(user_key(self.user.pk)))
+
+    def test_revoking_staff_invalidates_the_cache(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get("/store/customers/me/")
+        self.user.is_staff = False
+        self.user.save()
+        self.assertIsNone(get_auth_cache().get(user_key(self.user.pk)))
+
+    def test_identities_stay_out_of_the_response_cache(self):
+        get_response_cache().backend.clear()
+        self.client.get("/store/customers/me/")
+        self.assertIsNone(get_response_cache().backend.get(user_key(self.user.pk)))
+        self.assertIsNotNone(get_auth_cache().get(user_key(self.user.pk)))
+
+    @override_settings(STORE_AUTH_CACHE={"ENABLED": False})
+    def test_disabled_cache_reads_the_user_every_request(self):
+        self.client.get("/store/customers/me/")
+        with self.assertNumQueries(2):
+            response = self.client.get("/store/customers/me/")
+        self.assertEqual(response.data["id"], self.user.pk + 100)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/store/customers/me/").status_code, 401)
+
+    def test_password_is_not_cached(self):
+        self.client.get("/store/customers/me/")
+        field_names, _, _ = get_auth_cache().get(user_key(self.user.pk))
+        self.assertNotIn("password", field_names)
+
+
+class OwnerPermissionTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = models.Collection.objects.create(title="Soap")
+        cls.product = models.Product.objects.create(
+            title="Lye", description="", price=4, inventory=8, collection=cls.collection
+        )
+        cls.owner = create_user("owner")
+        cls.stranger = create_user("stranger")
+        cls.staff = create_user("staff", is_staff=True)
+        cls.review = models.Review.objects.create(
+            product=cls.product, customer=cls.owner.customer, description="Clean"
+        )
+        cls.order = models.Order.objects.create(customer=cls.owner.customer)
+        models.Order.objects.create(customer=cls.stranger.customer)
+
+    def check(self, user, method="PATCH"):
+        request = Request(APIRequestFactory().generic(method, "/"))
+        request.user = user
+        request.customer_id = user.customer.pk
+        # A fresh instance, so nothing about its customer is cached.
+        review = models.Review.objects.get(pk=self.review.pk)
+        with self.assertNumQueries(0):
+            return OwnerOrAdmin().has_object_permission(request, None, review)
+
+    def test_object_checks_add_no_queries(self):
+        self.assertTrue(self.check(self.owner))
+        self.assertFalse(self.check(self.stranger))
+        self.assertTrue(self.check(self.staff))
+        self.assertTrue(self.check(self.stranger, method="GET"))
+
+    def test_rejected_update_only_reads_the_review(self):
+        get_auth_cache().clear()
+        token = RefreshToken.for_user(self.stranger).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        url = f"/store/products/{self.product.pk}/reviews/{self.review.pk}/"
+        self.assertEqual(self.client.patch(url, {"description": "x"}).status_code, 403)
+        with self.assertNumQueries(1):
+            response = self.client.patch(url, {"description": "Fresh"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_owner_filter_scopes_orders(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get("/store/orders/")
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]], [self.order.pk]
+        )
+        self.assertEqual(
+            self.client.get(f"/store/orders/{self.order.pk + 1}/").status_code, 404
+        )
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(len(self.client.get("/store/orders/").data["results"]), 2)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get("/store/orders/").status_code, 401)
+
+
+class OutboxTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Candles")
+        cls.product = models.Product.objects.create(
+            title="Beeswax", description="", price=6, inventory=5, collection=collection
+        )
+        cls.user = create_user("lighter")
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, quantity=1):
+        cart = models.Cart.objects.create()
+        models.CartItem.objects.create(
+            cart=cart, product=self.product, quantity=quantity
+        )
+        return self.client.post("/store/orders/", {"cart_id": cart.id})
+
+    def test_order_created_fires_from_the_worker_not_checkout(self):
+        receiver = mock.Mock()
+        order_created.connect(receiver, dispatch_uid="outbox-test")
+        self.addCleanup(order_created.disconnect, dispatch_uid="outbox-test")
+
+        order_id = self.checkout().data["id"]
+        receiver.assert_not_called()
+        event = models.OutboxEvent.objects.get()
+        self.assertEqual(event.topic, "order.created")
+        self.assertEqual(event.payload["order_id"], order_id)
+
+        stats = outbox.dispatch()
+        self.assertEqual((stats["delivered"], stats["failed"]), (1, 0))
+        order = receiver.call_args.kwargs["order"]
+        self.assertEqual((order.pk, order.total_price), (order_id, Decimal(6)))
+        event.refresh_from_db()
+        self.assertEqual(event.status, models.OutboxEvent.STATUS_DELIVERED)
+        self.assertEqual(outbox.dispatch()["claimed"], 0)
+
+    def test_failed_checkout_writes_no_event(self):
+        self.assertEqual(self.checkout(quantity=50).status_code, 400)
+        self.assertFalse(models.OutboxEvent.objects.exists())
+
+    def test_handlers_get_batches_and_bad_events_are_isolated(self):
+        calls = []
+
+        def flaky(events):
+            calls.append([event.payload["n"] for event in events])
+            if any(event.payload["n"] == 2 for event in events):
+                raise RuntimeError("boom")
+
+        for n in range(4):
+            outbox.publish("test.flaky", {"n": n})
+        with mock.patch.dict(outbox.handlers, {"test.flaky": [flaky]}):
+            stats = outbox.dispatch()
+        self.assertEqual(calls, [[0, 1, 2, 3], [0], [1], [2], [3]])
+        self.assertEqual((stats["delivered"], stats["failed"]), (3, 1))
+
+        event = models.OutboxEvent.objects.get(payload__n=2)
+        self.assertEqual(event.status, models.OutboxEvent.STATUS_PENDING)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("boom", event.last_error)
+        self.assertGreater(event.available_at, timezone.now())
+
+    def test_events_fail_after_max_attempts(self):
+        def broken(events):
+            raise RuntimeError("down")
+
+        event = outbox.publish("test.broken", {})
+        with mock.patch.dict(outbox.handlers, {"test.broken": [broken]}):
+            for attempt in range(3):
+                models.OutboxEvent.objects.update(available_at=timezone.now())
+                outbox.dispatch(max_attempts=3)
+        event.refresh_from_db()
+        self.assertEqual(event.status, models.OutboxEvent.STATUS_FAILED)
+        self.assertEqual(outbox.backlog()["failed"], 1)
+
+    def test_worker_command_drains_the_outbox(self):
+        for _ in range(3):
+            self.checkout()
+        self.assertEqual(outbox.backlog()["pending"], 3)
+        out = io.StringIO()
+        call_command("process_outbox", once=True, batch_size=2, stdout=out)
+        self.assertIn("Delivered 3 events", out.getvalue())
+        self.assertEqual(outbox.backlog()["pending"], 0)
+
+    def test_worker_deliveries_reach_the_metrics_endpoint(self):
+        for _ in range(3):
+            self.checkout()
+        models.OutboxEvent.objects.update(
+            created_at=timezone.now() - timedelta(seconds=4)
+        )
+        call_command("process_outbox", once=True, stdout=io.StringIO())
+
+        self.client.force_authenticate(create_user("ops", is_staff=True))
+        body = self.client.get("/store/_metrics").content.decode()
+        gauges = dict(
+            line.split(" ")
+            for line in body.splitlines()
+            if line.startswith("store_outbox_")
+        )
+        self.assertEqual(gauges["store_outbox_pending_events"], "0")
+        self.assertEqual(
+            float(gauges["store_outbox_delivered_per_second"]),
+            3 / outbox.RECENT_SECONDS,
+        )
+        self.assertGreaterEqual(float(gauges["store_outbox_lag_mean_seconds"]), 4)
+        self.assertGreaterEqual(float(gauges["store_outbox_lag_max_seconds"]), 4)
+
+    def test_worker_purges_old_deliveries(self):
+        for _ in range(2):
+            self.checkout()
+        outbox.dispatch()
+        old, kept = models.OutboxEvent.objects.order_by("id")
+        old.delivered_at = timezone.now() - timedelta(days=8)
+        old.save(update_fields=["delivered_at"])
+        pending = outbox.publish("test.pending", {})
+
+        out = io.StringIO()
+        call_command("process_outbox", once=True, stdout=out)
+        self.assertIn("Purged 1 delivered events", out.getvalue())
+        self.assertEqual(
+            set(models.OutboxEvent.objects.values_list("id", flat=True)),
+            {kept.pk, pending.pk},
+        )
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class UserProvisioningTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_user("admin", is_staff=True)
+
+    def row(self, n, **fields):
+        return {
+            "username": f"member{n}",
+            "email": f"member{n}@example.com",
+            "phone_number": f"+88697{n:07d}",
+            "first_name": "Mem",
+            "last_name": f"Ber{n}",
+            "password": f"s3cret-horse-{n}",
+            **fields,
+        }
+
+    def provision(self, rows, **kwargs):
+        return provisioning.UserProvisioner(**kwargs).run(enumerate(rows, start=1))
+
+    def test_users_get_customers_in_batched_queries(self):
+        rows = [self.row(n) for n in range(40)]
+        with CaptureQueriesContext(connection) as queries:
+            report = self.provision(rows, batch_size=20, workers=1)
+        self.assertEqual((report["created"], report["failed"]), (40, 0))
+        # Per batch: three uniqueness lookups, savepoint, users, customers and
+        # release (plus a re-read of the ids without RETURNING).
+        self.assertLessEqual(len(queries), 2 * 8)
+        user = get_user_model().objects.get(username="member7")
+        self.assertTrue(user.check_password("s3cret-horse-7"))
+        self.assertEqual(user.customer.membership, models.Customer.MEMBERSHIP_BRONZE)
+
+    def test_passwords_are_hashed_across_threads(self):
+        report = self.provision([self.row(n) for n in range(6)], workers=2)
+        self.assertEqual(report["created"], 6)
+        users = get_user_model().objects.filter(username__startswith="member")
+        self.assertTrue(
+            all(
+                user.check_password(f"s3cret-horse-{user.username[6:]}")
+                for user in users
+            )
+        )
+
+    def test_bad_and_duplicate_rows_are_reported(self):
+        self.provision([self.row(1)], workers=1)
+        report = self.provision(
+            [
+                self.row(1),  # taken
+                self.row(2),
+                self.row(3, email="member2@example.com"),  # repeats row 2
+                self.row(4, password="123"),
+                self.row(5, phone_number="nope"),
+                {key: value for key, value in self.row(6).items() if key != "password"},
+            ],
+            workers=1,
+        )
+        self.assertEqual((report["created"], report["failed"]), (2, 4))
+        self.assertEqual(
+            [(error["line"], sorted(error["errors"])) for error in report["errors"]],
+            [
+                (4, ["password"]),
+                (5, ["phone_number"]),
+                (1, ["email", "phone_number", "username"]),
+                (3, ["email"]),
+            ],
+        )
+        user = get_user_model().objects.get(username="member6")
+        self.assertFalse(user.has_usable_password())
+        self.assertTrue(models.Customer.objects.filter(user=user).exists())
+
+    def test_admin_api(self):
+        content = "username,email,phone_number,first_name,last_name\n" + ",".join(
+            self.row(9)[key]
+            for key in ["username", "email", "phone_number", "first_name", "last_name"]
+        )
+        file = io.BytesIO(content.encode())
+        file.name = "members.csv"
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(
+            "/store/customers/provision/", {"file": file}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+        self.client.force_authenticate(create_user("nobody"))
+        response = self.client.post(
+            "/store/customers/provision/", {}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class ReviewReadPathTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Tents")
+        cls.product = models.Product.objects.create(
+            title="Dome", description="", price=90, inventory=2, collection=collection
+        )
+        cls.reviews = []
+        for i in range(7):
+            user = create_user(f"camper{i}", first_name="Cam", last_name=f"Per{i}")
+            cls.reviews.append(
+                models.Review.objects.create(
+                    product=cls.product,
+                    customer=user.customer,
+                    description=f"Night {i}",
+                    rating=1 + i % 5 if i < 6 else None,
+                )
+            )
+        cls.url = f"/store/products/{cls.product.pk}/reviews/"
+
+    def test_pages_cost_one_query_and_walk_newest_first(self):
+        ids, url = [], self.url + "?pagination=cursor"
+        with mock.patch.object(ReviewPagination, "page_size", 3):
+            while url:
+                with self.assertNumQueries(1):
+                    response = self.client.get(url)
+                ids += [review["id"] for review in response.data["results"]]
+                url = response.data["next"]
+        # Same date everywhere, so id breaks the tie.
+        self.assertEqual(ids, [review.pk for review in reversed(self.reviews)])
+        first = response.data["results"][-1]
+        self.assertEqual(first["customer"]["user"]["last_name"], "Per0")
+
+    def test_summary_is_served_from_the_rollup(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url + "summary/")
+        self.assertEqual(
+            response.data,
+            {
+                "review_count": 7,
+                "rating_count": 6,
+                "average_rating": Decimal("2.67"),
+                "ratings": {"1": 2, "2": 1, "3": 1, "4": 1, "5": 1},
+            },
+        )
+
+    def test_rollup_follows_rating_changes_and_deletes(self):
+        review = models.Review.objects.get(pk=self.reviews[0].pk)
+        review.rating = 5
+        review.save()
+        self.reviews[6].delete()
+        self.reviews[1].delete()
+        summary = models.ReviewSummary.objects.get(product=self.product)
+        self.assertEqual(
+            (summary.rating_count, summary.rating_total, summary.stars_1),
+            (5, 18, 1),
+        )
+        self.assertEqual(summary.stars_5, 2)
+
+    def test_reconcile_repairs_the_rollup(self):
+        models.ReviewSummary.objects.update(rating_count=0, stars_3=9)
+        repaired = counters.reconcile()
+        self.assertEqual(repaired["store.ReviewSummary"], 1)
+        summary = models.ReviewSummary.objects.get(product=self.product)
+        self.assertEqual((summary.rating_count, summary.stars_3), (6, 1))
+
+    def test_product_without_reviews_has_an_empty_summary(self):
+        other = models.Product.objects.create(
+            title="Tarp",
+            description="",
+            price=9,
+            inventory=1,
+            collection_id=self.product.collection_id,
+        )
+        response = self.client.get(f"/store/products/{other.pk}/reviews/summary/")
+        self.assertEqual(response.data["average_rating"], None)
+        self.assertEqual(response.data["review_count"], 0)
+        self.assertEqual(
+            self.client.get("/store/products/999999/reviews/summary/").status_code, 404
+        )
+
+
+class ProductTagAndLikeTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title="Garden")
+        cls.products = [
+            models.Product.objects.create(
+                title=title, description="", price=5, inventory=9, collection=collection
+            )
+            for title in ["Rake", "Hoe", "Spade", "Shears"]
+        ]
+        cls.green = Tag.objects.create(label="green")
+        cls.steel = Tag.objects.create(label="steel")
+        cls.staff = create_user("gardener", is_staff=True)
+        cls.user = create_user("weeder")
+
+    def setUp(self):
+        get_response_cache().backend.clear()
+
+    def tag(self, tag, products, method="post"):
+        self.client.force_authenticate(self.staff)
+        response = getattr(self.client, method)(
+            f"/store/tags/{tag.pk}/products/",
+            {"products": [product.pk for product in products]},
+            format="json",
+        )
+        self.client.force_authenticate(None)
+        return response
+
+    @override_settings(STORE_RESPONSE_CACHE={"ENABLED": False})
+    def test_list_loads_tags_in_one_query_and_counts_likes_for_free(self):
+        self.tag(self.green, self.products)
+        self.tag(self.steel, self.products[:2])
+        LikedItem.objects.create(user=self.user, content_object=self.products[0])
+        # table stats, count, page, images, tags
+        with self.assertNumQueries(5):
+            response = self.client.get("/store/products/?ordering=price")
+        rake = response.data["results"][0]
+        self.assertEqual([tag["label"] for tag in rake["tags"]], ["green", "steel"])
+        self.assertEqual(rake["like_count"], 1)
+        self.assertEqual(
+            response.data["results"][3]["tags"],
+            [{"id": self.green.pk, "label": "green"}],
+        )
+
+    def test_bulk_tagging_skips_existing_pairs_and_filters(self):
+        self.assertEqual(self.tag(self.steel, self.products[:2]).data, {"changed": 2})
+        self.assertEqual(self.tag(self.steel, self.products[:3]).data, {"changed": 1})
+        response = self.client.get(f"/store/products/?tag={self.steel.pk}")
+        self.assertEqual(
+            {product["id"] for product in response.data["results"]},
+            {product.pk for product in self.products[:3]},
+        )
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.delete(
+            f"/store/products/{self.products[0].pk}/tags/",
+            {"tags": [self.steel.pk, self.green.pk]},
+            format="json",
+        )
+        self.assertEqual(response.data, {"changed": 1})
+        self.assertEqual(TaggedItem.objects.filter(tag=self.steel).count(), 2)
+
+    def test_tagging_rejects_unknown_ids_and_non_staff(self):
+        response = self.tag(self.green, [self.products[0], models.Product(pk=999999)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("999999", str(response.data["products"]))
+        self.assertEqual(self.tag(Tag(pk=999999), self.products).status_code, 404)
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            f"/store/products/{self.products[0].pk}/tags/",
+            {"tags": [self.green.pk]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(TaggedItem.objects.exists())
+
+    def test_like_unlike_and_liked_by_me(self):
+        rake, hoe = self.products[:2]
+        self.client.force_authenticate(self.user)
+        self.assertEqual(
+            self.client.post(f"/store/products/{rake.pk}/like/").status_code, 201
+        )
+        self.assertEqual(
+            self.client.post(f"/store/products/{rake.pk}/like/").status_code, 200
+        )
+        self.client.post(f"/store/products/{hoe.pk}/like/")
+        response = self.client.get("/store/products/liked/")
+        self.assertEqual(
+            {product["id"] for product in response.data["results"]}, {rake.pk, hoe.pk}
+        )
+
+        self.assertEqual(
+            self.client.delete(f"/store/products/{hoe.pk}/like/").status_code, 204
+        )
+        rake.refresh_from_db()
+        hoe.refresh_from_db()
+        self.assertEqual((rake.like_count, hoe.like_count), (1, 0))
+        response = self.client.get("/store/products/liked/")
+        self.assertEqual(
+            [product["id"] for product in response.data["results"]], [rake.pk]
+        )
+
+        self.client.force_authenticate(None)
+        self.assertEqual(
+            self.client.post(f"/store/products/{rake.pk}/like/").status_code, 401
+        )
+        self.assertEqual(self.client.get("/store/products/liked/").status_code, 401)
+
+    def test_tag_changes_invalidate_lists_and_likes_the_product(self):
+        rake = self.products[0]
+        self.client.get("/store/products/")
+        self.client.get(f"/store/products/{rake.pk}/")
+        self.tag(self.green, [rake])
+        response = self.client.get("/store/products/")
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        self.green.label = "lime"
+        self.green.save()
+        response = self.client.get(f"/store/products/{rake.pk}/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["tags"][0]["label"], "lime")
+
+        lists = [
+            "/store/products/",
+            f"/store/products/?collection_id={rake.collection_id}",
+            f"/store/products/?tag={self.green.pk}",
+        ]
+        for url in lists:
+            self.client.get(url)
+        LikedItem.objects.create(user=self.user, content_object=rake)
+        response = self.client.get(f"/store/products/{rake.pk}/")
+        self.assertEqual(
+            (response["X-Cache"], response.data["like_count"]), ("MISS", 1)
+        )
+        # Lists stay cached but carry the new like_count.
+        for url in lists:
+            response = self.client.get(url)
+            like_counts = {
+                row["id"]: row["like_count"] for row in response.data["results"]
+            }
+            self.assertEqual((response["X-Cache"], like_counts[rake.pk]), ("HIT", 1))
@@ -1,18 +1,34 @@
-from unicodedata import name
-from rest_framework_nested import routers
-from . import views
-
-
-router = routers.DefaultRouter()
-router.register("products", views.ProductViewSet)
-router.register("collections", views.CollectionViewSet)
-router.register("carts", views.CartViewSet)
-router.register("customers", views.CustomerViewSet)
-router.register("orders", views.OrderViewSet, basename="orders")
-
-products_router = routers.NestedDefaultRouter(router, "products", lookup="products")
-products_router.register("reviews", views.ReviewViewSet, basename="product_reviews")
-products_router.register("images", views.ProductImageViewSet, basename="product_images")
-carts_router = routers.NestedDefaultRouter(router, "carts", lookup="carts")
-carts_router.register("items", views.CartItemViewSet, basename="cart_items")
-urlpatterns = router.urls + products_router.urls + carts_router.urls
+from unicodedata import name
+from django.urls import include, path
+from rest_framework_nested import routers
+from . import async_views, views
+
+router = routers.DefaultRouter()
+router.register("products", views.ProductViewSet)
+router.register("collections", views.CollectionViewSet)
+router.register("tags", views.TagViewSet)
+router.register("carts", views.CartViewSet)
+router.register("customers", views.CustomerViewSet)
+router.register("orders", views.OrderViewSet, basename="orders")
+
+products_router = routers.NestedDefaultRouter(router, "products", lookup="products")
+products_router.register("reviews", views.ReviewViewSet, basename="product_reviews")
+products_router.register("images", views.ProductImageViewSet, basename="product_images")
+carts_router = routers.NestedDefaultRouter(router, "carts", lookup="carts")
+carts_router.register("items", views.CartItemViewSet, basename="cart_items")
+async_urlpatterns = [
+    path("products/", async_views.product_list, name="async-product-list"),
+    path("products/<int:pk>/", async_views.product_detail, name="async-product-detail"),
+    path("collections/", async_views.collection_list, name="async-collection-list"),
+    path("carts/<uuid:pk>/", async_views.cart_detail, name="async-cart-detail"),
+]
+
+urlpatterns = (
+    [
+        path("_metrics", views.MetricsView.as_view(), name="metrics"),
+        path("async/", include(async_urlpatterns)),
+    ]
+    + router.urls
+    + products_router.urls
+    + carts_router.urls
+)
@@ -1,197 +1,532 @@
-from django.db.models import Count
-from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, GenericViewSet
-from rest_framework.mixins import (
-    ListModelMixin,
-    CreateModelMixin,
-    RetrieveModelMixin,
-    DestroyModelMixin,
-    UpdateModelMixin,
-)
-from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.decorators import action
-from rest_framework.permissions import (
-    IsAdminUser,
-    IsAuthenticated,
-    IsAuthenticatedOrReadOnly,
-)
-from . import models, serializers
-from .pagination import DefaultPagination
-from .filter import ProductFilter
-from .permissions import IsAdminOrReadOnly, OwnerOrAdmin
-
-
-class CollectionViewSet(ModelViewSet):
-    queryset = models.Collection.objects.annotate(product_count=Count("product"))
-    serializer_class = serializers.CollectionSerializer
-    permission_classes = [IsAdminOrReadOnly]
-
-    def destroy(self, request, *args, **kwargs):
-        collection = models.Collection.objects.get(pk=kwargs["pk"])
-        if collection.product.all().count() > 0:
-            return Response(
-                {
-                    "error": "Collection can't be deleted because it's associated with product"
-                },
-            )
-        return super().destroy(request, *args, **kwargs)
-
-
-class ProductViewSet(ModelViewSet):
-    queryset = models.Product.objects.prefetch_related("images").all()
-    serializer_class = serializers.ProductSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_class = ProductFilter
-    search_fields = ["title", "description", "collection__title"]
-    ordering_fields = ["price", "last_update"]
-    permission_classes = [IsAdminOrReadOnly]
-
-    def destroy(self, request, *args, **kwargs):
-        if models.OrderItem.objects.filter(product_id=kwargs["pk"]).count() > 0:
-            return Response(
-                {
-                    "error": "Product can't be deleted because it's associated with orderitem"
-                },
-            )
-        return super().destroy(request, *args, **kwargs)
-
-
-class ReviewViewSet(ModelViewSet):
-    serializer_class = serializers.ReviewSerializer
-
-    def get_queryset(self):
-        if getattr(self, "swagger_fake_view", False):
-            return {}
-        else:
-            return models.Review.objects.select_related("product").filter(
-                product_id=self.kwargs["products_pk"]
-            )
-
-    def get_permissions(self):
-        if self.request.method in ["PATCH", "PUT", "DELETE"]:
-            return [OwnerOrAdmin()]
-        return [IsAuthenticatedOrReadOnly()]
-
-    def get_serializer_context(self):
-        if getattr(self, "swagger_fake_view", False):
-            return {}
-        else:
-            return {
-                "product_id": self.kwargs["products_pk"],
-                "user_id": self.request.user.id,
-            }
-
-
-class ProductImageViewSet(ModelViewSet):
-    serializer_class = serializers.ProductImageSerializer
-    pagination_class = DefaultPagination
-
-    def get_queryset(self):
-        if getattr(self, "swagger_fake_view", False):
-            return {}
-        else:
-            return models.ProductImage.objects.select_related("product").filter(
-                product_id=self.kwargs["products_pk"]
-            )
-
-    def get_serializer_context(self):
-        if getattr(self, "swagger_fake_view", False):
-            return {}
-        else:
-            return {
-                "product_id": self.kwargs["products_pk"],
-            }
-
-
-class CartViewSet(
-    CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, GenericViewSet
-):
-    queryset = models.Cart.objects.prefetch_related("cart_items").all()
-    serializer_class = serializers.CartSerializer
-
-
-class CartItemViewSet(ModelViewSet):
-    http_method_names = ["get", "post", "patch", "delete"]
-
-    def get_serializer_class(self):
-        if self.request.method == "POST":
-            return serializers.AddCartItemSerializer
-        elif self.request.method == "PATCH":
-            return serializers.UpdateCartItemSerializer
-        return serializers.CartItemSerializer
-
-    def get_serializer_context(self):
-        if getattr(self, "swagger_fake_view", False):
-            return {}
-        else:
-            return {"cart_id": self.kwargs["carts_pk"]}
-
-    def get_queryset(self):
-        if getattr(self, "swagger_fake_view", False):
-            return {}
-        else:
-            return models.CartItem.objects.filter(
-                cart_id=self.kwargs["carts_pk"]
-            ).select_related("product")
-
-
-class CustomerViewSet(
-    RetrieveModelMixin,
-    UpdateModelMixin,
-    DestroyModelMixin,
-    ListModelMixin,
-    GenericViewSet,
-):
-    queryset = models.Customer.objects.all()
-    serializer_class = serializers.CustomerSerializer
-    permission_classes = [IsAdminUser]
-
-    @action(detail=False, methods=["GET", "PUT"], permission_classes=[IsAuthenticated])
-    def me(self, request):
-        customer = models.Customer.objects.get(user_id=request.user.id)
-        if request.method == "GET":
-            serializer = serializers.CustomerSerializer(customer)
-            return Response(serializer.data)
-        elif request.method == "PUT":
-            serializer = serializers.CustomerSerializer(customer, data=request.data)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data)
-
-
-class OrderViewSet(ModelViewSet):
-    http_method_names = ["get", "post", "patch", "delete", "head", "options"]
-
-    def get_permissions(self):
-        if self.request.method == "GET":
-            return [OwnerOrAdmin()]
-        if self.request.method in ["PATCH", "DELETE"]:
-            return [IsAdminUser()]
-        return [IsAuthenticated()]
-
-    def create(self, request, *args, **kwargs):
-        serializer = serializers.CreateOrderSerializer(
-            data=request.data, context={"user_id": self.request.user.id}
-        )
-        serializer.is_valid(raise_exception=True)
-        order = serializer.save()
-        serializer = serializers.OrderSerializer(order)
-        return Response(serializer.data)
-
-    def get_serializer_class(self):
-        if self.request.method == "POST":
-            return serializers.CreateOrderSerializer
-        elif self.request.method == "PATCH":
-            return serializers.UpdateOrderSerializer
-        return serializers.OrderSerializer
-
-    def get_queryset(self):
-        if getattr(self, "swagger_fake_view", False):
-            return {}
-        else:
-            user = self.request.user
-            if user.is_staff:
-                return models.Order.objects.all()
-            customer_id = models.Customer.objects.only("id").get(user_id=user.id)
-            return models.Order.objects.filter(customer_id=customer_id)
+import io
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.viewsets import ModelViewSet, GenericViewSet
+from rest_framework.mixins import (
+    ListModelMixin,
+    CreateModelMixin,
+    RetrieveModelMixin,
+    DestroyModelMixin,
+    UpdateModelMixin,
+)
+from rest_framework.filters import OrderingFilter
+from rest_framework.decorators import action
+from rest_framework.permissions import (
+    IsAdminUser,
+    IsAuthenticated,
+    IsAuthenticatedOrReadOnly,
+)
+from like.models import LikedItem
+from tag.models import Tag, TaggedItem
+from . import importer, metrics, models, outbox, provisioning, serializers
+from .authentication import get_customer_id
+from .cache import CachedResponseMixin, get_response_cache
+from .pagination import (
+    CountFreePagination,
+    DefaultPagination,
+    EstimatedCountPagination,
+    ProductPagination,
+    ReviewPagination,
+)
+from .export import CSVRenderer, NDJSONRenderer, stream_orders, stream_products
+from .filter import OrderExportFilter, OwnerFilter, ProductFilter, ProductSearchFilter
+from .metrics import SerializerTimingMixin
+from .permissions import IsAdminOrReadOnly, OwnerOrAdmin
+from .signals.handlers import invalidate_products
+
+
+def read_upload(request):
+    """
+    The rows of an uploaded `file` (CSV, JSON or NDJSON, told apart by its
+    extension or a `file_format` field) and the requested `batch_size`.
+    """
+    upload = request.FILES.get("file")
+    if upload is None:
+        raise ValidationError({"file": ["This field is required."]})
+    file_format = request.data.get("file_format") or importer.guess_format(upload.name)
+    if file_format not in importer.FORMATS:
+        raise ValidationError(
+            {"file_format": [f"Expected one of {', '.join(importer.FORMATS)}."]}
+        )
+    try:
+        batch_size = int(request.data.get("batch_size", 500))
+    except ValueError:
+        raise ValidationError({"batch_size": ["A valid integer is required."]})
+
+    file = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    return importer.read_rows(file, file_format), max(1, batch_size)
+
+
+class CollectionViewSet(SerializerTimingMixin, ModelViewSet):
+    queryset = models.Collection.objects.all()
+    serializer_class = serializers.CollectionSerializer
+    permission_classes = [IsAdminOrReadOnly]
+
+    def destroy(self, request, *args, **kwargs):
+        collection = models.Collection.objects.get(pk=kwargs["pk"])
+        if collection.product.exists():
+            return Response(
+                {
+                    "error": "Collection can't be deleted because it's associated with product"
+                },
+            )
+        return super().destroy(request, *args, **kwargs)
+
+
+def change_tags(request, tag_ids, product_ids):
+    """Add (POST) or remove (DELETE) tags in bulk and invalidate the products."""
+    serializer = serializers.TaggingSerializer(
+        data={"tags": tag_ids, "products": product_ids}
+    )
+    serializer.is_valid(raise_exception=True)
+    tag_ids = serializer.validated_data["tags"]
+    product_ids = serializer.validated_data["products"]
+    if request.method == "POST":
+        changed = len(TaggedItem.objects.add_tags(models.Product, product_ids, tag_ids))
+    else:
+        changed = TaggedItem.objects.remove_tags(models.Product, product_ids, tag_ids)
+    if changed:
+        invalidate_products(product_ids)
+    return Response({"changed": changed})
+
+
+class TagViewSet(SerializerTimingMixin, ModelViewSet):
+    queryset = Tag.objects.order_by("label", "id")
+    serializer_class = serializers.TagSerializer
+    pagination_class = DefaultPagination
+    permission_classes = [IsAdminOrReadOnly]
+
+    @action(detail=True, methods=["POST", "DELETE"], permission_classes=[IsAdminUser])
+    def products(self, request, pk=None):
+        """Tag or untag the `products` (a list of ids) with this tag."""
+        tag = get_object_or_404(Tag.objects.only("id"), pk=pk)
+        return change_tags(request, [tag.pk], request.data.get("products"))
+
+
+class ProductViewSet(SerializerTimingMixin, CachedResponseMixin, ModelViewSet):
+    # Images and tags take one query each for the whole page; like_count is
+    # a column kept by the LikedItem signal handlers.
+    queryset = models.Product.objects.prefetch_related(
+        "images",
+        Prefetch("tagged_items", queryset=TaggedItem.objects.select_related("tag")),
+    ).all()
+    serializer_class = serializers.ProductSerializer
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
+    filterset_class = ProductFilter
+    search_fields = ["title", "description", "collection__title"]
+    ordering_fields = ["price", "effective_price", "last_update"]
+    pagination_class = ProductPagination
+    permission_classes = [IsAdminOrReadOnly]
+    cache_prefix = "products"
+    # Checkouts move stock and likes move like_count too often to flush
+    # cached lists over; those read both fresh instead.
+    live_fields = ["inventory", "like_count"]
+
+    def get_cache_scopes(self, request, pk=None):
+        if pk is not None:
+            return [f"product:{pk}"]
+        collection_id = request.query_params.get("collection_id")
+        if collection_id:
+            return [f"collection:{collection_id}"]
+        return ["catalog"]
+
+    @action(
+        detail=False,
+        permission_classes=[IsAdminUser],
+        renderer_classes=[CSVRenderer, NDJSONRenderer],
+    )
+    def export(self, request):
+        """
+        Stream every matching product, in id order, as `?format=csv` or
+        `?format=ndjson`. `?search=` is not capped at MAX_RESULTS here.
+        """
+        self.unranked_search = True
+        queryset = self.filter_queryset(models.Product.objects.all())
+        return stream_products(queryset, request.accepted_renderer.format)
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="import",
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def bulk_import(self, request):
+        """
+        Import products from an uploaded `file` (CSV, JSON or NDJSON, told
+        apart by its extension or a `file_format` field). Returns the import
+        report; bad rows are listed in it rather than failing the request.
+        """
+        rows, batch_size = read_upload(request)
+        try:
+            report = importer.ProductImporter(batch_size).run(rows)
+        except ValueError as error:
+            # The file as a whole could not be parsed (e.g. broken JSON).
+            raise ValidationError({"file": [str(error)]})
+        return Response(report)
+
+    @action(detail=True, methods=["POST", "DELETE"], permission_classes=[IsAdminUser])
+    def tags(self, request, pk=None):
+        """Add or remove the `tags` (a list of ids) on this product."""
+        product = get_object_or_404(models.Product.objects.only("id"), pk=pk)
+        return change_tags(request, request.data.get("tags"), [product.pk])
+
+    @action(
+        detail=True, methods=["POST", "DELETE"], permission_classes=[IsAuthenticated]
+    )
+    def like(self, request, pk=None):
+        product = get_object_or_404(models.Product.objects.only("id"), pk=pk)
+        like = {
+            "user_id": request.user.id,
+            "content_type": ContentType.objects.get_for_model(models.Product),
+            "object_id": product.pk,
+        }
+        if request.method == "POST":
+            _, created = LikedItem.objects.get_or_create(**like)
+            return Response(
+                {"liked": True},
+                status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+            )
+        # Deleted one by one so the like_count receiver runs.
+        LikedItem.objects.filter(**like).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def liked(self, request):
+        """The products the requesting user likes; not cached, unlike `list`."""
+        queryset = self.get_queryset().filter(
+            pk__in=LikedItem.objects.filter(
+                user_id=request.user.id,
+                content_type=ContentType.objects.get_for_model(models.Product),
+            ).values("object_id")
+        )
+        page = self.paginate_queryset(self.filter_queryset(queryset))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def destroy(self, request, *args, **kwargs):
+        if models.OrderItem.objects.filter(product_id=kwargs["pk"]).count() > 0:
+            return Response(
+                {
+                    "error": "Product can't be deleted because it's associated with orderitem"
+                },
+            )
+        return super().destroy(request, *args, **kwargs)
+
+
+class ReviewViewSet(SerializerTimingMixin, ModelViewSet):
+    serializer_class = serializers.ReviewSerializer
+    pagination_class = ReviewPagination
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return {}
+        else:
+            # One query per page: the author's name and membership come
+            # joined in, and only the columns the response shows.
+            return (
+                models.Review.objects.filter(product_id=self.kwargs["products_pk"])
+                .select_related("customer__user")
+                .only(
+                    "id",
+                    "date",
+                    "description",
+                    "rating",
+                    "product",
+                    "customer__id",
+                    "customer__membership",
+                    "customer__user__id",
+                    "customer__user__first_name",
+                    "customer__user__last_name",
+                )
+            )
+
+    @action(detail=False)
+    def summary(self, request, products_pk=None):
+        """Review count and rating breakdown, from the ReviewSummary rollup."""
+        product = get_object_or_404(
+            models.Product.objects.select_related("review_summary").only(
+                "id", "review_count", "review_summary"
+            ),
+            pk=products_pk,
+        )
+        try:
+            summary = product.review_summary
+        except models.ReviewSummary.DoesNotExist:
+            summary = models.ReviewSummary(product=product)
+        return Response(serializers.ReviewSummarySerializer(summary).data)
+
+    def get_permissions(self):
+        if self.request.method in ["PATCH", "PUT", "DELETE"]:
+            return [OwnerOrAdmin()]
+        return [IsAuthenticatedOrReadOnly()]
+
+    def get_serializer_context(self):
+        if getattr(self, "swagger_fake_view", False):
+            return {}
+        else:
+            return {
+                "product_id": self.kwargs["products_pk"],
+                "request": self.request,
+            }
+
+
+class ProductImageViewSet(SerializerTimingMixin, ModelViewSet):
+    serializer_class = serializers.ProductImageSerializer
+    pagination_class = DefaultPagination
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return {}
+        else:
+            return models.ProductImage.objects.select_related("product").filter(
+                product_id=self.kwargs["products_pk"]
+            )
+
+    def get_serializer_context(self):
+        if getattr(self, "swagger_fake_view", False):
+            return {}
+        else:
+            return {
+                "product_id": self.kwargs["products_pk"],
+            }
+
+
+class CartViewSet(
+    SerializerTimingMixin,
+    CreateModelMixin,
+    RetrieveModelMixin,
+    DestroyModelMixin,
+    GenericViewSet,
+):
+    queryset = models.Cart.objects.with_totals()
+    serializer_class = serializers.CartSerializer
+
+
+class CartItemViewSet(SerializerTimingMixin, ModelViewSet):
+    http_method_names = ["get", "post", "patch", "delete"]
+
+    def get_serializer_class(self):
+        if self.action == "bulk":
+            return serializers.BulkAddCartItemSerializer
+        if self.request.method == "POST":
+            return serializers.AddCartItemSerializer
+        elif self.request.method == "PATCH":
+            return serializers.UpdateCartItemSerializer
+        return serializers.CartItemSerializer
+
+    def get_serializer_context(self):
+        if getattr(self, "swagger_fake_view", False):
+            return {}
+        else:
+            return {"cart_id": self.kwargs["carts_pk"]}
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return {}
+        else:
+            return models.CartItem.objects.filter(
+                cart_id=self.kwargs["carts_pk"]
+            ).with_subtotals()
+
+    def check_cart(self):
+        """Not found before anything is written to a cart that does not exist."""
+        generics.get_object_or_404(
+            models.Cart.objects.only("id"), pk=self.kwargs["carts_pk"]
+        )
+
+    def create(self, request, *args, **kwargs):
+        self.check_cart()
+        return super().create(request, *args, **kwargs)
+
+    @action(detail=False, methods=["POST"])
+    def bulk(self, request, carts_pk=None):
+        self.check_cart()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart_items = serializer.save()
+        serializer = serializers.CartItemSerializer(cart_items, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class CustomerViewSet(
+    SerializerTimingMixin,
+    RetrieveModelMixin,
+    UpdateModelMixin,
+    DestroyModelMixin,
+    ListModelMixin,
+    GenericViewSet,
+):
+    queryset = models.Customer.objects.all()
+    serializer_class = serializers.CustomerSerializer
+    permission_classes = [IsAdminUser]
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def provision(self, request):
+        """
+        Create users with their customers from an uploaded `file` with the
+        columns username, email, phone_number, first_name, last_name and
+        optionally password, birth_date and membership. Returns the report;
+        bad rows are listed in it rather than failing the request.
+        """
+        rows, batch_size = read_upload(request)
+        try:
+            report = provisioning.UserProvisioner(batch_size).run(rows)
+        except ValueError as error:
+            raise ValidationError({"file": [str(error)]})
+        return Response(report)
+
+    @action(detail=False, methods=["GET", "PUT"], permission_classes=[IsAuthenticated])
+    def me(self, request):
+        customer = models.Customer.objects.get(pk=get_customer_id(request))
+        # The names come from the authenticated user; no need to reload it.
+        customer.user = request.user
+        if request.method == "GET":
+            serializer = serializers.CustomerSerializer(customer)
+            return Response(serializer.data)
+        elif request.method == "PUT":
+            serializer = serializers.CustomerSerializer(customer, data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return Response(serializer.data)
+
+
+class OrderViewSet(SerializerTimingMixin, ModelViewSet):
+    http_method_names = ["get", "post", "patch", "delete", "head", "options"]
+    pagination_class = EstimatedCountPagination
+    filter_backends = [OwnerFilter]
+
+    @property
+    def paginator(self):
+        """
+        Staff page through every order with an estimated count; a customer's
+        own order history needs no total, so it is paged without counting.
+        """
+        if not hasattr(self, "_paginator"):
+            if self.request.user.is_staff:
+                self._paginator = self.pagination_class()
+            else:
+                self._paginator = CountFreePagination()
+        return self._paginator
+
+    def get_permissions(self):
+        if self.action == "export":
+            return [IsAdminUser()]
+        if self.request.method == "GET":
+            return [OwnerOrAdmin()]
+        if self.request.method in ["PATCH", "DELETE"]:
+            return [IsAdminUser()]
+        return [IsAuthenticated()]
+
+    @action(detail=False, renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Stream orders with their items as `?format=csv` (a row per item) or
+        `?format=ndjson` (an object per order), filtered by `placed_at__gte`,
+        `placed_at__lt`, `payment_status` and `customer_id`.
+        """
+        items = models.OrderItem.objects.select_related("product").only(
+            "order_id", "quantity", "unit_price", "product__id", "product__title"
+        )
+        filterset = OrderExportFilter(
+            request.query_params,
+            queryset=models.Order.objects.prefetch_related(
+                Prefetch("order_items", queryset=items)
+            ).order_by("id"),
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return stream_orders(filterset.qs, request.accepted_renderer.format)
+
+    def create(self, request, *args, **kwargs):
+        serializer = serializers.CreateOrderSerializer(
+            data=request.data, context={"customer_id": get_customer_id(request)}
+        )
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save()
+        serializer = serializers.OrderSerializer(order)
+        return Response(serializer.data)
+
+    def get_serializer_class(self):
+        if self.request.method == "POST":
+            return serializers.CreateOrderSerializer
+        elif self.request.method == "PATCH":
+            return serializers.UpdateOrderSerializer
+        return serializers.OrderSerializer
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return {}
+        else:
+            return models.Order.objects.with_items().order_by("-placed_at", "-id")
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+    swagger_schema = None
+
+    def get(self, request):
+        cache_stats = get_response_cache().stats()
+        backlog = outbox.backlog()
+        body = (
+            metrics.registry.render()
+            + metrics.render_counter(
+                "store_response_cache_hits_total",
+                cache_stats["hits"],
+                "Product responses served from the cache.",
+            )
+            + metrics.render_counter(
+                "store_response_cache_misses_total",
+                cache_stats["misses"],
+                "Product responses that had to be built.",
+            )
+            + metrics.render_gauge(
+                "store_outbox_pending_events",
+                backlog["pending"],
+                "Outbox events waiting for delivery.",
+            )
+            + metrics.render_gauge(
+                "store_outbox_failed_events",
+                backlog["failed"],
+                "Outbox events that ran out of delivery attempts.",
+            )
+            + metrics.render_gauge(
+                "store_outbox_oldest_pending_seconds",
+                backlog["oldest_age"],
+                "Age of the oldest undelivered outbox event.",
+            )
+            + metrics.render_gauge(
+                "store_outbox_delivered_per_second",
+                backlog["delivery_rate"],
+                f"Outbox deliveries per second over the last "
+                f"{outbox.RECENT_SECONDS}s.",
+            )
+            + metrics.render_gauge(
+                "store_outbox_lag_mean_seconds",
+                backlog["mean_lag"],
+                f"Mean time from write to delivery over the last "
+                f"{outbox.RECENT_SECONDS}s.",
+            )
+            + metrics.render_gauge(
+                "store_outbox_lag_max_seconds",
+                backlog["max_lag"],
+                f"Longest time from write to delivery over the last "
+                f"{outbox.RECENT_SECONDS}s.",
+            )
+        )
+        return HttpResponse(
+            body, content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
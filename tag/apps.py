@@ -1,6 +1,6 @@
-from django.apps import AppConfig
-
-
-class TagConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'tag'
+from django.apps import AppConfig
+
+
+class TagConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'tag'
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.5 on 2026-10-17 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tag", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="taggeditem",
+            index=models.Index(
+                fields=["content_type", "object_id"], name="taggeditem_object_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taggeditem",
+            index=models.Index(
+                fields=["tag", "content_type"], name="taggeditem_tag_type_idx"
+            ),
+        ),
+    ]
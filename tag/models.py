@@ -1,14 +1,61 @@
-from django.db import models
-from django.contrib.contenttypes.models import ContentType
-from django.contrib.contenttypes.fields import GenericForeignKey
-
-# Create your models here.
-class Tag(models.Model):
-    label = models.CharField(max_length=255)
-
-
-class TaggedItem(models.Model):
-    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
-    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
-    object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey()
+from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.fields import GenericForeignKey
+
+# Create your models here.
+class Tag(models.Model):
+    label = models.CharField(max_length=255)
+
+
+class TaggedItemManager(models.Manager):
+    def add_tags(self, model, object_ids, tag_ids):
+        """
+        Tag each of `model`'s objects with each tag, skipping the pairs
+        already tagged: one query to find those and one bulk insert.
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        tagged = set(
+            self.filter(
+                content_type=content_type,
+                object_id__in=object_ids,
+                tag_id__in=tag_ids,
+            ).values_list("object_id", "tag_id")
+        )
+        return self.bulk_create(
+            [
+                self.model(
+                    tag_id=tag_id, content_type=content_type, object_id=object_id
+                )
+                for object_id in object_ids
+                for tag_id in tag_ids
+                if (object_id, tag_id) not in tagged
+            ]
+        )
+
+    def remove_tags(self, model, object_ids, tag_ids):
+        content_type = ContentType.objects.get_for_model(model)
+        deleted, _ = self.filter(
+            content_type=content_type, object_id__in=object_ids, tag_id__in=tag_ids
+        ).delete()
+        return deleted
+
+
+class TaggedItem(models.Model):
+    objects = TaggedItemManager()
+
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey()
+
+    class Meta:
+        indexes = [
+            # Tags of a page of objects, e.g. the product list.
+            models.Index(
+                fields=["content_type", "object_id"], name="taggeditem_object_idx"
+            ),
+            # Objects with a tag, e.g. ?tag= on the product list.
+            models.Index(
+                fields=["tag", "content_type"], name="taggeditem_tag_type_idx"
+            ),
+        ]